@@ -0,0 +1,96 @@
+import sys
+import os
+import shutil
+import tempfile
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+from typing import Dict, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import load_summaries  # noqa: E402
+from legacy import load_results, merge_summaries  # noqa: E402
+
+
+def count_routes(dir_name: str) -> Tuple[Dict[str, Dict[str, int]], Dict[str, Dict[str, int]]]:
+    """
+    Count the occurrences of each route on each host from the fully loaded results, without any cache
+    :param dir_name: name of the given directory
+    :return: occurrences of each route on each host, number of received packets on each host in each test
+    """
+    aggregation_result, _, pkt_in_each_test = load_results(dir_name, 1)
+
+    return {host: result.groupby('IDs')['Time'].count().to_dict()
+            for host, result in aggregation_result.items()}, pkt_in_each_test
+
+
+def timed_merge(dir_name: str, rebuild: bool) -> tuple:
+    """
+    Load and merge the summaries of the given directory
+    :param dir_name: name of the given directory
+    :param rebuild: whether to ignore the aggregation cache
+    :return: elapsed seconds, occurrences of each route on each host, number of received packets in each test
+    """
+    start = perf_counter()
+    route_count, pkt_in_each_test = merge_summaries(load_summaries(dir_name, 1, rebuild))
+
+    return perf_counter() - start, route_count, pkt_in_each_test
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-d', '--directory', help='Name of the result directory', type=str, default='v2_30_results')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_aggregation_cache.py [-d name_of_the_directory]
+    """
+    args = parse_arguments()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = os.path.join(temp_dir, 'results')
+        shutil.copytree(args.directory, results)
+
+        cold_time, cold_count, cold_pkt = timed_merge(results, True)
+        warm_time, warm_count, warm_pkt = timed_merge(results, False)
+
+        # One more test on h2 and a rewritten file on h3
+        shutil.copy(os.path.join(results, 'h2-eth0_0.csv'), os.path.join(results, 'h2-eth0_99.csv'))
+        with open(os.path.join(results, 'h3-eth0_0.csv'), 'a') as out_file:
+            out_file.write('3,"1, 12, 3",99.0\n')
+        incremental_time, incremental_count, incremental_pkt = timed_merge(results, False)
+        expected_count, expected_pkt = count_routes(results)
+
+    info_log(f'cold {cold_time * 1e3:.1f} ms, cached {warm_time * 1e3:.1f} ms, '
+             f'2 changed files {incremental_time * 1e3:.1f} ms')
+    if cold_count != warm_count or cold_pkt != warm_pkt or incremental_count != expected_count or \
+            incremental_pkt != expected_pkt:
+        error_log('Cached and cold aggregation give different counts')
+        sys.exit(1)
+    info_log('Cached and cold aggregation give identical counts')
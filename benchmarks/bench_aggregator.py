@@ -0,0 +1,109 @@
+import sys
+import os
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+
+from pandas import concat, read_csv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import FLOAT_PRECISION  # noqa: E402
+from legacy import Results, load_results  # noqa: E402
+
+RESULT_DIRS = ['v1_10_results', 'v1_25_results', 'v1_30_results', 'v2_10_results', 'v2_25_results', 'v2_30_results']
+
+
+def legacy_load(dir_name: str) -> Results:
+    """
+    Serial loader of the original aggregate(), growing each host with one concatenation per file. Floats are parsed
+    as by load_results, read_csv rounds some of them one ulp away by default
+    :param dir_name: name of the given directory
+    :return: all results of each host, first result of each host and number of received packets in each test
+    """
+    aggregation_result = dict()
+    zero_serial_number_csv = dict()
+    pkt_in_each_test = dict()
+    with os.scandir(dir_name) as directory:
+        for file in directory:
+            if file.path.endswith('.csv') and file.is_file() and file.name.partition('-')[1] != '':
+                result = read_csv(file.path, float_precision=FLOAT_PRECISION)
+                host = file.name.partition('_')[0]
+                if aggregation_result.get(host) is None:
+                    aggregation_result[host] = result
+                else:
+                    aggregation_result[host] = concat([aggregation_result[host], result], ignore_index=True)
+                serial_number = file.name.partition('_')[2][:-4]
+                if serial_number == '0':
+                    zero_serial_number_csv[host] = result
+                pkt_in_each_test.setdefault(host, dict())[serial_number] = len(result.index)
+
+    return aggregation_result, zero_serial_number_csv, pkt_in_each_test
+
+
+def same_results(first: Results, second: Results) -> bool:
+    """
+    Check whether two loaders produce identical structures
+    :param first: results of the first loader
+    :param second: results of the second loader
+    :return: whether they are identical
+    """
+    return all(first_frames.keys() == second_frames.keys() and
+               all(first_frames[host].equals(second_frames[host]) for host in first_frames)
+               for first_frames, second_frames in zip(first[:2], second[:2])) and first[2] == second[2]
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-d', '--directory', help='Names of the result directories', type=str, nargs='*',
+                        default=RESULT_DIRS)
+    parser.add_argument('-w', '--workers', help='Number of processes parsing csv files', type=int,
+                        default=os.cpu_count())
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_aggregator.py [-d names_of_the_directories] [-w num_of_workers]
+    """
+    args = parse_arguments()
+    for name in args.directory:
+        start = perf_counter()
+        reference = legacy_load(name)
+        legacy_time = perf_counter() - start
+
+        timings = []
+        for workers in [1, args.workers]:
+            start = perf_counter()
+            loaded = load_results(name, workers)
+            timings.append(perf_counter() - start)
+            if not same_results(reference, loaded):
+                error_log(f'{name}: load_results with {workers} worker(s) differs from the legacy loader')
+                sys.exit(1)
+
+        info_log(f'{name}: legacy {legacy_time * 1e3:.1f} ms, 1 worker {timings[0] * 1e3:.1f} ms, '
+                 f'{args.workers} workers {timings[1] * 1e3:.1f} ms')
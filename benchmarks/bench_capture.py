@@ -0,0 +1,158 @@
+import sys
+import os
+import socket
+import struct
+import tempfile
+import threading
+from argparse import ArgumentParser, Namespace
+from random import Random
+from time import perf_counter
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from capture import attach_filter, capture, decode_frame  # noqa: E402
+from int_codec import MAX_INT_HEADERS, encode  # noqa: E402
+
+
+def make_frames(num_of_frames: int, arp_ratio: float, seed: int) -> List[bytes]:
+    """
+    Generate a deterministic mix of broadcast ARP requests with INT headers, ARP replies and IPv4 frames
+    :param num_of_frames: number of frames
+    :param arp_ratio: ratio of broadcast ARP requests
+    :param seed: random seed
+    :return: list of raw Ethernet frames
+    """
+    rand = Random(seed)
+    frames = []
+    for i in range(num_of_frames):
+        src = b'\x00\x00\x0a\x00\x01\x01'
+        if rand.random() < arp_ratio:
+            ids = [rand.randint(1, 30) for _ in range(rand.randint(1, MAX_INT_HEADERS))]
+            arp = struct.pack('!HHBBH6s4s6s4s', 1, 0x0800, 6, 4, 1, src, b'\x0a\x00\x01\x01', b'\x00' * 6,
+                              b'\x0a\x00\x02\x02')
+            frames.append(b'\xff' * 6 + src + b'\x08\x06' + arp + encode(ids))
+        elif rand.random() < 0.5:
+            arp = struct.pack('!HHBBH6s4s6s4s', 1, 0x0800, 6, 4, 2, src, b'\x0a\x00\x01\x01', src,
+                              b'\x0a\x00\x02\x02')
+            frames.append(src + src + b'\x08\x06' + arp)
+        else:
+            frames.append(src + src + b'\x08\x00' + bytes(rand.getrandbits(8) for _ in range(46)))
+
+    return frames
+
+
+def write_pcap(filename: str, frames: List[bytes]) -> None:
+    """
+    Write frames into a pcap file
+    :param filename: name of the pcap file
+    :param frames: list of raw Ethernet frames
+    :return: None
+    """
+    with open(filename, 'wb') as out_file:
+        out_file.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for i, frame in enumerate(frames):
+            out_file.write(struct.pack('<IIII', i // 1000000, i % 1000000, len(frame), len(frame)))
+            out_file.write(frame)
+
+
+def bench_raw(frames: List[bytes]) -> Tuple[float, list]:
+    """
+    Replay frames through a unix socket pair with the BPF filter attached and capture them with the raw engine
+    :param frames: list of raw Ethernet frames
+    :return: frames per second and decoded results
+    """
+    replay, sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    attach_filter(sock)
+    sock.settimeout(1.0)
+    results = []
+    expected = sum(1 for frame in frames if decode_frame(memoryview(frame)) is not None)
+
+    def replayer():
+        for frame in frames:
+            replay.send(frame)
+
+    thread = threading.Thread(target=replayer)
+    start = perf_counter()
+    thread.start()
+    capture(sock, lambda frame, timestamp: results.append(decode_frame(frame)), count=expected)
+    elapsed = perf_counter() - start
+    thread.join()
+    replay.close()
+    sock.close()
+
+    return len(frames) / elapsed, results
+
+
+def bench_scapy(frames: List[bytes]) -> Tuple[float, list]:
+    """
+    Read frames from a pcap file with scapy sniff() and the lfilter of receiver.py
+    :param frames: list of raw Ethernet frames
+    :return: frames per second and decoded results
+    """
+    from scapy.layers.l2 import ARP
+    from scapy.sendrecv import sniff
+    from receiver import dissect
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'replay.pcap')
+        write_pcap(filename, frames)
+        start = perf_counter()
+        sniff(offline=filename, lfilter=lambda pkt: ARP in pkt, prn=lambda pkt: results.append(dissect(pkt)),
+              store=False)
+        elapsed = perf_counter() - start
+
+    return len(frames) / elapsed, [result for result in results if result is not None]
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-c', '--count', help='Number of frames to be replayed', type=int, default=20000)
+    parser.add_argument('-a', '--arp', help='Ratio of broadcast ARP requests', type=float, default=0.2)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+    parser.add_argument('-e', '--engine', help='Engines to be benchmarked', type=str, nargs='*',
+                        choices=['scapy', 'raw'], default=['scapy', 'raw'])
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_capture.py [-c count] [-a arp_ratio] [-s seed] [-e engines]
+    """
+    args = parse_arguments()
+    replayed = make_frames(args.count, args.arp, args.seed)
+
+    decoded = dict()
+    for engine in args.engine:
+        fps, decoded[engine] = (bench_raw if engine == 'raw' else bench_scapy)(replayed)
+        info_log(f'{engine}: {fps:.0f} frames/s, {len(decoded[engine])} ARP requests')
+
+    if len(decoded) == 2 and decoded['raw'] != decoded['scapy']:
+        error_log('Raw and scapy engines decode different results')
+        sys.exit(1)
@@ -0,0 +1,231 @@
+import sys
+import os
+import csv
+import signal
+import socket
+import struct
+import subprocess
+import tempfile
+from argparse import ArgumentParser, Namespace
+from random import Random
+from time import perf_counter, sleep
+from typing import Dict, List, Tuple
+
+HOST_TEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test')
+sys.path.insert(0, HOST_TEST)
+from capture import CAPTURING  # noqa: E402
+from int_codec import MAX_INT_HEADERS, encode  # noqa: E402
+
+# receiver.py with its raw engine and pipeline reading a unix socket instead of an interface
+RECEIVER = '''
+import sys
+from time import time
+import receiver
+from capture import CAPTURING, capture
+from capture_daemon import open_unix_socket
+from pipeline import Pipeline
+receiver.number, receiver.writer, receiver.route_table = -1, None, receiver.RouteTable()
+receiver.flush_rows, receiver.flush_time, receiver.result_format = 1, 0, 'csv'
+receiver.latency, receiver.tracker, receiver.schedule = False, None, None
+sock = open_unix_socket(sys.argv[1])
+receiver.info_log(CAPTURING.format(sys.argv[2]))
+start_time = time()
+pipeline = Pipeline(lambda frame: receiver.decode(frame, 'raw'),
+                    lambda decoded, timestamp: receiver.store(sys.argv[2], '../results', timestamp - start_time,
+                                                     *decoded))
+try:
+    capture(sock, lambda frame, timestamp: pipeline.submit(bytes(frame), timestamp))
+except KeyboardInterrupt:
+    pass
+finally:
+    pipeline.close()
+    if receiver.writer is not None:
+        receiver.writer.close()
+'''
+
+
+def make_requests(num_of_frames: int, seed: int) -> List[bytes]:
+    """
+    Generate broadcast ARP requests with INT headers
+    :param num_of_frames: number of frames
+    :param seed: random seed
+    :return: list of raw Ethernet frames
+    """
+    rand = Random(seed)
+    src = b'\x00\x00\x0a\x00\x01\x01'
+    arp = struct.pack('!HHBBH6s4s6s4s', 1, 0x0800, 6, 4, 1, src, b'\x0a\x00\x01\x01', b'\x00' * 6,
+                      b'\x0a\x00\x02\x02')
+
+    return [b'\xff' * 6 + src + b'\x08\x06' + arp +
+            encode([rand.randint(1, 30) for _ in range(rand.randint(1, MAX_INT_HEADERS))])
+            for _ in range(num_of_frames)]
+
+
+def rss(pid: int) -> int:
+    """
+    Get the resident set size of a process
+    :param pid: process ID
+    :return: size in bytes
+    """
+    with open(f'/proc/{pid}/status') as in_file:
+        for line in in_file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+
+    return 0
+
+
+def wait_for_logs(filenames: List[str], text: str, count: int, timeout: float) -> bool:
+    """
+    Wait until the log files contain the text count times in total
+    :param filenames: names of the log files
+    :param text: text to be waited for
+    :param count: number of occurrences
+    :param timeout: seconds to wait at most
+    :return: whether the text was found in time
+    """
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        found = 0
+        for filename in filenames:
+            with open(filename) as in_file:
+                found += in_file.read().count(text)
+        if found >= count:
+            return True
+        sleep(0.001)
+
+    return False
+
+
+def load_routes(dir_name: str) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Load the results without their times
+    :param dir_name: name of the results directory
+    :return: file name -> list of (number of switches, route)
+    """
+    routes = dict()
+    for filename in sorted(os.listdir(dir_name)):
+        with open(os.path.join(dir_name, filename), newline='') as in_file:
+            routes[filename] = [(row[0], row[1]) for row in list(csv.reader(in_file))[1:]]
+
+    return routes
+
+
+def bench(mode: str, num_of_interfaces: int, frames: List[bytes], timeout: float) -> Tuple[float, int, dict]:
+    """
+    Start the receivers of one mode, replay frames to every interface and stop them
+    :param mode: 'receivers' for one receiver.py per interface, 'daemon' for one capture_daemon.py
+    :param num_of_interfaces: number of interfaces
+    :param frames: frames replayed to each interface
+    :param timeout: seconds to wait for the receivers
+    :return: startup latency in seconds, total RSS in bytes and results
+    """
+    interfaces = [f'h{i + 2}-eth0' for i in range(num_of_interfaces)]
+    with tempfile.TemporaryDirectory() as directory:
+        sockets, results, work = [os.path.join(directory, name) for name in ('sockets', 'results', 'work')]
+        for name in (sockets, results, work):
+            os.makedirs(name)
+
+        start = perf_counter()
+        if mode == 'daemon':
+            commands = [[sys.executable, os.path.join(HOST_TEST, 'capture_daemon.py'), '-u', sockets, '-d', results,
+                         '-if'] + interfaces]
+        else:
+            commands = [[sys.executable, '-c', RECEIVER, os.path.join(sockets, interface), interface]
+                        for interface in interfaces]
+        logs = [os.path.join(directory, f'{i}.log') for i in range(len(commands))]
+        processes = []
+        for command, log in zip(commands, logs):
+            with open(log, 'w') as out_file:
+                processes.append(subprocess.Popen(command, cwd=work, stdout=out_file, stderr=subprocess.STDOUT,
+                                                  env=dict(os.environ, PYTHONPATH=HOST_TEST)))
+        ready = wait_for_logs(logs, CAPTURING.format(''), num_of_interfaces, timeout)
+        startup = perf_counter() - start
+        memory = sum(rss(process.pid) for process in processes)
+
+        if ready:
+            sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            for frame in frames:
+                for interface in interfaces:
+                    sender.sendto(frame, os.path.join(sockets, interface))
+            sender.close()
+            wait_for_csv(results, num_of_interfaces, len(frames), timeout)
+
+        for process in processes:
+            process.send_signal(signal.SIGINT)
+        for process in processes:
+            process.wait(timeout)
+
+        return (startup if ready else float('nan')), memory, load_routes(results)
+
+
+def wait_for_csv(dir_name: str, num_of_files: int, num_of_rows: int, timeout: float) -> None:
+    """
+    Wait until every result file holds all rows
+    :param dir_name: name of the results directory
+    :param num_of_files: number of result files
+    :param num_of_rows: number of rows of each file
+    :param timeout: seconds to wait at most
+    :return: None
+    """
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        routes = load_routes(dir_name)
+        if len(routes) == num_of_files and all(len(rows) == num_of_rows for rows in routes.values()):
+            return
+        sleep(0.01)
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--number', help='Numbers of interfaces', type=int, nargs='*', default=[2, 10, 30])
+    parser.add_argument('-c', '--count', help='Number of frames replayed to each interface', type=int, default=50)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+    parser.add_argument('-t', '--timeout', help='Seconds to wait for the receivers', type=float, default=120)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_capture_daemon.py [-n numbers_of_interfaces] [-c count] [-s seed] [-t timeout]
+    """
+    args = parse_arguments()
+    replayed = make_requests(args.count, args.seed)
+    failed = False
+    for num in args.number:
+        measured = {mode: bench(mode, num, replayed, args.timeout) for mode in ('receivers', 'daemon')}
+        for mode, (latency, size, _) in measured.items():
+            info_log(f'{num} interfaces, {mode}: startup {latency:.2f} s, RSS {size / 2 ** 20:.1f} MiB')
+        if measured['receivers'][2] != measured['daemon'][2] or \
+                sum(len(rows) for rows in measured['daemon'][2].values()) != num * args.count:
+            error_log(f'{num} interfaces: receivers and daemon store different results')
+            failed = True
+
+    if failed:
+        sys.exit(1)
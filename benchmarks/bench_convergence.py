@@ -0,0 +1,152 @@
+import sys
+import os
+import csv
+import glob
+import tempfile
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import get_host, get_serial_number, list_result_files, load_coded_results  # noqa: E402
+from bench_predictor import make_config  # noqa: E402
+from convergence import FloodStats, compare, flood_stats  # noqa: E402
+from simulator import parse_topology, send_times, simulate, write_results  # noqa: E402
+
+# Checked-in results of the repository
+RESULT_DIRS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'v[0-9]*_results')))
+
+
+def scan(dir_name: str, count: int, rounds: int) -> Dict[Tuple[str, int], tuple]:
+    """
+    Compute the statistics of the stamped results file by file
+    :param dir_name: name of the results directory
+    :param count: number of packets sent in each round
+    :param rounds: number of rounds
+    :return: (host, test) -> copies, originals, lost, routes, first arrival, stable time and stable round
+    """
+    expected = dict()
+    for file in list_result_files(dir_name):
+        with open(file.path, newline='') as in_file:
+            rows = sorted(csv.DictReader(in_file), key=lambda row: float(row['Time']))
+        if not rows:
+            continue
+        sequences = [int(float(row['Sequence'])) for row in rows]
+        originals = sum(len({seq for seq in sequences if min(seq // count, rounds - 1) == round_no})
+                        for round_no in range(rounds))
+        routes = [row['IDs'] for row in rows]
+        last = max(idx for idx in range(len(routes)) if not idx or routes[idx] != routes[idx - 1])
+        key = get_host(file.name), int(get_serial_number(file.name))
+        expected[key] = (len(rows), originals, count * rounds - originals, len(set(routes)),
+                         float(rows[0]['Latency']), float(rows[last]['Time']) - float(rows[0]['Time']),
+                         min(sequences[last] // count, rounds - 1))
+
+    return expected
+
+
+def found(stats: FloodStats, hosts: List[str]) -> Dict[Tuple[str, int], tuple]:
+    """
+    Get the statistics of the (host, test) which received any copy
+    :param stats: statistics
+    :param hosts: names of the coded hosts
+    :return: (host, test) -> copies, originals, lost, routes, first arrival, stable time and stable round
+    """
+    return {(hosts[host], int(test_no)): (int(copies), int(originals), int(lost), int(routes), first, stable, int(rnd))
+            for host, test_no, copies, originals, lost, routes, first, stable, rnd in
+            zip(stats.host, stats.test_no, stats.copies, stats.originals, stats.lost, stats.routes,
+                stats.first_arrival, stats.stable_time, stats.stable_round) if copies}
+
+
+def differ(first: tuple, second: tuple) -> bool:
+    """
+    Compare the statistics of a (host, test)
+    :param first: statistics
+    :param second: statistics
+    :return: whether they differ
+    """
+    return first[:4] != second[:4] or first[6] != second[6] or not np.allclose(first[4:6], second[4:6], rtol=0,
+                                                                               atol=1e-9)
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--number', help='Number of switches of the simulated tests', type=int, default=30)
+    parser.add_argument('-t', '--trials', help='Number of simulated tests of each version', type=int, default=20)
+    parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
+    parser.add_argument('-b', '--budget', help='Seconds allowed to process the checked-in results', type=float,
+                        default=1)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_convergence.py [-n number_of_switches] [-t trials] [-c count] [-b budget] [-s seed]
+    """
+    args = parse_arguments()
+    failed = False
+
+    # Stamped simulated tests against a scan of every file, then the estimates without the stamps
+    for ver in (0, 1):
+        topology = parse_topology(make_config(args.number, ver, args.seed, 0.1))
+        times = send_times(args.count, 2, 0.02, 1)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_results(simulate(topology, ver, 'h1', times, args.trials, args.seed, 0.001, 0.0005, False, 'numpy',
+                                   1), topology, temp_dir, times=times)
+            coded = load_coded_results(temp_dir, 1)
+            reference = scan(temp_dir, args.count, 2)
+        stamped = found(flood_stats(coded, args.count, 2, 0.25, False), coded.hosts)
+        unstamped = found(flood_stats(coded._replace(sequence=np.full(len(coded.time), np.nan),
+                                                     latency=np.full(len(coded.time), np.nan)),
+                                      args.count, 2, 0.25, False), coded.hosts)
+        mismatches = [key for key in reference if key not in stamped or differ(reference[key], stamped[key])]
+        estimated = sum(unstamped[key][1:3] == reference[key][1:3] for key in reference)
+        info_log(f'v{ver + 1}: {len(reference)} files of {len(coded.time)} packets, {len(reference) - len(mismatches)} '
+                 f'match the scan with stamps, {estimated} with the same originals and loss without stamps')
+        if mismatches or len(stamped) != len(reference):
+            error_log(f'v{ver + 1}: statistics differ from the scan for {mismatches[:5]}')
+            failed = True
+
+    # Every checked-in result directory, from parsing to the bootstrap intervals
+    start_time = perf_counter()
+    all_stats = dict()
+    for directory in RESULT_DIRS:
+        all_stats[directory] = flood_stats(load_coded_results(directory, 1), args.count, 2, 0.25, False)
+    compare(all_stats, 2000, 0.95, args.seed)
+    elapsed = perf_counter() - start_time
+    info_log(f'{len(RESULT_DIRS)} checked-in directories of {sum(len(stats.host) for stats in all_stats.values())} '
+             f'(host, test) processed in {elapsed:.3f} s')
+    if elapsed > args.budget:
+        error_log(f'Processing the checked-in results took more than {args.budget} s')
+        failed = True
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,133 @@
+import sys
+import os
+import socket
+import threading
+from argparse import ArgumentParser, Namespace
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from flood import SendReport, build_frame, flood  # noqa: E402
+from int_codec import STAMP, decode_stamp  # noqa: E402
+
+SRC_MAC = b'\x00\x00\x0a\x00\x01\x01'
+
+
+def check_frame() -> bool:
+    """
+    Check that the pre-serialized frame equals the scapy packet built by sender.py, followed by the stamp
+    :return: whether the frames are equal
+    """
+    from scapy.layers.l2 import Ether, ARP
+    from scapy.packet import Raw
+    from int_codec import encode
+
+    ids = [1, 12, 2]
+    frame, stamp_offset = build_frame(SRC_MAC, '10.0.1.1', '10.0.2.2', ids)
+    packet = Ether(dst='ff:ff:ff:ff:ff:ff', src='00:00:0a:00:01:01') / ARP(
+        op=1, psrc='10.0.1.1', pdst='10.0.2.2', hwsrc='00:00:0a:00:01:01') / Raw(encode(ids))
+
+    return frame[:stamp_offset] == bytes(packet) and len(frame) == stamp_offset + STAMP.size
+
+
+def check_tested_stamp() -> bool:
+    """
+    Check that both decoders of the receivers find the stamp of a frame of sender.py -t 1, behind the IntHeader of the
+    sender once a switch inserted its own IntHeader
+    :return: whether both decoders return the stamp and the IDs of the switches
+    """
+    from scapy.layers.l2 import Ether
+    from capture import ARP_LEN, ETHER_LEN, decode_frame
+    from int_codec import encode, encode_stamp
+    from receiver import dissect
+
+    frame, stamp_offset = build_frame(SRC_MAC, '10.0.1.1', '10.0.2.2', [1, 12, 2])
+    frame = frame[:stamp_offset] + encode_stamp(7, 1.5)
+    frame = frame[:ETHER_LEN + ARP_LEN] + encode([3]) + frame[ETHER_LEN + ARP_LEN:]
+    expected = ('10.0.1.1', '00:00:0a:00:01:01', 1, [3], (7, 1.5))
+
+    return decode_frame(memoryview(frame)) == expected and dissect(Ether(frame)) == expected
+
+
+def bench_flood(count: int, rate: float, burst: int) -> Tuple[SendReport, List[int]]:
+    """
+    Flood a unix socket pair standing in for the interface and collect the received sequence numbers
+    :param count: number of frames to be sent
+    :param rate: target packets per second (0 for as fast as possible)
+    :param burst: number of frames sent back to back in each burst
+    :return: report of the flood and received sequence numbers
+    """
+    sock, stand_in = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    frame, stamp_offset = build_frame(SRC_MAC, '10.0.1.1', '10.0.2.2')
+    sequences = []
+
+    def receiver():
+        buffer = bytearray(2048)
+        for _ in range(count):
+            stand_in.recv_into(buffer)
+            sequences.append(decode_stamp(buffer, stamp_offset)[0])
+
+    thread = threading.Thread(target=receiver)
+    thread.start()
+    report = flood(sock, frame, stamp_offset, count=count, rate=rate, burst=burst)
+    thread.join()
+    sock.close()
+    stand_in.close()
+
+    return report, sequences
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-c', '--count', help='Number of frames sent at each rate', type=int, default=20000)
+    parser.add_argument('-r', '--rate', help='Target packets per second (0 for as fast as possible)', type=float,
+                        nargs='*', default=[1000, 10000, 50000, 0])
+    parser.add_argument('-b', '--burst', help='Packets sent back to back', type=int, default=1)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_flood.py [-c count] [-r rates] [-b burst]
+    """
+    args = parse_arguments()
+    if not check_frame():
+        error_log('Pre-serialized frame differs from the scapy packet')
+        sys.exit(1)
+    if not check_tested_stamp():
+        error_log('Stamp behind the IntHeader of the sender is not found')
+        sys.exit(1)
+
+    for target in args.rate:
+        result, received = bench_flood(args.count, target, args.burst)
+        if received != list(range(args.count)):
+            error_log(f'Sequence numbers received at {target} pps are not 0..{args.count - 1}')
+            sys.exit(1)
+        info_log(f'target {f"{target:g}" if target else "max"} pps: achieved {result.pps:.0f} pps, '
+                 f'jitter mean {result.jitter_mean * 1e6:.1f} us, p99 {result.jitter_p99 * 1e6:.1f} us, '
+                 f'max {result.jitter_max * 1e6:.1f} us')
@@ -0,0 +1,122 @@
+import sys
+import os
+from argparse import ArgumentParser, Namespace
+from random import Random
+from time import perf_counter
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from header import IntHeader  # noqa: E402
+from int_codec import MAX_INT_HEADERS, decode, decode_batch, encode, to_lists  # noqa: E402
+
+
+def make_id_lists(num_of_headers: int, seed: int) -> List[List[int]]:
+    """
+    Generate deterministic ID lists with lengths from 0 to MAX_INT_HEADERS
+    :param num_of_headers: number of ID lists
+    :param seed: random seed
+    :return: list of ID lists
+    """
+    rand = Random(seed)
+
+    return [[rand.randint(1, 2 ** 32 - 1) for _ in range(rand.randint(0, MAX_INT_HEADERS))]
+            for _ in range(num_of_headers)]
+
+
+def check_round_trip(id_lists: List[List[int]]) -> int:
+    """
+    Compare the codec with the scapy IntHeader in both directions
+    :param id_lists: list of ID lists
+    :return: number of mismatches
+    """
+    mismatches = 0
+    for ids in id_lists:
+        scapy_bytes = bytes(IntHeader(proto=0x0800, len=len(ids), id=ids))
+        codec_bytes = encode(ids)
+        scapy_header = IntHeader(codec_bytes)
+        if scapy_bytes != codec_bytes or decode(scapy_bytes) != (0x0800, len(ids), tuple(ids)) or \
+                (scapy_header.proto, scapy_header.len, scapy_header.id) != (0x0800, len(ids), ids):
+            mismatches += 1
+    payloads = [encode(ids) for ids in id_lists]
+    if to_lists(*decode_batch(payloads)) != id_lists:
+        mismatches += 1
+
+    return mismatches
+
+
+def bench_decoders(id_lists: List[List[int]]) -> dict:
+    """
+    Time the scapy IntHeader, the codec and the batch codec on the same payloads
+    :param id_lists: list of ID lists
+    :return: microseconds per header of each decoder
+    """
+    payloads = [encode(ids) for ids in id_lists]
+    timings = dict()
+
+    start = perf_counter()
+    for payload in payloads:
+        header = IntHeader(payload)
+        list(header.id)
+    timings['scapy'] = perf_counter() - start
+
+    start = perf_counter()
+    for payload in payloads:
+        decode(memoryview(payload))
+    timings['codec'] = perf_counter() - start
+
+    start = perf_counter()
+    decode_batch(payloads)
+    timings['batch'] = perf_counter() - start
+
+    return {name: elapsed / len(payloads) * 1e6 for name, elapsed in timings.items()}
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-c', '--count', help='Number of headers to be decoded', type=int, default=20000)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_int_codec.py [-c count] [-s seed]
+    """
+    args = parse_arguments()
+    headers = make_id_lists(args.count, args.seed)
+
+    errors = check_round_trip(headers[:1000])
+    if errors:
+        error_log(f'{errors} header(s) differ between the codec and the scapy IntHeader')
+        sys.exit(1)
+    info_log('Round trip against the scapy IntHeader passed')
+
+    per_header = bench_decoders(headers)
+    for decoder, cost in per_header.items():
+        info_log(f'{decoder}: {cost:.3f} us/header, {per_header["scapy"] / cost:.1f}x scapy')
@@ -0,0 +1,155 @@
+import sys
+import os
+import asyncio
+import multiprocessing
+import selectors
+import socket
+from argparse import ArgumentParser, Namespace
+from time import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from capture import decode_frame  # noqa: E402
+from multi_flood import Schedule, plan, run, stand_in_mac  # noqa: E402
+
+# Seconds between planning and the start of the schedule, for the receiver to start
+START_DELAY = 0.5
+
+
+def receive(schedule: Schedule, sockets: List[socket.socket], conn) -> None:
+    """
+    Read the stand-in sockets until each of them gets an empty datagram, attribute every frame to its origin and
+    send the stamps of each origin through conn
+    :param schedule: schedule of the floods
+    :param sockets: receiving ends of the stand-in sockets
+    :param conn: connection to the parent process
+    :return: None
+    """
+    selector = selectors.DefaultSelector()
+    for sock in sockets:
+        selector.register(sock, selectors.EVENT_READ)
+    buffer = bytearray(2048)
+    view = memoryview(buffer)
+    stamps = dict()  # type: Dict[int, List[Tuple[int, float]]]
+    foreign = 0
+    open_sockets = len(sockets)
+    while open_sockets:
+        for key, _ in selector.select():
+            length = key.fileobj.recv_into(buffer)
+            if not length:
+                selector.unregister(key.fileobj)
+                open_sockets -= 1
+                continue
+            decoded = decode_frame(view[:length])
+            index = None if decoded is None or decoded[4] is None else schedule.attribute(decoded[0], decoded[4][0])
+            if index is None or decoded[3] != schedule.origins[index].ids:
+                foreign += 1
+            else:
+                stamps.setdefault(index, []).append(decoded[4])
+    conn.send((stamps, foreign))
+
+
+def bench(number: int, rate: float, offset: float, count: int, seed: int) -> dict:
+    """
+    Flood the origins of a new schedule through unix socket pairs standing in for their interfaces, received by
+    another process
+    :param number: number of origins, one host each
+    :param rate: mean packets per second of an origin
+    :param offset: start offsets are drawn from 0 to this many seconds
+    :param count: number of frames sent by each origin
+    :param seed: random seed of the schedule
+    :return: measurements
+    """
+    schedule = plan(number, number, rate, 0.5, offset, count, time() + START_DELAY, seed=seed)
+    pairs = {origin.interface: socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM) for origin in schedule.origins}
+    parent, child = multiprocessing.Pipe()
+    receiver = multiprocessing.Process(target=receive, args=(schedule, [pair[1] for pair in pairs.values()], child))
+    receiver.start()
+
+    loop = asyncio.new_event_loop()
+    report, sent = loop.run_until_complete(run(schedule, {name: (pair[0], stand_in_mac(name))
+                                                          for name, pair in pairs.items()}))
+    loop.close()
+    for sock, _ in pairs.values():
+        sock.send(b'')
+    stamps, foreign = parent.recv()
+    receiver.join()
+    for sock, stand_in in pairs.values():
+        sock.close()
+        stand_in.close()
+
+    # Start and rate of each origin as stamped by the sender
+    start_error, rate_error = [], []
+    for index, origin in enumerate(schedule.origins):
+        send_times = np.array(sorted(stamp[1] for stamp in stamps.get(index, [])))
+        if len(send_times) > 1:
+            start_error.append(send_times[0] - schedule.start_time - origin.offset)
+            rate_error.append(abs((len(send_times) - 1) / (send_times[-1] - send_times[0]) / origin.rate - 1))
+    received = sum(len(set(stamp[0] for stamp in origin_stamps)) for origin_stamps in stamps.values())
+
+    return {'report': report, 'sent': sum(sent), 'received': received, 'foreign': foreign,
+            'start_p99': np.percentile(start_error, 99) if start_error else float('nan'),
+            'rate_max': max(rate_error) if rate_error else float('nan')}
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--number', help='Numbers of concurrent origins', type=int, nargs='*',
+                        default=[10, 100, 300])
+    parser.add_argument('-r', '--rate', help='Mean packets per second of an origin', type=float, default=50)
+    parser.add_argument('-o', '--offset', help='Start offsets are drawn from 0 to this many seconds', type=float,
+                        default=0.5)
+    parser.add_argument('-c', '--count', help='Number of packets sent by each origin', type=int, default=50)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_multi_flood.py [-n numbers_of_origins] [-r rate] [-o offset] [-c count] [-s seed]
+    """
+    args = parse_arguments()
+    failed = False
+    for num in args.number:
+        result = bench(num, args.rate, args.offset, args.count, args.seed)
+        report = result['report']
+        info_log(f'{num} origins: sent {result["sent"]} packets in {report.elapsed:.2f} s ({report.pps:.0f} pps), '
+                 f'lateness mean {report.jitter_mean * 1e6:.1f} us, p99 {report.jitter_p99 * 1e6:.1f} us, '
+                 f'max {report.jitter_max * 1e6:.1f} us')
+        info_log(f'{num} origins: {result["received"]} attributed, {result["foreign"]} foreign, stamped start p99 '
+                 f'{result["start_p99"] * 1e6:.1f} us late, worst rate error {result["rate_max"]:.3%}')
+        if result['received'] != num * args.count or result['foreign']:
+            error_log(f'{num} origins: {num * args.count - result["received"]} frames missing, '
+                      f'{result["foreign"]} not attributed to their origin')
+            failed = True
+
+    if failed:
+        sys.exit(1)
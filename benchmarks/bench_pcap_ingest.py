@@ -0,0 +1,134 @@
+import sys
+import os
+import struct
+import tempfile
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from bench_capture import make_frames  # noqa: E402
+from pcap_ingest import ingest, plan, read_pcap  # noqa: E402
+from routes import route_name  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import parse_result_file  # noqa: E402
+
+# Capture timestamp of the first frame, and gap between two frames in seconds
+START_TIME = 1700000000.0
+GAP = 0.0001
+
+
+def write_pcap(filename: str, frames: List[bytes], start_time: float) -> None:
+    """
+    Write frames into a pcap file with nanosecond timestamps GAP apart
+    :param filename: name of the pcap file
+    :param frames: list of raw Ethernet frames
+    :param start_time: capture timestamp of the first frame
+    :return: None
+    """
+    with open(filename, 'wb') as out_file:
+        out_file.write(struct.pack('<IHHiIII', 0xa1b23c4d, 2, 4, 0, 0, 65535, 1))
+        for i, frame in enumerate(frames):
+            nanoseconds = round((start_time + i * GAP) * 1e9)
+            out_file.write(struct.pack('<IIII', nanoseconds // 10 ** 9, nanoseconds % 10 ** 9, len(frame), len(frame)))
+            out_file.write(frame)
+
+
+def expected_rows(filename: str, start_time: float) -> dict:
+    """
+    Decode a pcap file with scapy and dissect() of receiver.py, as the scapy engine does
+    :param filename: name of the pcap file
+    :param start_time: capture timestamp at which Time is 0
+    :return: columns of the results
+    """
+    from scapy.layers.l2 import ARP, Ether
+    from receiver import dissect
+
+    rows = []
+    for timestamp, frame in read_pcap(filename):
+        pkt = Ether(bytes(frame))
+        decoded = dissect(pkt) if ARP in pkt else None
+        if decoded is not None and decoded[2] is not None:
+            rows.append((decoded[2], route_name(decoded[3][::-1]), timestamp - start_time))
+
+    return {'Num_of_switch': np.array([row[0] for row in rows]),
+            'IDs': np.array([row[1] for row in rows], dtype=object),
+            'Time': np.array([row[2] for row in rows])}
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--number', help='Number of pcap files', type=int, default=8)
+    parser.add_argument('-c', '--count', help='Number of frames in each pcap file', type=int, default=200000)
+    parser.add_argument('-a', '--arp', help='Ratio of broadcast ARP requests', type=float, default=0.5)
+    parser.add_argument('-w', '--workers', help='Numbers of processes to be compared', type=int, nargs='*',
+                        default=[1, os.cpu_count() or 1])
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_pcap_ingest.py [-n number_of_files] [-c count] [-a arp_ratio] [-w workers] [-s seed]
+    """
+    args = parse_arguments()
+    failed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pcap_dir = os.path.join(temp_dir, 'pcap')
+        os.makedirs(pcap_dir)
+        for i in range(args.number):
+            write_pcap(os.path.join(pcap_dir, f'h{i + 2}-eth0.pcap'), make_frames(args.count, args.arp, args.seed + i),
+                       START_TIME + i * GAP / 2)
+        size = sum(entry.stat().st_size for entry in os.scandir(pcap_dir))
+        info_log(f'{args.number} pcap file(s), {args.number * args.count} frames, {size / 2 ** 20:.1f} MiB')
+
+        for num_of_workers in dict.fromkeys(args.workers):
+            result_dir = os.path.join(temp_dir, f'results_{num_of_workers}')
+            start = perf_counter()
+            jobs = plan([os.path.join(pcap_dir, name) for name in sorted(os.listdir(pcap_dir))], None, result_dir,
+                        None)
+            rows = sum(report.rows for report in ingest(jobs, num_of_workers))
+            elapsed = perf_counter() - start
+            info_log(f'{num_of_workers} worker(s): {rows} rows in {elapsed:.2f} s, '
+                     f'{args.number * args.count / elapsed:.0f} frames/s, {size / 2 ** 20 / elapsed:.1f} MiB/s')
+
+        # The first file against scapy, as the receiver decodes it
+        expected = expected_rows(os.path.join(pcap_dir, 'h2-eth0.pcap'), START_TIME)
+        result = parse_result_file(os.path.join(result_dir, 'h2-eth0_0.csv'))
+        if any(not np.array_equal(expected[column], result[column]) for column in ('Num_of_switch', 'IDs')) or \
+                not np.allclose(expected['Time'], result['Time'], rtol=0, atol=1e-6):
+            error_log('pcap ingestion and scapy decode different results')
+            failed = True
+
+    if failed:
+        sys.exit(1)
+    info_log('pcap ingestion and scapy decode the same results')
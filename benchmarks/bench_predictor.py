@@ -0,0 +1,160 @@
+import sys
+import os
+import json
+import tempfile
+from argparse import ArgumentParser, Namespace
+from random import Random
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import load_coded_results  # noqa: E402
+from predictor import path_delay, predict, score, shortest_paths  # noqa: E402
+from simulator import flood_events, parse_topology, send_times, simulate, write_results  # noqa: E402
+
+# Processing delay of a switch in seconds
+PROCESSING = 0.001
+
+
+def make_config(num_of_switches: int, version: int, seed: int, probability: float) -> dict:
+    """
+    Build a random connected p4app.json topology with randomizer.py -r 2 link delays in memory
+    :param num_of_switches: number of switches
+    :param version: 0 for project.p4, 1 for project_v2.p4
+    :param seed: random seed of the links and delays
+    :param probability: probability of each link besides a ring through all switches
+    :return: content of p4app.json
+    """
+    rand = Random(seed)
+    pairs = {(i, (i + 1) % num_of_switches) for i in range(num_of_switches)}
+    pairs |= {(i, j) for i in range(num_of_switches) for j in range(i + 1, num_of_switches)
+              if rand.random() < probability}
+    links = [[f'h{i + 1}', f's{i + 1}'] for i in range(num_of_switches)]
+    links += [[f's{i + 1}', f's{j + 1}', {'delay': f'{rand.randint(0, 100)}ms'}] for i, j in sorted(pairs)]
+
+    return {'program': 'project_v2.p4' if version else 'project.p4',
+            'topology': {'links': links, 'hosts': {f'h{i + 1}': {} for i in range(num_of_switches)},
+                         'switches': {f's{i + 1}': {} for i in range(num_of_switches)}}}
+
+
+def check(config: dict, version: int, count: int) -> tuple:
+    """
+    Compare the prediction with the discrete-event flood of simulator.py without jitter
+    :param config: content of p4app.json
+    :param version: 0 for project.p4, 1 for project_v2.p4
+    :param count: number of packets sent in each of two rounds
+    :return: number of hosts, exact matches of the first and converged routes and worst delay delta in seconds
+    """
+    topology = parse_topology(config)
+    times = send_times(count, 2, 0.02, 1)
+    deliveries = flood_events(topology.delay, np.zeros((len(times), len(topology.switches))), times, 0, PROCESSING,
+                              version)
+    prediction = predict(topology, 0, PROCESSING, version)
+    order = np.lexsort((deliveries.time, deliveries.switch))
+    switch = deliveries.switch[order]
+    start = np.flatnonzero(np.r_[True, switch[1:] != switch[:-1]])
+    end = np.r_[start[1:], len(order)] - 1
+    paths = np.append(topology.ids, 0)[deliveries.path[order]]
+    first, last = paths[start], paths[end]
+    hosts = switch[start]
+    worst = np.nanmax(np.abs(path_delay(topology, first, deliveries.num_of_switch[order][start], PROCESSING) -
+                             prediction.arrival[hosts]))
+
+    return len(hosts), int((first == prediction.first_path[hosts]).all(axis=1).sum()), \
+        int((last == prediction.path[hosts]).all(axis=1).sum()), worst
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--number', help='Numbers of switches', type=int, nargs='*', default=[30, 100, 300])
+    parser.add_argument('-p', '--probability', help='Probability of each link besides a ring', type=float,
+                        default=0.1)
+    parser.add_argument('-ct', '--check-topologies', help='Number of random topologies compared with the event '
+                                                          'engine', type=int, default=50)
+    parser.add_argument('-t', '--trials', help='Number of simulated tests scored for each number of switches',
+                        type=int, default=10)
+    parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_predictor.py [-n numbers_of_switches] [-p probability] [-ct check_topologies]
+                 [-t trials] [-c count] [-s seed]
+    """
+    args = parse_arguments()
+    failed = False
+
+    # Predictions against the event engine, the routes only differ between paths of the same delay
+    for ver in (0, 1):
+        totals = np.zeros(3, dtype=np.int64)
+        worst_delta = 0.0
+        for idx in range(args.check_topologies):
+            *counts, delta = check(make_config(4 + idx % 27, ver, args.seed + idx, 0.3), ver, args.count)
+            totals += counts
+            worst_delta = max(worst_delta, delta)
+        info_log(f'v{ver + 1}: {totals[0]} hosts of {args.check_topologies} topologies, first route '
+                 f'{totals[1] / totals[0]:.1%}, converged route {totals[2] / totals[0]:.1%} exact, worst first arrival '
+                 f'delta {worst_delta * 1e3:.6f} ms')
+        if worst_delta > 1e-9:
+            error_log(f'v{ver + 1}: predicted first arrivals differ from the event engine')
+            failed = True
+
+    for number in args.number:
+        p4app = make_config(number, 1, args.seed, args.probability)
+        topo = parse_topology(p4app)
+        start_time = perf_counter()
+        shortest_paths(topo.delay + PROCESSING, np.arange(number))
+        all_pairs = perf_counter() - start_time
+        start_time = perf_counter()
+        predict(topo, 0, PROCESSING, 0)
+        single = perf_counter() - start_time
+
+        # Score simulated tests with jitter
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_file = os.path.join(temp_dir, 'p4app.json')
+            with open(config_file, 'w') as config_out:
+                json.dump(p4app, config_out)
+            result_dir = os.path.join(temp_dir, 'results')
+            send_time = send_times(args.count, 2, 0.02, 1)
+            write_results(simulate(topo, 1, 'h1', send_time, args.trials, args.seed, PROCESSING, 0.0005, False,
+                                   'numpy', 1), topo, result_dir)
+            coded = load_coded_results(result_dir, 1)
+            start_time = perf_counter()
+            scores, _ = score(coded, result_dir, 'h1', PROCESSING, config_file)
+            scoring = perf_counter() - start_time
+
+        info_log(f'{number} switches: all-pairs {all_pairs:.3f} s, one source {single * 1e3:.1f} ms, scored '
+                 f'{len(scores.host)} files in {scoring:.3f} s (converged route {scores.converged_match.mean():.1%} '
+                 f'exact with 0.5 ms jitter)')
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,122 @@
+import sys
+import os
+import json
+import tempfile
+from argparse import ArgumentParser, Namespace
+from random import randint
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from randomizer import TOPOLOGIES, randomize  # noqa: E402
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils', 'p4app.json.txt')
+
+
+def legacy_randomize(num_of_switches: int, out_dir: str) -> None:
+    """
+    Random full mesh written as the original randomize() did, with string concatenation and n switch_id_table
+    entries per switch
+    :param num_of_switches: number of switches
+    :param out_dir: output directory
+    :return: None
+    """
+    with open(TEMPLATE) as in_file:
+        data = json.load(in_file)
+    for i in range(num_of_switches):
+        file_content = 'mc_mgrp_create 1\n'
+        file_content += 'mc_node_create '
+        for j in range(num_of_switches + 1):
+            file_content += str(j)
+            if j != num_of_switches:
+                file_content += ' '
+            else:
+                file_content += '\n'
+        file_content += 'mc_node_associate 1 0\n'
+        for j in range(num_of_switches):
+            file_content += 'table_add switch_id_table get_switch_id ' + str(j + 1) + " => " + str(i + 1) + '\n'
+        file_content += 'table_add l2 add_myTtl_multicast ff:ff:ff:ff:ff:ff => ' + str(i + 1) + '\n'
+        file_content += 'table_add host_table remove_myTtl 1 =>\n'
+        filename = os.path.join(out_dir, 'runtime_commands', 's' + str(i + 1) + '-commands.txt')
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as out_file:
+            out_file.write(file_content)
+    for i in range(num_of_switches):
+        data['topology']['hosts']['h' + str(i + 1)] = {}
+        data['topology']['switches']['s' + str(i + 1)] = {
+            "cli_input": "./runtime_commands/s" + str(i + 1) + "-commands.txt", "program": 'project.p4'}
+    for i in range(num_of_switches):
+        data['topology']['links'].append(['h' + str(i + 1), 's' + str(i + 1)])
+    for i in range(num_of_switches):
+        for j in range(i + 1, num_of_switches):
+            data['topology']['links'].append(['s' + str(i + 1), 's' + str(j + 1),
+                                              {'delay': '{}ms'.format(randint(0, 100))}])
+    with open(os.path.join(out_dir, 'p4app.json'), 'w') as out_file:
+        json.dump(data, out_file)
+
+
+def get_size(dir_name: str) -> int:
+    """
+    Get the total size of the generated files
+    :param dir_name: output directory
+    :return: size in bytes
+    """
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(dir_name) for name in names)
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--number', help='Numbers of switches', type=int, nargs='*',
+                        default=[45, 125, 245, 500, 1000])
+    parser.add_argument('-t', '--topology', help='Topologies to be generated', type=str, nargs='*',
+                        choices=TOPOLOGIES + ['legacy'], default=TOPOLOGIES + ['legacy'])
+    parser.add_argument('-k', '--degree', help='Degree of each switch of a random regular graph', type=int, default=4)
+    parser.add_argument('-p', '--probability', help='Probability of each link of an Erdos-Renyi graph', type=float,
+                        default=0.05)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_randomizer.py [-n numbers_of_switches] [-t topologies] [-k degree] [-p probability]
+                 [-s seed]
+    """
+    args = parse_arguments()
+    devnull = open(os.devnull, 'w')
+    for num in args.number:
+        for topology in args.topology:
+            with tempfile.TemporaryDirectory() as directory:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    start = perf_counter()
+                    if topology == 'legacy':
+                        legacy_randomize(num, directory)
+                    else:
+                        randomize(0, 2, num, topology, args.seed, args.degree, args.probability, directory)
+                    elapsed = perf_counter() - start
+                except ValueError as e:
+                    elapsed = str(e)
+                finally:
+                    sys.stdout = stdout
+                if isinstance(elapsed, str):
+                    info_log(f'{num} switches, {topology}: skipped ({elapsed})')
+                    continue
+                info_log(f'{num} switches, {topology}: {elapsed * 1000:.1f} ms, '
+                         f'p4app.json {os.path.getsize(os.path.join(directory, "p4app.json")) / 1024:.0f} KiB, '
+                         f'all files {get_size(directory) / 1024:.0f} KiB')
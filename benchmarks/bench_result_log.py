@@ -0,0 +1,161 @@
+import sys
+import os
+import shutil
+import tempfile
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+from typing import Callable, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import list_result_files, load_coded_results, load_summaries, parse_result_file  # noqa: E402
+from bench_streaming_aggregation import generate  # noqa: E402
+from convert_results import convert  # noqa: E402
+from legacy import load_results  # noqa: E402
+from result_log import LOG_SUFFIX  # noqa: E402
+
+# Loaders of a result directory, each parses every file again
+LOADERS = {'load_results': lambda dir_name: load_results(dir_name, 1),
+           'load_coded_results': lambda dir_name: load_coded_results(dir_name, 1),
+           'load_summaries': lambda dir_name: load_summaries(dir_name, 1, True)}
+
+
+def disk_usage(dir_name: str) -> Tuple[int, int]:
+    """
+    Get the size of the files in the given directory
+    :param dir_name: name of the given directory
+    :return: apparent size and allocated size in bytes
+    """
+    with os.scandir(dir_name) as directory:
+        stats = [file.stat() for file in directory if file.is_file()]
+
+    return sum(stat.st_size for stat in stats), sum(stat.st_blocks * 512 for stat in stats)
+
+
+def timed(function: Callable[[str], object], dir_name: str, repeat: int) -> float:
+    """
+    Time the fastest of several runs of a loader
+    :param function: loader
+    :param dir_name: name of the result directory
+    :param repeat: number of runs
+    :return: elapsed seconds
+    """
+    elapsed = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function(dir_name)
+        elapsed.append(perf_counter() - start)
+
+    return min(elapsed)
+
+
+def same_results(csv_dir: str, log_dir: str) -> bool:
+    """
+    Check that every csv result and its result log hold the same columns
+    :param csv_dir: name of the directory of the csv results
+    :param log_dir: name of the directory of the result logs
+    :return: whether they are the same
+    """
+    for file in list_result_files(csv_dir):
+        expected = parse_result_file(file.path)
+        result = parse_result_file(os.path.join(log_dir, file.name[:-len('.csv')] + LOG_SUFFIX))
+        if any(not np.array_equal(expected[column], result[column]) for column in expected):
+            return False
+
+    return True
+
+
+def same_empty_route(temp_dir: str) -> bool:
+    """
+    Check that a packet without INT header, with 0 switches and empty IDs, keeps the empty route through the csv
+    results, the result logs and the route table of load_coded_results
+    :param temp_dir: name of a scratch directory
+    :return: whether the route stays empty
+    """
+    csv_dir, log_dir = os.path.join(temp_dir, 'empty_route'), os.path.join(temp_dir, 'empty_route_bin')
+    os.makedirs(csv_dir)
+    with open(os.path.join(csv_dir, 'h2-eth0_0.csv'), 'w') as out_file:
+        out_file.write('Num_of_switch,IDs,Time\n0,,0.5\n2,"1, 2",0.75\n')
+    convert(csv_dir, log_dir, 1)
+    coded = load_coded_results(log_dir, 1)
+
+    return same_results(csv_dir, log_dir) and coded.routes.names[coded.route_code[0]] == '' and \
+        coded.routes.ids[coded.route_code[0]] == ()
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-d', '--directories', help='Names of the result directories', type=str, nargs='*',
+                        default=['v1_30_results', 'v2_30_results'])
+    parser.add_argument('-g', '--generate', help='Size in MiB of a synthetic result directory to compare as well '
+                                                 '(0 to disable)', type=int, default=100)
+    parser.add_argument('-rp', '--repeat', help='Number of runs of each loader', type=int, default=3)
+    parser.add_argument('-s', '--seed', help='Random seed of the synthetic results', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_result_log.py [-d directories] [-g generate] [-rp repeat] [-s seed]
+    """
+    args = parse_arguments()
+    failed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directories = []
+        for name in args.directories:
+            directories.append(os.path.join(temp_dir, os.path.basename(name.rstrip('/'))))
+            shutil.copytree(name, directories[-1])
+        if args.generate > 0:
+            directories.append(os.path.join(temp_dir, f'synthetic_{args.generate}MiB'))
+            os.makedirs(directories[-1])
+            generate(directories[-1], args.generate * 2 ** 20, 10, 1000, 100000, args.seed)
+
+        for csv_dir in directories:
+            log_dir = csv_dir + '_bin'
+            convert(csv_dir, log_dir, 1)
+            name = os.path.basename(csv_dir)
+            (csv_size, csv_blocks), (log_size, log_blocks) = disk_usage(csv_dir), disk_usage(log_dir)
+            info_log(f'{name}: csv {csv_size / 2 ** 20:.2f} MiB ({csv_blocks / 2 ** 20:.2f} MiB on disk), '
+                     f'result log {log_size / 2 ** 20:.2f} MiB ({log_blocks / 2 ** 20:.2f} MiB on disk)')
+            for loader, function in LOADERS.items():
+                csv_time, log_time = timed(function, csv_dir, args.repeat), timed(function, log_dir, args.repeat)
+                info_log(f'{name}: {loader} csv {csv_time * 1e3:.1f} ms, result log {log_time * 1e3:.1f} ms '
+                         f'({csv_time / log_time:.1f}x)')
+            if not same_results(csv_dir, log_dir):
+                error_log(f'{name}: csv results and result logs hold different columns')
+                failed = True
+
+        if not same_empty_route(temp_dir):
+            error_log('The empty route of a packet without INT header differs between csv results and result logs')
+            failed = True
+
+    if failed:
+        sys.exit(1)
+    info_log('csv results and result logs hold the same columns')
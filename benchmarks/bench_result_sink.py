@@ -0,0 +1,82 @@
+import sys
+import os
+import tempfile
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from result_sink import ResultWriter  # noqa: E402
+
+
+def bench_result_sink(num_of_pkt: int, num_of_chunks: int, flush_rows: int) -> list:
+    """
+    Write synthetic results through the result writer and time each chunk of packets
+    :param num_of_pkt: number of packets to be written
+    :param num_of_chunks: number of chunks the packets are split into
+    :param flush_rows: flush after this many rows
+    :return: per-packet cost (in microseconds) of each chunk
+    """
+    chunk_size = num_of_pkt // num_of_chunks
+    costs = []
+    with tempfile.TemporaryDirectory() as directory:
+        writer = ResultWriter(os.path.join(directory, 'h2-eth0_0.csv'), flush_rows)
+        for chunk in range(num_of_chunks):
+            start = perf_counter()
+            for i in range(chunk * chunk_size, (chunk + 1) * chunk_size):
+                writer.write(3, '1, 12, 2', i * 0.001)
+            costs.append((perf_counter() - start) / chunk_size * 1e6)
+        writer.close()
+
+    return costs
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-c', '--count', help='Number of packets to be written', type=int, default=100000)
+    parser.add_argument('-k', '--chunks', help='Number of chunks to be timed', type=int, default=10)
+    parser.add_argument('-fr', '--flush-rows', help='Flush results after this many rows', type=int, default=1)
+    parser.add_argument('-t', '--threshold', help='Maximum ratio between the last and the first chunk', type=float,
+                        default=2.0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_result_sink.py [-c count] [-k chunks] [-fr flush_rows] [-t threshold]
+    """
+    args = parse_arguments()
+    per_chunk = bench_result_sink(args.count, args.chunks, args.flush_rows)
+    for idx, cost in enumerate(per_chunk):
+        info_log(f'Chunk {idx}: {cost:.2f} us/packet')
+
+    ratio = per_chunk[-1] / per_chunk[0]
+    info_log(f'Last/first chunk cost ratio: {ratio:.2f}')
+    if ratio > args.threshold:
+        error_log('Per-packet cost grows with the number of written packets')
+        sys.exit(1)
@@ -0,0 +1,188 @@
+import sys
+import os
+import tempfile
+from argparse import ArgumentParser, Namespace
+from collections import Counter
+from random import Random
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import get_host, get_serial_number, list_result_files, parse_result_file  # noqa: E402
+from bench_predictor import make_config  # noqa: E402
+from route_index import RouteIndex, link_load, load_index, postings, routes_through_link, routes_through_switch, \
+    routes_with_prefix  # noqa: E402
+from simulator import parse_topology, send_times, simulate, write_results  # noqa: E402
+
+# Rows of the results: host, test, route
+Rows = List[Tuple[str, int, Tuple[int, ...]]]
+
+
+def load_rows(dir_name: str) -> Tuple[Rows, Dict[Tuple[str, int], Tuple[int, ...]]]:
+    """
+    Parse the results row by row
+    :param dir_name: name of the results directory
+    :return: rows and the route of the first packet of each (host, test)
+    """
+    rows, first = [], dict()
+    for file in list_result_files(dir_name):
+        host, test_no = get_host(file.name), int(get_serial_number(file.name))
+        routes = [tuple(int(i) for i in name.split(',')) for name in parse_result_file(file.path)['IDs']]
+        rows.extend((host, test_no, route) for route in routes)
+        if routes:
+            first[host, test_no] = routes[0]
+
+    return rows, first
+
+
+def expected(rows: Rows, match) -> Counter:
+    """
+    Count the packets of the routes matching a query by scanning every row
+    :param rows: rows of the results
+    :param match: whether a route matches
+    :return: (host, test) -> packets
+    """
+    return Counter((host, test_no) for host, test_no, route in rows if match(route))
+
+
+def found(index: RouteIndex, routes: np.ndarray) -> Counter:
+    """
+    Count the packets of routes with the index
+    :param index: route index
+    :param routes: route codes
+    :return: (host, test) -> packets
+    """
+    matched = postings(index, routes)
+
+    return Counter({(str(index.hosts[host]), int(test_no)): int(count)
+                    for host, test_no, count in zip(matched.host, matched.test_no, matched.count)})
+
+
+def check(index: RouteIndex, rows: Rows, first: Dict[Tuple[str, int], Tuple[int, ...]], num_of_queries: int,
+          seed: int) -> List[str]:
+    """
+    Compare random queries and the link loads with a scan of every row
+    :param index: route index
+    :param rows: rows of the results
+    :param first: route of the first packet of each (host, test)
+    :param num_of_queries: number of queries of each kind
+    :param seed: random seed of the queries
+    :return: descriptions of the mismatches
+    """
+    rand = Random(seed)
+    routes = sorted({route for _, _, route in rows})
+    errors = []
+    for _ in range(num_of_queries):
+        route = rand.choice(routes)
+        switch = rand.choice(route)
+        if found(index, routes_through_switch(index, switch)) != expected(rows, lambda ids: switch in ids):
+            errors.append(f'switch {switch}')
+        if len(route) > 1:
+            hop = rand.randrange(len(route) - 1)
+            link = list(zip(route[:-1], route[1:]))[hop]
+            if found(index, routes_through_link(index, *link)) != \
+                    expected(rows, lambda ids: link in zip(ids[:-1], ids[1:])):
+                errors.append(f'link {link}')
+        prefix = route[:rand.randint(1, len(route))]
+        if found(index, routes_with_prefix(index, prefix)) != expected(rows, lambda ids: ids[:len(prefix)] == prefix):
+            errors.append(f'prefix {prefix}')
+
+    for first_only, weighted in ((False, [route for _, _, route in rows]), (True, list(first.values()))):
+        links = Counter(link for route in weighted for link in zip(route[:-1], route[1:]))
+        load = link_load(index, first_only)
+        if sum(links.values()) != load.sum() or any(load[link] != count for link, count in links.items()):
+            errors.append('link load of the first packets' if first_only else 'link load')
+
+    return errors
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--number', help='Numbers of switches', type=int, nargs='*', default=[30, 100])
+    parser.add_argument('-t', '--trials', help='Number of simulated tests for each number of switches', type=int,
+                        default=20)
+    parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
+    parser.add_argument('-q', '--queries', help='Number of random queries of each kind compared with a scan', type=int,
+                        default=50)
+    parser.add_argument('-w', '--workers', help='Number of processes parsing csv files', type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_route_index.py [-n numbers_of_switches] [-t trials] [-c count] [-q queries]
+                 [-w num_of_workers] [-s seed]
+    """
+    args = parse_arguments()
+    failed = False
+    for number in args.number:
+        topology = parse_topology(make_config(number, 0, args.seed, 0.1))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result_dir = os.path.join(temp_dir, 'results')
+            write_results(simulate(topology, 0, 'h1', send_times(args.count, 2, 0.02, 1), args.trials, args.seed,
+                                   0.001, 0.0005, False, 'numpy', 1), topology, result_dir)
+            start_time = perf_counter()
+            route_index = load_index(result_dir, args.workers)
+            built = perf_counter() - start_time
+            start_time = perf_counter()
+            load_index(result_dir, args.workers)
+            loaded = perf_counter() - start_time
+
+            # Queries of every switch and link
+            start_time = perf_counter()
+            for switch_id in range(route_index.num_of_ids):
+                postings(route_index, routes_through_switch(route_index, switch_id))
+            per_switch = (perf_counter() - start_time) / route_index.num_of_ids
+            start_time = perf_counter()
+            for key in route_index.link_key:
+                postings(route_index, routes_through_link(route_index, *divmod(int(key), route_index.num_of_ids)))
+            per_link = (perf_counter() - start_time) / max(len(route_index.link_key), 1)
+            start_time = perf_counter()
+            link_load(route_index)
+            load_time = perf_counter() - start_time
+
+            result_rows, first_rows = load_rows(result_dir)
+            mismatches = check(route_index, result_rows, first_rows, args.queries, args.seed)
+
+        info_log(f'{number} switches: {int(route_index.cell_count.sum())} packets, {len(route_index.route_len)} '
+                 f'routes, {len(route_index.node_switch)} trie nodes, build {built:.3f} s, reload {loaded * 1e3:.1f} '
+                 f'ms')
+        info_log(f'{number} switches: switch query {per_switch * 1e3:.3f} ms, link query {per_link * 1e3:.3f} ms, '
+                 f'link load matrix {load_time * 1e3:.3f} ms')
+        if mismatches:
+            error_log(f'{number} switches: index and scan differ for {", ".join(mismatches[:5])}')
+            failed = True
+
+    if failed:
+        sys.exit(1)
+    info_log('Index queries and link loads match a scan of every row')
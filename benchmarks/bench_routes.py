@@ -0,0 +1,100 @@
+import sys
+import os
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import count_routes, load_coded_results  # noqa: E402
+from legacy import load_results  # noqa: E402
+
+
+def bench_strings(dir_name: str) -> tuple:
+    """
+    Load results as string columns and count routes with a pandas groupby per host
+    :param dir_name: name of the given directory
+    :return: seconds to load and to count, peak and retained bytes, (host, route) -> occurrences
+    """
+    tracemalloc.start()
+    start = perf_counter()
+    aggregation_result, _, _ = load_results(dir_name, 1)
+    loaded = perf_counter()
+    counts = {(host, route): count for host, result in aggregation_result.items()
+              for route, count in result.groupby('IDs')['Time'].count().items()}
+    elapsed = (loaded - start, perf_counter() - loaded)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    retained = sum(result.memory_usage(deep=True).sum() for result in aggregation_result.values())
+
+    return elapsed, peak, retained, counts
+
+
+def bench_codes(dir_name: str) -> tuple:
+    """
+    Load results as integer-coded columns and count routes with one bincount
+    :param dir_name: name of the given directory
+    :return: seconds to load and to count, peak and retained bytes, (host, route) -> occurrences
+    """
+    tracemalloc.start()
+    start = perf_counter()
+    coded = load_coded_results(dir_name, 1)
+    loaded = perf_counter()
+    occurrences = count_routes(coded)
+    elapsed = (loaded - start, perf_counter() - loaded)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    retained = sum(column.nbytes for column in coded[2:]) + sum(sys.getsizeof(name) for name in coded.routes.names)
+    counts = {(coded.hosts[host], coded.routes.names[route]): int(occurrences[host, route])
+              for host, route in zip(*occurrences.nonzero())}
+
+    return elapsed, peak, retained, counts
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-d', '--directory', help='Names of the result directories', type=str, nargs='*',
+                        default=['v1_30_results', 'v2_30_results'])
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_routes.py [-d names_of_the_directories]
+    """
+    args = parse_arguments()
+    for name in args.directory:
+        string_time, string_peak, string_size, string_counts = bench_strings(name)
+        code_time, code_peak, code_size, code_counts = bench_codes(name)
+        if string_counts != code_counts:
+            error_log(f'{name}: bincount and groupby give different counts')
+            sys.exit(1)
+        info_log(f'{name}: strings load {string_time[0] * 1e3:.1f} ms, groupby {string_time[1] * 1e3:.2f} ms, '
+                 f'peak {string_peak / 2 ** 20:.2f} MiB, columns {string_size / 2 ** 20:.2f} MiB')
+        info_log(f'{name}: codes   load {code_time[0] * 1e3:.1f} ms, bincount {code_time[1] * 1e3:.2f} ms, '
+                 f'peak {code_peak / 2 ** 20:.2f} MiB, columns {code_size / 2 ** 20:.2f} MiB')
@@ -0,0 +1,118 @@
+import sys
+import os
+from argparse import ArgumentParser, Namespace
+from random import Random
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from simulator import Deliveries, Topology, parse_topology, send_times, simulate  # noqa: E402
+
+
+def make_topology(num_of_switches: int, version: int, seed: int) -> Topology:
+    """
+    Build the full mesh of randomizer.py -r 2 in memory
+    :param num_of_switches: number of switches
+    :param version: 0 for project.p4, 1 for project_v2.p4
+    :param seed: random seed of the link delays
+    :return: topology
+    """
+    rand = Random(seed)
+    links = [[f'h{i + 1}', f's{i + 1}'] for i in range(num_of_switches)]
+    links += [[f's{i + 1}', f's{j + 1}', {'delay': f'{rand.randint(0, 100)}ms'}]
+              for i in range(num_of_switches) for j in range(i + 1, num_of_switches)]
+
+    return parse_topology({'program': 'project_v2.p4' if version else 'project.p4',
+                           'topology': {'links': links,
+                                        'hosts': {f'h{i + 1}': {} for i in range(num_of_switches)},
+                                        'switches': {f's{i + 1}': {} for i in range(num_of_switches)}}})
+
+
+def same_deliveries(first: Deliveries, second: Deliveries) -> bool:
+    """
+    Check whether two engines delivered the same packets over the same paths at the same times
+    :param first: deliveries of one engine
+    :param second: deliveries of the other engine
+    :return: whether they are the same
+    """
+    if len(first.time) != len(second.time):
+        return False
+    first_order = np.lexsort((first.time, first.packet, first.switch, first.trial))
+    second_order = np.lexsort((second.time, second.packet, second.switch, second.trial))
+
+    return all(np.array_equal(getattr(first, field)[first_order], getattr(second, field)[second_order])
+               for field in ('trial', 'switch', 'packet', 'num_of_switch', 'path')) and \
+        np.allclose(first.time[first_order], second.time[second_order], rtol=0, atol=1e-9)
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--number', help='Numbers of switches', type=int, nargs='*', default=[10, 30, 100, 300])
+    parser.add_argument('-t', '--trials', help='Number of trials simulated by the NumPy engine', type=int,
+                        default=1000)
+    parser.add_argument('-ct', '--check-trials', help='Number of trials compared with the event engine', type=int,
+                        default=5)
+    parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
+    parser.add_argument('-w', '--workers', help='Number of processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_simulator.py [-n numbers_of_switches] [-t trials] [-ct check_trials] [-c count]
+                 [-w workers] [-s seed]
+    """
+    args = parse_arguments()
+    times = send_times(args.count, 2, 0.02, 1)
+    failed = False
+    for num in args.number:
+        for ver in (0, 1):
+            topo = make_topology(num, ver, args.seed)
+            options = (args.seed, 0.001, 0.0005, True)
+
+            # Cross-check the NumPy engine with the discrete-event reference
+            start = perf_counter()
+            reference = simulate(topo, ver, 'h1', times, args.check_trials, *options, 'event', 1)
+            event_time = perf_counter() - start
+            if not same_deliveries(simulate(topo, ver, 'h1', times, args.check_trials, *options, 'numpy', 1),
+                                   reference):
+                error_log(f'Version {ver + 1}, {num} switches: NumPy and event engines deliver different packets')
+                failed = True
+
+            start = perf_counter()
+            result = simulate(topo, ver, 'h1', times, args.trials, *options, 'numpy', args.workers)
+            numpy_time = perf_counter() - start
+            info_log(f'Version {ver + 1}, {num} switches: event {args.check_trials / event_time:.1f} trials/s, '
+                     f'NumPy {args.trials / numpy_time:.1f} trials/s ({args.trials} trials in {numpy_time:.2f} s, '
+                     f'{len(result.time)} packets received)')
+
+    if failed:
+        sys.exit(1)
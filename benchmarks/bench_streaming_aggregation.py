@@ -0,0 +1,168 @@
+import sys
+import os
+import json
+import subprocess
+import tempfile
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+from typing import List, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+UTILS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils')
+sys.path.insert(0, UTILS)
+from aggregator import Totals, load_summaries, merge_summary_totals, stream_summaries  # noqa: E402
+
+# Streams the given directory and prints its totals and its peak RSS as json
+STREAMER = '''
+import sys
+import json
+from aggregator import stream_summaries
+totals = stream_summaries(sys.argv[1], 1, int(sys.argv[2]))
+with open('/proc/self/status') as in_file:
+    peak = next(int(line.split()[1]) * 1024 for line in in_file if line.startswith('VmHWM:'))
+json.dump([totals._asdict(), peak], sys.stdout)
+'''
+
+
+def make_routes(num_of_routes: int, rand: np.random.Generator) -> List[str]:
+    """
+    Generate distinct routes of 1 to 10 switches
+    :param num_of_routes: number of routes
+    :param rand: random generator
+    :return: routes as stored in the IDs column
+    """
+    routes = set()
+    while len(routes) < num_of_routes:
+        routes.add(', '.join(str(i) for i in rand.integers(1, 31, rand.integers(1, 11))))
+
+    return sorted(routes)
+
+
+def generate(dir_name: str, size: int, num_of_hosts: int, num_of_routes: int, num_of_rows: int, seed: int) -> Totals:
+    """
+    Write csv results of about the given size, one file per host and test, and keep the exact totals on the way
+    :param dir_name: name of the result directory
+    :param size: size of the results in bytes
+    :param num_of_hosts: number of hosts
+    :param num_of_routes: number of distinct routes of each host
+    :param num_of_rows: number of rows of each file
+    :param seed: random seed
+    :return: expected totals
+    """
+    rand = np.random.default_rng(seed)
+    routes = np.array(make_routes(num_of_routes, rand), dtype=object)
+    switches = np.array([route.count(',') + 1 for route in routes], dtype=np.int64)
+    expected = Totals(dict(), dict(), dict())
+    written = 0
+    test = 0
+    while written < size:
+        for host in (f'h{i}-eth0' for i in range(2, num_of_hosts + 2)):
+            codes = rand.integers(0, num_of_routes, num_of_rows)
+            times = np.sort(rand.random(num_of_rows)) * 60 + test * 60
+            path = os.path.join(dir_name, f'{host}_{test}.csv')
+            DataFrame({'Num_of_switch': switches[codes], 'IDs': routes[codes], 'Time': times}) \
+                .to_csv(path, index=False, float_format='%.6f')
+            written += os.path.getsize(path)
+
+            count = expected.route_count.setdefault(host, dict())
+            for code, occurrences in enumerate(np.bincount(codes, minlength=num_of_routes)):
+                if occurrences:
+                    count[routes[code]] = count.get(routes[code], 0) + int(occurrences)
+            expected.pkt_in_each_test.setdefault(host, dict())[str(test)] = num_of_rows
+            time_range = expected.time_range.setdefault(host, [float(f'{times[0]:.6f}'), 0])
+            time_range[1] = float(f'{times[-1]:.6f}')
+        test += 1
+
+    return expected
+
+
+def stream_in_child(dir_name: str, chunk_size: int) -> Tuple[float, int, Totals]:
+    """
+    Stream the given directory in a child process
+    :param dir_name: name of the result directory
+    :param chunk_size: number of rows of a chunk
+    :return: elapsed seconds, peak RSS of the child in bytes and totals
+    """
+    start = perf_counter()
+    output = subprocess.run([sys.executable, '-c', STREAMER, dir_name, str(chunk_size)], check=True,
+                            stdout=subprocess.PIPE, env=dict(os.environ, PYTHONPATH=UTILS)).stdout
+    totals, peak = json.loads(output)
+
+    return perf_counter() - start, peak, Totals(**totals)
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-g', '--gib', help='Size of the synthetic results in GiB', type=float, default=2)
+    parser.add_argument('-n', '--number', help='Number of hosts', type=int, default=10)
+    parser.add_argument('-r', '--routes', help='Number of distinct routes of each host', type=int, default=1000)
+    parser.add_argument('-cs', '--chunk-size', help='Number of rows of a chunk', type=int, default=200000)
+    parser.add_argument('-m', '--memory', help='Memory ceiling of the streaming aggregation in MiB', type=int,
+                        default=512)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_streaming_aggregation.py [-g gib] [-n number_of_hosts] [-r routes] [-cs chunk_size]
+                 [-m memory] [-s seed]
+    """
+    args = parse_arguments()
+    failed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Streaming and in-memory aggregation of a small tree agree
+        small = os.path.join(temp_dir, 'small')
+        os.makedirs(small)
+        generate(small, 2 ** 20, 3, 50, 10000, args.seed)
+        if stream_summaries(small, 1, 1000) != merge_summary_totals(load_summaries(small, 1, True)):
+            error_log('Streaming and in-memory aggregation give different totals')
+            failed = True
+
+        # Streaming an archive-scale tree stays under the memory ceiling
+        large = os.path.join(temp_dir, 'large')
+        os.makedirs(large)
+        start = perf_counter()
+        truth = generate(large, int(args.gib * 2 ** 30), args.number, args.routes, 1000000, args.seed)
+        info_log(f'Generated {args.gib:g} GiB, {sum(map(sum, map(dict.values, truth.pkt_in_each_test.values())))} '
+                 f'rows in {perf_counter() - start:.1f} s')
+        seconds, memory, totals = stream_in_child(large, args.chunk_size)
+        info_log(f'Streamed in {seconds:.1f} s, peak RSS {memory / 2 ** 20:.1f} MiB')
+
+    if totals != truth:
+        error_log('Streaming aggregation gives different totals from the generated ones')
+        failed = True
+    if memory > args.memory * 2 ** 20:
+        error_log(f'Streaming aggregation exceeds the memory ceiling of {args.memory} MiB')
+        failed = True
+    if failed:
+        sys.exit(1)
+    info_log('Streaming aggregation matches the generated and in-memory totals')
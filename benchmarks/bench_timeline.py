@@ -0,0 +1,126 @@
+import sys
+import os
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+from typing import Dict, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from timeline import Timeline, route_timeline  # noqa: E402
+
+
+def make_events(num_of_events: int, num_of_routes: int, duration: float, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Generate deterministic (route, time) events
+    :param num_of_events: number of events
+    :param num_of_routes: number of distinct routes
+    :param duration: seconds covered by the events
+    :param seed: random seed
+    :return: route and time of each event
+    """
+    rand = np.random.RandomState(seed)
+    routes = np.array([f'1, {i + 2}, {i + 3}' for i in range(num_of_routes)], dtype=object)
+
+    return routes[rand.randint(0, num_of_routes, num_of_events)], np.sort(rand.uniform(0, duration, num_of_events))
+
+
+def legacy_timeline(ids: np.ndarray, times: np.ndarray, bin_width: float) -> Dict[str, np.ndarray]:
+    """
+    Per-route loop of the original draw_first_results, one dense array per route
+    :param ids: route of each event
+    :param times: time of each event
+    :param bin_width: width of a bin in seconds
+    :return: route -> 0/1 value of each bin
+    """
+    minimum = min(times)
+    x_coord = np.arange(minimum, max(times) + bin_width, bin_width, dtype=float)
+    occupancy = dict()
+    for i in np.unique(ids):
+        y_coord = np.zeros(x_coord.shape, dtype=int)
+        for t in times[ids == i]:
+            y_coord[int((t - minimum) / bin_width)] = 1
+        occupancy[i] = y_coord
+
+    return occupancy
+
+
+def same_occupancy(timeline: Timeline, occupancy: Dict[str, np.ndarray]) -> bool:
+    """
+    Check whether the runs of the timeline cover exactly the occupied bins of the dense arrays
+    :param timeline: timeline of the routes
+    :param occupancy: route -> 0/1 value of each bin
+    :return: whether they are the same
+    """
+    for code, route in enumerate(timeline.routes):
+        selected = timeline.run_route == code
+        bins = np.concatenate([np.arange(start, end) for start, end in
+                               zip(timeline.run_start[selected], timeline.run_end[selected])])
+        if not np.array_equal(bins, np.flatnonzero(occupancy[route])):
+            return False
+
+    return True
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-c', '--count', help='Number of events', type=int, default=100000)
+    parser.add_argument('-n', '--routes', help='Number of distinct routes', type=int, default=50)
+    parser.add_argument('-d', '--duration', help='Seconds covered by the events', type=float, nargs='*',
+                        default=[10, 60])
+    parser.add_argument('-bw', '--bin-width', help='Width of a bin in milliseconds', type=float, default=1)
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 bench_timeline.py [-c count] [-n routes] [-d durations] [-bw bin_width] [-s seed]
+    """
+    args = parse_arguments()
+    width = args.bin_width / 1000
+    for seconds in args.duration:
+        route_ids, event_times = make_events(args.count, args.routes, seconds, args.seed)
+
+        start = perf_counter()
+        dense = legacy_timeline(route_ids, event_times, width)
+        legacy_time = perf_counter() - start
+
+        start = perf_counter()
+        runs = route_timeline(route_ids, event_times, width)
+        vectorized_time = perf_counter() - start
+
+        if not same_occupancy(runs, dense):
+            error_log(f'{seconds:g} s: vectorized timeline differs from the per-route loop')
+            sys.exit(1)
+        dense_bytes = sum(y_coord.nbytes for y_coord in dense.values())
+        run_bytes = sum(array.nbytes for array in runs[3:])
+        info_log(f'{seconds:g} s: loop {legacy_time * 1e3:.1f} ms / {dense_bytes / 2 ** 20:.1f} MiB, '
+                 f'vectorized {vectorized_time * 1e3:.1f} ms / {run_bytes / 2 ** 20:.1f} MiB '
+                 f'({len(runs.run_route)} runs)')
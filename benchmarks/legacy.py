@@ -0,0 +1,57 @@
+import sys
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import RESULT_COLUMNS, get_host, get_serial_number, list_result_files, merge_summary_totals, \
+    parse_in_pool, parse_result_file  # noqa: E402
+
+# In-memory loaders the aggregator used before it aggregated summaries, kept as the reference of the benchmarks
+
+# All results of each host, first result of each host and number of received packets in each test
+Results = Tuple[Dict[str, DataFrame], Dict[str, DataFrame], Dict[str, Dict[str, int]]]
+
+
+def load_results(dir_name: str, num_of_workers: int) -> Results:
+    """
+    Parse the csv results in the given directory with a process pool and concatenate them once per host
+    :param dir_name: name of the given directory
+    :param num_of_workers: number of processes parsing csv files (<= 1 to parse in this process)
+    :return: all results of each host, first result of each host and number of received packets in each test
+    """
+    files = list_result_files(dir_name)
+    columns = parse_in_pool(parse_result_file, [file.path for file in files], num_of_workers)
+
+    results_of_host = dict()
+    zero_serial_number_csv = dict()
+    pkt_in_each_test = dict()
+    for file, result in zip(files, columns):
+        host = get_host(file.name)
+        serial_number = get_serial_number(file.name)
+        results_of_host.setdefault(host, []).append(result)
+
+        if serial_number == '0':
+            zero_serial_number_csv[host] = DataFrame(result, columns=RESULT_COLUMNS)
+
+        # Get number of received packets in each test
+        pkt_in_each_test.setdefault(host, dict())[serial_number] = len(result['Time'])
+
+    aggregation_result = {host: DataFrame({column: np.concatenate([result[column] for result in results])
+                                           for column in RESULT_COLUMNS})
+                          for host, results in results_of_host.items()}
+
+    return aggregation_result, zero_serial_number_csv, pkt_in_each_test
+
+
+def merge_summaries(summaries: Dict[str, dict]) -> Tuple[Dict[str, Dict[str, int]], Dict[str, Dict[str, int]]]:
+    """
+    Merge file summaries into totals of each host
+    :param summaries: file name -> summary
+    :return: occurrences of each route on each host and number of received packets on each host in each test
+    """
+    totals = merge_summary_totals(summaries)
+
+    return totals.route_count, totals.pkt_in_each_test
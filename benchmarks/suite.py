@@ -0,0 +1,372 @@
+import sys
+import os
+import json
+import platform
+import tempfile
+from argparse import ArgumentParser, Namespace
+from contextlib import redirect_stdout
+from functools import lru_cache
+from math import ceil
+from statistics import median
+from time import perf_counter, time
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import aggregate, load_coded_results  # noqa: E402
+from predictor import format_table  # noqa: E402
+from randomizer import randomize  # noqa: E402
+from workloads import make_id_lists, make_int_frames, make_result_tree  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+import receiver  # noqa: E402
+from flood import build_frame  # noqa: E402
+from header import IntHeader  # noqa: E402
+from int_codec import STAMP, STAMP_MAGIC, decode_batch, encode  # noqa: E402
+from scapy.layers.l2 import ARP, Ether  # noqa: E402
+from scapy.packet import Raw  # noqa: E402
+
+# Version of the json results, bumped when the workloads change so that older baselines are not compared
+SUITE_VERSION = 1
+
+# Length of the Ethernet and ARP headers in front of the IntHeader
+ARP_FRAME_SIZE = 42
+
+
+class Case(NamedTuple):
+    """
+    Workload of a benchmark, built once and timed on every repeat
+    """
+    run: Callable[[], object]
+    items: int
+
+
+def receiver_case(work_dir: str, seed: int, engine: str, num_of_frames: int) -> Case:
+    """
+    Decode received frames and store their routes as receiver.py does, into csv results of a scratch directory
+    :param work_dir: scratch directory
+    :param seed: random seed of the frames
+    :param engine: 'raw' or 'scapy' decoding
+    :param num_of_frames: number of frames
+    :return: case
+    """
+    frames = make_int_frames(num_of_frames, seed)
+    result_dir = os.path.join(work_dir, 'results')
+    os.makedirs(result_dir, exist_ok=True)
+    receiver.route_table, receiver.tracker, receiver.schedule = receiver.RouteTable(), None, None
+    receiver.flush_rows, receiver.flush_time, receiver.latency, receiver.result_format = 1000, 0, False, 'csv'
+
+    def run() -> None:
+        receiver.number, receiver.writer = -1, None
+        for frame in frames:
+            decoded = receiver.decode(frame, engine)
+            if decoded is not None:
+                receiver.store('h1-eth0', result_dir, 0.0, *decoded)
+        receiver.writer.close()
+
+    return Case(run, num_of_frames)
+
+
+def int_header_case(seed: int, num_of_frames: int) -> Case:
+    """
+    Dissect the IntHeader of received frames with scapy
+    :param seed: random seed of the frames
+    :param num_of_frames: number of frames
+    :return: case
+    """
+    payloads = [frame[ARP_FRAME_SIZE:] for frame in make_int_frames(num_of_frames, seed)]
+
+    return Case(lambda: [IntHeader(payload).id for payload in payloads], num_of_frames)
+
+
+def decode_batch_case(seed: int, num_of_frames: int) -> Case:
+    """
+    Decode the IntHeader of received frames in one NumPy batch
+    :param seed: random seed of the frames
+    :param num_of_frames: number of frames
+    :return: case
+    """
+    payloads = [frame[ARP_FRAME_SIZE:] for frame in make_int_frames(num_of_frames, seed)]
+
+    return Case(lambda: decode_batch(payloads), num_of_frames)
+
+
+def build_frame_case(seed: int, num_of_frames: int) -> Case:
+    """
+    Serialize the frames of sender.py -m raw
+    :param seed: random seed of the IDs
+    :param num_of_frames: number of frames
+    :return: case
+    """
+    id_lists = make_id_lists(num_of_frames, seed)
+
+    return Case(lambda: [build_frame(b'\x00\x00\x0a\x00\x01\x01', '10.0.1.1', '10.0.0.1', ids) for ids in id_lists],
+                num_of_frames)
+
+
+def scapy_packet_case(seed: int, num_of_frames: int) -> Case:
+    """
+    Build and serialize the packets of sender.py -m scapy
+    :param seed: random seed of the IDs
+    :param num_of_frames: number of frames
+    :return: case
+    """
+    id_lists = make_id_lists(num_of_frames, seed)
+
+    return Case(lambda: [bytes(Ether(dst='ff:ff:ff:ff:ff:ff') / ARP(op=1, psrc='10.0.1.1', pdst='10.0.0.1') /
+                               Raw(encode(ids, proto=0x0800))) for ids in id_lists], num_of_frames)
+
+
+def stamp_case(num_of_frames: int) -> Case:
+    """
+    Stamp the sequence number and send time into every copy, as flood() does before each send
+    :param num_of_frames: number of copies
+    :return: case
+    """
+    frame, stamp_offset = build_frame(b'\x00\x00\x0a\x00\x01\x01', '10.0.1.1', '10.0.0.1', list(range(1, 11)))
+    buffer = bytearray(frame)
+
+    def run() -> None:
+        for sequence in range(num_of_frames):
+            STAMP.pack_into(buffer, stamp_offset, STAMP_MAGIC, sequence, time())
+
+    return Case(run, num_of_frames)
+
+
+def randomize_case(work_dir: str, seed: int, num_of_switches: int) -> Case:
+    """
+    Generate p4app.json and the runtime commands of a random full mesh
+    :param work_dir: scratch directory
+    :param seed: random seed of the delays
+    :param num_of_switches: number of switches
+    :return: case
+    """
+    out_dir = os.path.join(work_dir, f'randomizer_{num_of_switches}')
+    os.makedirs(out_dir, exist_ok=True)
+
+    return Case(lambda: randomize(1, 2, num_of_switches, 'mesh', seed, out_dir=out_dir), 1)
+
+
+@lru_cache(maxsize=None)
+def result_tree(work_dir: str, seed: int, scale: int) -> Tuple[str, int]:
+    """
+    Get the synthetic result tree of a scale, written on first use
+    :param work_dir: scratch directory
+    :param seed: random seed of the routes
+    :param scale: number of copies of every test of v2_30_results
+    :return: name of the result directory and number of rows
+    """
+    dir_name = os.path.join(work_dir, f'results_x{scale}')
+
+    return dir_name, make_result_tree(dir_name, scale, seed)[1]
+
+
+def aggregate_case(work_dir: str, seed: int, scale: int) -> Case:
+    """
+    Aggregate a result tree shaped like v2_30_results without cache and draw the figures off screen
+    :param work_dir: scratch directory
+    :param seed: random seed of the routes
+    :param scale: number of copies of every test of v2_30_results
+    :return: case
+    """
+    dir_name, num_of_rows = result_tree(work_dir, seed, scale)
+
+    def run() -> None:
+        aggregate(dir_name, 5, 2, 1, True, 0.001)
+        plt.close('all')
+
+    return Case(run, num_of_rows)
+
+
+def coded_case(work_dir: str, seed: int, scale: int) -> Case:
+    """
+    Load a result tree shaped like v2_30_results into integer-coded columns
+    :param work_dir: scratch directory
+    :param seed: random seed of the routes
+    :param scale: number of copies of every test of v2_30_results
+    :return: case
+    """
+    dir_name, num_of_rows = result_tree(work_dir, seed, scale)
+
+    return Case(lambda: load_coded_results(dir_name, 1), num_of_rows)
+
+
+def make_benchmarks(scales: List[int]) -> Dict[str, Callable[[str, int], Case]]:
+    """
+    Get the benchmarks of the hot paths
+    :param scales: scales of the result trees
+    :return: name -> function building the case from a scratch directory and a seed
+    """
+    benchmarks = {'receiver.handler.raw': lambda work_dir, seed: receiver_case(work_dir, seed, 'raw', 5000),
+                  'receiver.handler.scapy': lambda work_dir, seed: receiver_case(work_dir, seed, 'scapy', 500),
+                  'header.IntHeader': lambda work_dir, seed: int_header_case(seed, 2000),
+                  'int_codec.decode_batch': lambda work_dir, seed: decode_batch_case(seed, 20000),
+                  'sender.build_frame': lambda work_dir, seed: build_frame_case(seed, 20000),
+                  'sender.scapy_packet': lambda work_dir, seed: scapy_packet_case(seed, 500),
+                  'sender.stamp': lambda work_dir, seed: stamp_case(100000),
+                  'randomizer.randomize': lambda work_dir, seed: randomize_case(work_dir, seed, 30)}
+    for scale in scales:
+        benchmarks[f'aggregator.aggregate[x{scale}]'] = \
+            lambda work_dir, seed, scale=scale: aggregate_case(work_dir, seed, scale)
+        benchmarks[f'aggregator.load_coded_results[x{scale}]'] = \
+            lambda work_dir, seed, scale=scale: coded_case(work_dir, seed, scale)
+
+    return benchmarks
+
+
+def run_suite(benchmarks: Dict[str, Callable[[str, int], Case]], repeat: int, min_time: float, seed: int) -> dict:
+    """
+    Build every case once in a scratch directory, run it once to warm up and to calibrate the number of runs of a
+    repeat, like timeit, then time it repeat times. The logs of the benchmarked code are discarded.
+    :param benchmarks: name -> function building the case
+    :param repeat: number of timed repeats of each case
+    :param min_time: minimum seconds of a repeat
+    :param seed: random seed of the workloads
+    :return: results, with the best and median seconds per item of each benchmark
+    """
+    results = dict()
+    with tempfile.TemporaryDirectory() as work_dir, open(os.devnull, 'w') as devnull:
+        for name, make_case in benchmarks.items():
+            with redirect_stdout(devnull):
+                case = make_case(work_dir, seed)
+                start_time = perf_counter()
+                case.run()
+                number = max(1, ceil(min_time / (perf_counter() - start_time)))
+                elapsed = []
+                for _ in range(repeat):
+                    start_time = perf_counter()
+                    for _ in range(number):
+                        case.run()
+                    elapsed.append((perf_counter() - start_time) / number / case.items)
+            results[name] = {'items': case.items, 'number': number, 'best': min(elapsed), 'median': median(elapsed)}
+            info_log(f'{name}: {case.items} item(s) x {number} run(s), best {min(elapsed) * 1e6:.3f} us, median '
+                     f'{median(elapsed) * 1e6:.3f} us per item')
+
+    return {'version': SUITE_VERSION, 'seed': seed, 'repeat': repeat, 'python': platform.python_version(),
+            'numpy': np.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count(), 'results': results}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> Tuple[List[List[str]], List[str]]:
+    """
+    Compare the best seconds per item of the benchmarks run in both results
+    :param baseline: baseline results
+    :param current: current results
+    :param threshold: slowdown ratio above which a benchmark regressed, e.g. 0.25 for 25 % slower
+    :return: rows of the comparison and names of the regressed benchmarks
+    """
+    rows, regressions = [], []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            rows.append([name, 'n/a', f'{result["best"] * 1e6:.3f}', 'n/a', 'new'])
+            continue
+        before, after = base['best'], result['best']
+        ratio = after / before
+        regressed = ratio > 1 + threshold
+        if regressed:
+            regressions.append(name)
+        rows.append([name, f'{before * 1e6:.3f}', f'{after * 1e6:.3f}', f'{ratio:.2f}x',
+                     'REGRESSED' if regressed else 'faster' if ratio < 1 / (1 + threshold) else 'ok'])
+
+    return rows, regressions
+
+
+def load_results(filename: str) -> dict:
+    """
+    Load the results of the suite
+    :param filename: name of the json file
+    :return: results
+    """
+    with open(filename) as in_file:
+        return json.load(in_file)
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-k', '--keyword', help='Only run the benchmarks whose name contains one of these', type=str,
+                        nargs='*', default=None)
+    parser.add_argument('-sc', '--scales', help='Scales of the result trees shaped like v2_30_results', type=int,
+                        nargs='*', default=[10, 100])
+    parser.add_argument('-r', '--repeat', help='Number of timed repeats of each benchmark', type=int, default=3)
+    parser.add_argument('-mt', '--min-time', help='Minimum seconds of a repeat, short benchmarks run several times',
+                        type=float, default=0.2)
+    parser.add_argument('-s', '--seed', help='Random seed of the workloads', type=int, default=0)
+    parser.add_argument('-i', '--input', help='Compare these json results instead of running the suite', type=str,
+                        default=None)
+    parser.add_argument('-o', '--output', help='Write the results into this json file, e.g. a new baseline', type=str,
+                        default=None)
+    parser.add_argument('-c', '--compare', help='Baseline json results to compare with, exit with 1 on regressions',
+                        type=str, default=None)
+    parser.add_argument('-t', '--threshold', help='Slowdown ratio of a regression, e.g. 0.25 for 25%% slower',
+                        type=float, default=0.25)
+    parser.add_argument('-l', '--list', help='List the benchmarks and exit', action='store_true')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 suite.py [-k keywords] [-sc scales] [-r repeat] [-mt min_time] [-s seed] [-i input] [-o output]
+                 [-c baseline] [-t threshold] [-l]
+    """
+    args = parse_arguments()
+    all_benchmarks = make_benchmarks(args.scales)
+    selected = {name: make for name, make in all_benchmarks.items()
+                if not args.keyword or any(keyword in name for keyword in args.keyword)}
+    if args.list:
+        for bench_name in selected:
+            info_log(bench_name)
+        sys.exit(0)
+
+    suite_results = load_results(args.input) if args.input else \
+        run_suite(selected, args.repeat, args.min_time, args.seed)
+    if args.output:
+        with open(args.output, 'w') as out_file:
+            json.dump(suite_results, out_file, indent=2, sort_keys=True)
+            out_file.write('\n')
+        info_log(f'Wrote the results into {args.output}')
+
+    if args.compare:
+        baseline_results = load_results(args.compare)
+        if baseline_results.get('version') != suite_results.get('version'):
+            error_log(f'{args.compare} holds results of another version of the suite, write a new baseline with -o')
+            sys.exit(1)
+        if (baseline_results.get('machine'), baseline_results.get('cpus')) != \
+                (suite_results.get('machine'), suite_results.get('cpus')):
+            info_log(f'{args.compare} was measured on another machine, compare with a baseline of this one')
+        comparison, regressed = compare(baseline_results, suite_results, args.threshold)
+        for line in format_table(['Benchmark', 'Baseline (us/item)', 'Current (us/item)', 'Ratio', 'Verdict'],
+                                 comparison):
+            info_log(line)
+        if regressed:
+            error_log(f'{len(regressed)} benchmark(s) more than {args.threshold:.0%} slower: {", ".join(regressed)}')
+            sys.exit(1)
@@ -0,0 +1,96 @@
+import sys
+import os
+import csv
+from random import Random
+from typing import List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from aggregator import get_host, get_serial_number, list_result_files, parse_result_file  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from flood import build_frame  # noqa: E402
+from int_codec import MAX_INT_HEADERS, STAMP, STAMP_MAGIC  # noqa: E402
+
+# Checked-in results whose shape the synthetic result trees follow
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'v2_30_results')
+
+# Seconds between the start of two tests of a synthetic result tree
+TEST_PERIOD = 60
+
+
+def make_id_lists(num_of_lists: int, seed: int, max_len: int = MAX_INT_HEADERS) -> List[List[int]]:
+    """
+    Generate switch ID lists whose lengths cycle through 1 to max_len, so every length is equally present
+    :param num_of_lists: number of ID lists
+    :param seed: random seed of the IDs
+    :param max_len: longest ID list
+    :return: ID lists
+    """
+    rand = Random(seed)
+
+    return [[rand.randint(1, 30) for _ in range(idx % max_len + 1)] for idx in range(num_of_lists)]
+
+
+def make_int_frames(num_of_frames: int, seed: int, max_len: int = MAX_INT_HEADERS) -> List[bytes]:
+    """
+    Generate the broadcast ARP requests received after flooding: the IntHeader pushed by the switches between the ARP
+    header and the sequence stamp of sender.py -m raw, from up to 250 source hosts
+    :param num_of_frames: number of frames
+    :param seed: random seed of the IDs
+    :param max_len: longest ID list
+    :return: raw Ethernet frames
+    """
+    frames = []
+    for idx, ids in enumerate(make_id_lists(num_of_frames, seed, max_len)):
+        host = idx % 250 + 1
+        frame, stamp_offset = build_frame(bytes([0, 0, 10, 0, host, host]), f'10.0.{host}.{host}', '10.0.0.1', ids)
+        frame = bytearray(frame)
+        STAMP.pack_into(frame, stamp_offset, STAMP_MAGIC, idx, 1700000000.0 + idx * 1e-3)
+        frames.append(bytes(frame))
+
+    return frames
+
+
+def make_result_tree(dir_name: str, scale: int, seed: int, template: str = TEMPLATE_DIR) -> Tuple[int, int]:
+    """
+    Write a csv result tree shaped like the template directory with scale times its tests: each new test copies the
+    number of packets and the arrival times of a template test, shifted by TEST_PERIOD, and draws the route of every
+    packet from the routes the same host received in the template
+    :param dir_name: name of the result directory
+    :param scale: number of copies of every template test
+    :param seed: random seed of the routes
+    :param template: directory of the template results
+    :return: number of written files and rows
+    """
+    rand = np.random.default_rng(seed)
+    files = sorted(list_result_files(template), key=lambda file: (int(get_serial_number(file.name)), file.name))
+    parsed = [parse_result_file(file.path) for file in files]
+    tests = sorted({int(get_serial_number(file.name)) for file in files})
+    routes = dict()
+    for file, result in zip(files, parsed):
+        names, counts = routes.get(get_host(file.name), ([], []))
+        for route, num_of_switch in zip(result['IDs'], result['Num_of_switch']):
+            if route not in names:
+                names.append(route)
+                counts.append(int(num_of_switch))
+        routes[get_host(file.name)] = names, counts
+
+    os.makedirs(dir_name, exist_ok=True)
+    num_of_rows = 0
+    for copy in range(scale):
+        for file, result in zip(files, parsed):
+            host, test_no = get_host(file.name), int(get_serial_number(file.name))
+            names, counts = routes[host]
+            codes = rand.integers(0, len(names), len(result['Time']))
+            times = result['Time'] + copy * len(tests) * TEST_PERIOD
+            path = os.path.join(dir_name, f'{host}_{copy * len(tests) + tests.index(test_no)}.csv')
+            with open(path, 'w', newline='') as out_file:
+                writer = csv.writer(out_file)
+                writer.writerow(['Num_of_switch', 'IDs', 'Time'])
+                writer.writerows(zip([counts[code] for code in codes], [names[code] for code in codes],
+                                     times.tolist()))
+            num_of_rows += len(codes)
+
+    return scale * len(files), num_of_rows
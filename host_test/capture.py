@@ -0,0 +1,184 @@
+import ctypes
+import socket
+import struct
+from time import time
+from typing import Callable, List, Optional, Tuple
+from int_codec import INT_COUNT, INT_ID_SIZE, decode, find_stamp
+
+
+# Logged once the interface is captured, orchestrator.py waits for it
+CAPTURING = 'Capturing on interface {}'
+
+# Linux constants which are not exported by the socket module
+ETH_P_ALL = 0x0003
+SO_ATTACH_FILTER = 26
+SO_RCVBUFFORCE = 33
+SO_TIMESTAMPNS = 35
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+
+# Offsets in an Ethernet/ARP frame
+ETHER_LEN = 14
+ARP_LEN = 28
+ARP_OP_OFFSET = ETHER_LEN + 6
+
+# Classic BPF program (code, jt, jf, k) accepting broadcast ARP requests only
+#   ldh [12]; jeq #0x0806 -> ld [0]; jeq #0xffffffff -> ldh [4]; jeq #0xffff -> ldh [20]; jeq #1 -> accept
+ARP_REQUEST_FILTER = [
+    (0x28, 0, 0, 12),
+    (0x15, 0, 7, 0x0806),
+    (0x20, 0, 0, 0),
+    (0x15, 0, 5, 0xffffffff),
+    (0x28, 0, 0, 4),
+    (0x15, 0, 3, 0xffff),
+    (0x28, 0, 0, ARP_OP_OFFSET),
+    (0x15, 0, 1, 1),
+    (0x06, 0, 0, 0x40000),
+    (0x06, 0, 0, 0),
+]
+
+_ARP_REQUEST = struct.Struct('!6s6sH6xH6s4s')  # dst, src, ether type, (htype ... plen), oper, sha, spa
+_MAC_FORMAT = ':'.join(['%02x'] * 6)
+
+# Source IP, source MAC, number of switches, switch IDs and sequence stamp of an ARP request
+Decoded = Tuple[str, str, Optional[int], List[int], Optional[Tuple[int, float]]]
+
+# struct timespec of the SO_TIMESTAMPNS control message
+_TIMESPEC = struct.Struct('@qq')
+
+
+def attach_filter(sock: socket.socket, program: List[Tuple[int, int, int, int]] = None) -> None:
+    """
+    Attach a classic BPF program to the socket so that the kernel drops unwanted frames
+    :param sock: socket to be filtered
+    :param program: list of BPF instructions, ARP_REQUEST_FILTER if not given
+    :return: None
+    """
+    program = ARP_REQUEST_FILTER if program is None else program
+    instructions = ctypes.create_string_buffer(b''.join(struct.pack('HBBI', *i) for i in program))
+    sock_fprog = struct.pack('HP', len(program), ctypes.addressof(instructions))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, sock_fprog)
+
+
+def open_raw_socket(name_of_interface: str) -> socket.socket:
+    """
+    Open an AF_PACKET socket on the interface with ARP_REQUEST_FILTER attached.
+    The filter is attached before binding, so no unfiltered frame is ever queued on the socket.
+    :param name_of_interface: name of the interface to be sniffed
+    :return: raw socket
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+    attach_filter(sock)
+    sock.bind((name_of_interface, ETH_P_ALL))
+
+    return sock
+
+
+def set_receive_buffer(sock: socket.socket, size: int) -> int:
+    """
+    Enlarge the kernel receive buffer of the socket, beyond net.core.rmem_max if the process may
+    :param sock: socket
+    :param size: size of the buffer in bytes
+    :return: size actually granted by the kernel
+    """
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, size)
+    except OSError:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+
+    return sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+
+def enable_timestamps(sock: socket.socket) -> None:
+    """
+    Ask the kernel to timestamp every frame when it is received, see capture(kernel_timestamps=True)
+    :param sock: socket
+    :return: None
+    """
+    sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+
+
+def kernel_statistics(sock: socket.socket) -> Optional[Tuple[int, int]]:
+    """
+    Get the counters of an AF_PACKET socket since they were last read, the kernel resets them on each read
+    :param sock: AF_PACKET socket
+    :return: number of frames received and dropped by the kernel, None if the socket has no such counters
+    """
+    try:
+        return struct.unpack('II', sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+    except OSError:
+        return None
+
+
+def decode_frame(frame: memoryview) -> Optional[Decoded]:
+    """
+    Decode a broadcast ARP request carrying an INT header without building scapy packets
+    :param frame: raw Ethernet frame
+    :return: source IP, source MAC, number of switches (None without INT header), switch IDs and the sequence stamp
+             behind the INT header (None without stamp), or None if the frame is not a broadcast ARP request or its INT
+             header is malformed
+    """
+    if len(frame) < ETHER_LEN + ARP_LEN:
+        return None
+    dst, _, ether_type, oper, sha, spa = _ARP_REQUEST.unpack_from(frame)
+    if ether_type != 0x0806 or oper != 1 or dst != b'\xff\xff\xff\xff\xff\xff':
+        return None
+
+    psrc = socket.inet_ntoa(spa)
+    hwsrc = _MAC_FORMAT % tuple(sha)
+    if len(frame) < ETHER_LEN + ARP_LEN + INT_COUNT.size:
+        return psrc, hwsrc, None, [], None
+    try:
+        _, num_of_switches, ids = decode(frame, ETHER_LEN + ARP_LEN)
+    except ValueError:
+        return None
+
+    return psrc, hwsrc, num_of_switches, list(ids), \
+        find_stamp(frame, ETHER_LEN + ARP_LEN + INT_COUNT.size + INT_ID_SIZE * num_of_switches)
+
+
+def capture(sock: socket.socket, callback: Callable[[memoryview, float], None], count: int = 0,
+            buffer_size: int = 65536, kernel_timestamps: bool = False) -> int:
+    """
+    Read frames from the socket into one reusable buffer and hand memoryview slices to the callback.
+    The slice is only valid during the callback.
+    Capturing stops after count frames, or when the socket times out if a timeout is set on it.
+    :param sock: socket to be read
+    :param callback: function called with each frame and its receive time
+    :param count: number of frames to be captured (0 for infinity)
+    :param buffer_size: size of the reusable buffer
+    :param kernel_timestamps: whether the receive time is the kernel timestamp of the frame (see enable_timestamps)
+                              instead of the time at which it is read
+    :return: number of captured frames
+    """
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    ancillary_size = socket.CMSG_SPACE(_TIMESPEC.size)
+    captured = 0
+    while not count or captured < count:
+        try:
+            if kernel_timestamps:
+                length, ancillary, _, _ = sock.recvmsg_into([buffer], ancillary_size)
+                timestamp = kernel_timestamp(ancillary)
+            else:
+                length, timestamp = sock.recv_into(buffer), None
+        except socket.timeout:
+            break
+        callback(view[:length], time() if timestamp is None else timestamp)
+        captured += 1
+
+    return captured
+
+
+def kernel_timestamp(ancillary: List[Tuple[int, int, bytes]]) -> Optional[float]:
+    """
+    Get the kernel timestamp out of the control messages of a received frame
+    :param ancillary: control messages returned by recvmsg
+    :return: seconds since the epoch, None if there is no timestamp
+    """
+    for level, kind, data in ancillary:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(data) >= _TIMESPEC.size:
+            seconds, nanoseconds = _TIMESPEC.unpack_from(data)
+            return seconds + nanoseconds * 1e-9
+
+    return None
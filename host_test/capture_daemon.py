@@ -0,0 +1,332 @@
+import sys
+import os
+import ctypes
+import selectors
+import signal
+import socket
+from time import time
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from capture import CAPTURING, attach_filter, decode_frame, open_raw_socket
+import metrics
+from result_log import FORMATS, next_result_path
+from result_sink import ResultWriter
+from routes import RouteTable
+
+
+CLONE_NEWNET = 0x40000000
+
+# Frames read from one socket before the others get their turn
+MAX_BURST = 64
+
+POLL_INTERVAL = 0.1
+
+
+class Interface:
+    """
+    Interface captured by the daemon, its results are stored in <directory>/<name>_<number>.csv (or .bin) as by
+    receiver.py
+    """
+
+    def __init__(self, name: str, sock: socket.socket) -> None:
+        """
+        Create an interface
+        :param name: name of the interface
+        :param sock: socket capturing the interface
+        :return: None
+        """
+        self.name = name
+        self.sock = sock
+        self.writer = None  # type: Optional[ResultWriter]
+        self.frames = 0
+        self.requests = 0
+        self.rows = 0
+
+
+class CaptureDaemon:
+    """
+    Capture many interfaces in one process, one socket per interface multiplexed by a selector
+    """
+
+    def __init__(self, dir_name: str, flush_rows: int = 1, flush_time: float = 0, verbose: bool = False,
+                 buffer_size: int = 65536, result_format: str = 'csv') -> None:
+        """
+        Create a daemon
+        :param dir_name: name of the results directory
+        :param flush_rows: flush results after this many rows (see ResultWriter)
+        :param flush_time: flush results every this many milliseconds (see ResultWriter)
+        :param verbose: whether to log every ARP request as receiver.py does
+        :param buffer_size: size of the reusable receive buffer
+        :param result_format: format of the result files, one of FORMATS
+        :return: None
+        """
+        self.dir_name = dir_name
+        self.result_format = result_format
+        self.flush_rows = flush_rows
+        self.flush_time = flush_time
+        self.verbose = verbose
+        self.interfaces = []  # type: List[Interface]
+        self.route_table = RouteTable()
+        self.start_time = time()
+        self.stopped = False
+
+        self._selector = selectors.DefaultSelector()
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+
+    def add(self, name_of_interface: str, sock: socket.socket) -> None:
+        """
+        Capture an interface
+        :param name_of_interface: name of the interface, which names the result files
+        :param sock: socket capturing the interface
+        :return: None
+        """
+        sock.setblocking(False)
+        interface = Interface(name_of_interface, sock)
+        self.interfaces.append(interface)
+        self._selector.register(sock, selectors.EVENT_READ, interface)
+
+    def run(self, stats: float = 0) -> None:
+        """
+        Capture until stop() is called
+        :param stats: log the counters every this many seconds (0 to disable)
+        :return: None
+        """
+        last_stats = time()
+        while not self.stopped:
+            for key, _ in self._selector.select(POLL_INTERVAL):
+                self.read(key.data)
+            if 0 < stats <= time() - last_stats:
+                last_stats = time()
+                info_log(format_counters(self.counters()))
+
+    def read(self, interface: Interface) -> None:
+        """
+        Read the frames queued on the socket of an interface, at most MAX_BURST of them
+        :param interface: interface to be read
+        :return: None
+        """
+        for _ in range(MAX_BURST):
+            try:
+                length = interface.sock.recv_into(self._buffer)
+            except BlockingIOError:
+                return
+            elapsed_time = time() - self.start_time
+            interface.frames += 1
+            decoded = decode_frame(self._view[:length])
+            if decoded is None:
+                continue
+            interface.requests += 1
+            self.store(interface, elapsed_time, *decoded)
+
+    def store(self, interface: Interface, elapsed_time: float, psrc: str, hwsrc: str,
+              num_of_switches: Optional[int], ids: List[int], stamp: Optional[Tuple[int, float]] = None) -> None:
+        """
+        Store the traversed route of an ARP request if it carries an INT header
+        :param interface: interface on which the request is received
+        :param elapsed_time: time at which the request is received
+        :param psrc: source IP address
+        :param hwsrc: source MAC address
+        :param num_of_switches: number of traversed switches, None if there is no INT header
+        :param ids: IDs of the traversed switches in the order of the INT header
+        :param stamp: sequence number and send time stamped by the sender, not stored by the daemon
+        :return: None
+        """
+        if self.verbose:
+            info_log('{}: got ARP request from IP: {}, MAC: {}, {}'.format(interface.name, psrc, hwsrc,
+                                                                          elapsed_time))
+        if num_of_switches is None:
+            return
+
+        # Get file number
+        if interface.writer is None:
+            suffix, writer_class = FORMATS[self.result_format]
+            filename, _ = next_result_path(self.dir_name, interface.name, suffix)
+            interface.writer = writer_class(filename, self.flush_rows, self.flush_time)
+
+        # Store the result, the INT header lists the last traversed switch first
+        route = self.route_table.intern_ids(ids[::-1])
+        interface.writer.write(num_of_switches, self.route_table.names[route], elapsed_time)
+        interface.rows += 1
+
+    def stop(self) -> None:
+        """
+        Stop capturing, run() returns within POLL_INTERVAL
+        :return: None
+        """
+        self.stopped = True
+
+    def counters(self) -> Dict[str, int]:
+        """
+        Get the aggregate counters of all interfaces
+        :return: counter name -> value
+        """
+        return {'interfaces': len(self.interfaces),
+                'frames': sum(interface.frames for interface in self.interfaces),
+                'requests': sum(interface.requests for interface in self.interfaces),
+                'rows': sum(interface.rows for interface in self.interfaces),
+                'routes': len(self.route_table)}
+
+    def close(self) -> None:
+        """
+        Flush the results and close every socket
+        :return: None
+        """
+        for interface in self.interfaces:
+            if interface.writer is not None:
+                interface.writer.close()
+            self._selector.unregister(interface.sock)
+            interface.sock.close()
+        self._selector.close()
+        for name, value in self.counters().items():
+            metrics.registry.set(name, value)
+
+
+def setns(namespace: int) -> None:
+    """
+    Move the calling thread into a network namespace
+    :param namespace: file descriptor of the namespace
+    :return: None
+    """
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.setns(namespace, CLONE_NEWNET) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def open_in_namespace(name_of_interface: str, namespace: Optional[str],
+                      opener: Callable[[str], socket.socket] = open_raw_socket) -> socket.socket:
+    """
+    Open a socket inside a network namespace, the socket keeps capturing there once the process is back in its own
+    :param name_of_interface: name of the interface
+    :param namespace: path of the namespace, e.g. /proc/<pid>/ns/net, None for the namespace of the process
+    :param opener: function opening the socket
+    :return: socket
+    """
+    if namespace is None:
+        return opener(name_of_interface)
+    with open('/proc/self/ns/net') as own, open(namespace) as target:
+        setns(target.fileno())
+        try:
+            return opener(name_of_interface)
+        finally:
+            setns(own.fileno())
+
+
+def mininet_namespace(host: str) -> str:
+    """
+    Find the network namespace of a Mininet host from the shell Mininet runs in it
+    :param host: name of the host
+    :return: path of the namespace
+    """
+    name = 'mininet:{}'.format(host).encode()
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open('/proc/{}/cmdline'.format(pid), 'rb') as in_file:
+                if name in in_file.read().split(b'\0'):
+                    return '/proc/{}/ns/net'.format(pid)
+        except OSError:
+            continue
+
+    raise ValueError('Mininet host {} is not running'.format(host))
+
+
+def open_unix_socket(path: str) -> socket.socket:
+    """
+    Open a unix datagram socket standing in for an interface, frames are sent to it as datagrams
+    :param path: path of the socket
+    :return: socket with ARP_REQUEST_FILTER attached
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    attach_filter(sock)
+    if os.path.exists(path):
+        os.remove(path)
+    sock.bind(path)
+
+    return sock
+
+
+def format_counters(counters: Dict[str, int]) -> str:
+    """
+    Format the counters of the daemon
+    :param counters: counter name -> value
+    :return: formatted counters
+    """
+    return ', '.join('{} {}'.format(name, value) for name, value in counters.items())
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print('[\033[96mINFO\033[00m] {}'.format(log))
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-if', '--interfaces', help='Names of the interfaces', type=str, nargs='+',
+                        default=['h2-eth0'])
+    parser.add_argument('-m', '--mininet', help='Open hX-eth0 in the network namespace of Mininet host hX',
+                        action='store_true')
+    parser.add_argument('-u', '--unix', help='Capture unix sockets named after the interfaces in this directory '
+                                             'instead of the interfaces', type=str, default=None)
+    parser.add_argument('-d', '--directory', help='Name of the results directory', type=str, default='../results')
+    parser.add_argument('-fr', '--flush-rows', help='Flush results after this many rows (0 to disable)', type=int,
+                        default=1)
+    parser.add_argument('-ft', '--flush-time', help='Flush results every this many milliseconds (0 to disable)',
+                        type=float, default=0)
+    parser.add_argument('-st', '--stats', help='Log the counters every this many seconds (0 to disable)', type=float,
+                        default=0)
+    parser.add_argument('-vb', '--verbose', help='Log every ARP request', action='store_true')
+    parser.add_argument('-fm', '--format', help='Format of the result files', type=str, choices=list(FORMATS),
+                        default='csv')
+    metrics.add_arguments(parser)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 capture_daemon.py [-if interfaces] [-m] [-u unix_directory] [-d directory] [-fr flush_rows]
+                 [-ft flush_time] [-st stats] [-vb] [-fm (csv|binary)] [-mt metrics] [-mi metrics_interval]
+                 [-pf profile]
+    """
+    args = parse_arguments()
+    metrics.setup('capture_daemon', args)
+    daemon = CaptureDaemon(args.directory, args.flush_rows, args.flush_time, args.verbose,
+                           result_format=args.format)
+    signal.signal(signal.SIGTERM, lambda num, frame: daemon.stop())
+    signal.signal(signal.SIGHUP, lambda num, frame: daemon.stop())
+
+    info_log('{}'.format(datetime.now()))
+    try:
+        for interface_name in args.interfaces:
+            if args.unix is not None:
+                capture_socket = open_unix_socket(os.path.join(args.unix, interface_name))
+            else:
+                capture_socket = open_in_namespace(interface_name, mininet_namespace(interface_name.split('-')[0])
+                                                   if args.mininet else None)
+            daemon.add(interface_name, capture_socket)
+
+        # Every interface is captured before the first one is reported
+        for interface_name in args.interfaces:
+            info_log(CAPTURING.format(interface_name))
+        info_log('Quit the daemon with CONTROL-C.')
+        with metrics.profiled(args.profile):
+            daemon.run(args.stats)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+        info_log(format_counters(daemon.counters()))
@@ -0,0 +1,118 @@
+import socket
+import struct
+from time import perf_counter, sleep, time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+import metrics
+from int_codec import STAMP, STAMP_MAGIC, encode
+
+
+BROADCAST = b'\xff\xff\xff\xff\xff\xff'
+_ARP_REQUEST = struct.Struct('!6s6sHHHBBH6s4s6s4s')
+
+# Sleep until this many seconds before the scheduled time, then spin
+SPIN_TIME = 0.0002
+
+
+class SendReport(NamedTuple):
+    sent: int
+    elapsed: float
+    pps: float
+    jitter_mean: float
+    jitter_p99: float
+    jitter_max: float
+
+
+def build_frame(src_mac: bytes, src_ip: str, dst_ip: str, ids: Optional[Sequence[int]] = None) -> Tuple[bytes, int]:
+    """
+    Serialize the broadcast ARP request once, with an empty sequence stamp at the end
+    :param src_mac: MAC address of the sender
+    :param src_ip: source IP address
+    :param dst_ip: destination IP address
+    :param ids: IDs to be placed in the IntHeader, None for pure ARP
+    :return: frame and offset of the sequence stamp in it
+    """
+    frame = _ARP_REQUEST.pack(BROADCAST, src_mac, 0x0806, 1, 0x0800, 6, 4, 1, src_mac, socket.inet_aton(src_ip),
+                              b'\x00' * 6, socket.inet_aton(dst_ip))
+    if ids is not None:
+        frame += encode(ids)
+
+    return frame + STAMP.pack(STAMP_MAGIC, 0, 0.0), len(frame)
+
+
+def open_send_socket(name_of_interface: str) -> Tuple[socket.socket, bytes]:
+    """
+    Open an AF_PACKET socket for sending raw frames on the interface
+    :param name_of_interface: name of the interface which sends packets
+    :return: raw socket and MAC address of the interface
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+    sock.bind((name_of_interface, 0))
+
+    return sock, sock.getsockname()[4]
+
+
+def flood(sock: socket.socket, frame: bytes, stamp_offset: int, count: int = 0, duration: float = 0,
+          rate: float = 0, burst: int = 1, first_sequence: int = 0) -> SendReport:
+    """
+    Send the pre-serialized frame in bursts, stamping a sequence number and the send time into each copy.
+    Bursts are scheduled every burst / rate seconds and the lateness of each burst is reported as jitter.
+    :param sock: socket to be written
+    :param frame: frame built by build_frame
+    :param stamp_offset: offset of the sequence stamp in the frame
+    :param count: number of frames to be sent (0 for no limit)
+    :param duration: seconds to keep sending (0 for no limit)
+    :param rate: target packets per second (0 for as fast as possible)
+    :param burst: number of frames sent back to back in each burst
+    :param first_sequence: sequence number of the first frame
+    :return: report of the flood
+    """
+    if not count and not duration:
+        raise ValueError('Either count or duration should be given.')
+
+    buffers = [bytearray(frame) for _ in range(burst)]
+    interval = burst / rate if rate else 0.0
+    lateness = []  # type: List[float]
+    sequence = first_sequence
+    sent = 0
+
+    start = perf_counter()
+    while (not count or sent < count) and (not duration or perf_counter() - start < duration):
+        # Wait for the scheduled time of this burst
+        if interval:
+            scheduled = start + len(lateness) * interval
+            remaining = scheduled - perf_counter()
+            if remaining > SPIN_TIME:
+                sleep(remaining - SPIN_TIME)
+            while perf_counter() < scheduled:
+                pass
+            lateness.append(perf_counter() - scheduled)
+
+        for buffer in buffers[:count - sent if count else burst]:
+            STAMP.pack_into(buffer, stamp_offset, STAMP_MAGIC, sequence, time())
+            sock.send(buffer)
+            sequence += 1
+            sent += 1
+    elapsed = perf_counter() - start
+    metrics.registry.inc('packets_sent', sent)
+    metrics.registry.observe('flood_seconds', elapsed)
+    for late in lateness if metrics.registry.enabled else ():
+        metrics.registry.observe('burst_lateness_seconds', late)
+
+    return make_report(sent, elapsed, lateness)
+
+
+def make_report(sent: int, elapsed: float, lateness: Sequence[float]) -> SendReport:
+    """
+    Summarize a flood
+    :param sent: number of frames sent
+    :param elapsed: seconds spent sending
+    :param lateness: lateness of each scheduled send in seconds
+    :return: report of the flood
+    """
+    lateness = sorted(lateness)
+    return SendReport(sent=sent,
+                      elapsed=elapsed,
+                      pps=sent / elapsed if elapsed else 0.0,
+                      jitter_mean=sum(lateness) / len(lateness) if lateness else 0.0,
+                      jitter_p99=lateness[int(0.99 * (len(lateness) - 1))] if lateness else 0.0,
+                      jitter_max=lateness[-1] if lateness else 0.0)
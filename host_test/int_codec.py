@@ -0,0 +1,140 @@
+import struct
+import numpy as np
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+
+# Same as MAX_INT_HEADERS in project.p4 and project_v2.p4
+MAX_INT_HEADERS = 20
+
+INT_PROTO = 0x0800
+INT_COUNT = struct.Struct('!HH')
+INT_ID_SIZE = 4
+INT_MAX_SIZE = INT_COUNT.size + INT_ID_SIZE * MAX_INT_HEADERS
+
+# Sequence stamp placed by the sender behind the ARP header (magic, sequence number, send time).
+# Switches insert the IntHeader in front of it, so receivers find it right after the IntHeader, or after the IntHeader
+# of the sender with sender.py -t 1.
+STAMP = struct.Struct('!4sId')
+STAMP_MAGIC = b'SEQ\x00'
+
+# Precompiled structs of the ID list for every possible number of switches
+_IDS = [struct.Struct('!{}I'.format(n)) for n in range(MAX_INT_HEADERS + 1)]
+
+# Layout of one padded record in the batch buffer
+_BATCH_DTYPE = np.dtype([('proto', '>u2'), ('len', '>u2'), ('id', '>u4', (MAX_INT_HEADERS,))])
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def decode(payload: Buffer, offset: int = 0) -> Tuple[int, int, Tuple[int, ...]]:
+    """
+    Decode an IntHeader without building a scapy packet
+    :param payload: buffer containing the IntHeader
+    :param offset: offset of the IntHeader in the buffer
+    :return: proto, len and IDs (in the order of the header, i.e. the last traversed switch first)
+    """
+    if len(payload) - offset < INT_COUNT.size:
+        raise ValueError('IntHeader needs {} bytes, got {}'.format(INT_COUNT.size, len(payload) - offset))
+    proto, num_of_switches = INT_COUNT.unpack_from(payload, offset)
+    if num_of_switches > MAX_INT_HEADERS:
+        raise ValueError('IntHeader has {} IDs, at most {} are allowed'.format(num_of_switches, MAX_INT_HEADERS))
+    ids = _IDS[num_of_switches]
+    if len(payload) - offset - INT_COUNT.size < ids.size:
+        raise ValueError('IntHeader with {} IDs is truncated'.format(num_of_switches))
+
+    return proto, num_of_switches, ids.unpack_from(payload, offset + INT_COUNT.size)
+
+
+def encode(ids: Sequence[int], proto: int = INT_PROTO) -> bytes:
+    """
+    Encode an IntHeader, byte-identical to bytes(IntHeader(proto=proto, len=len(ids), id=ids))
+    :param ids: IDs to be placed in the variable length field
+    :param proto: protocol ID
+    :return: encoded IntHeader
+    """
+    if len(ids) > MAX_INT_HEADERS:
+        raise ValueError('IntHeader has {} IDs, at most {} are allowed'.format(len(ids), MAX_INT_HEADERS))
+
+    return INT_COUNT.pack(proto, len(ids)) + _IDS[len(ids)].pack(*ids)
+
+
+def encode_stamp(sequence: int, send_time: float) -> bytes:
+    """
+    Encode the sequence stamp
+    :param sequence: sequence number of the packet
+    :param send_time: time at which the packet is sent
+    :return: encoded stamp
+    """
+    return STAMP.pack(STAMP_MAGIC, sequence, send_time)
+
+
+def decode_stamp(payload: Buffer, offset: int = 0) -> Optional[Tuple[int, float]]:
+    """
+    Decode the sequence stamp
+    :param payload: buffer containing the stamp
+    :param offset: offset of the stamp in the buffer
+    :return: sequence number and send time, or None if there is no stamp
+    """
+    if len(payload) - offset < STAMP.size:
+        return None
+    magic, sequence, send_time = STAMP.unpack_from(payload, offset)
+    if magic != STAMP_MAGIC:
+        return None
+
+    return sequence, send_time
+
+
+def find_stamp(payload: Buffer, offset: int = 0) -> Optional[Tuple[int, float]]:
+    """
+    Decode the sequence stamp behind the IntHeader of the switches, skipping the IntHeader the sender placed in front
+    of the stamp when it tests the variable length field
+    :param payload: buffer containing the stamp
+    :param offset: offset right after the IntHeader of the switches
+    :return: sequence number and send time, or None if there is no stamp
+    """
+    stamp = decode_stamp(payload, offset)
+    if stamp is None and len(payload) - offset >= INT_COUNT.size:
+        proto, num_of_ids = INT_COUNT.unpack_from(payload, offset)
+        if proto == INT_PROTO and num_of_ids <= MAX_INT_HEADERS:
+            return decode_stamp(payload, offset + INT_COUNT.size + INT_ID_SIZE * num_of_ids)
+
+    return stamp
+
+
+def decode_batch(payloads: Iterable[Buffer]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode many IntHeaders at once
+    :param payloads: buffers each starting with an IntHeader
+    :return: (n, MAX_INT_HEADERS) uint32 ID matrix padded with zeros and the uint16 length vector
+    """
+    payloads = list(payloads)
+    buffer = bytearray(len(payloads) * INT_MAX_SIZE)
+    sizes = np.empty(len(payloads), dtype=np.int64)
+    for idx, payload in enumerate(payloads):
+        size = min(len(payload), INT_MAX_SIZE)
+        buffer[idx * INT_MAX_SIZE:idx * INT_MAX_SIZE + size] = payload[:size]
+        sizes[idx] = size
+
+    records = np.frombuffer(buffer, dtype=_BATCH_DTYPE)
+    lengths = records['len'].astype(np.uint16)
+    if np.any(sizes < INT_COUNT.size):
+        raise ValueError('IntHeader needs {} bytes'.format(INT_COUNT.size))
+    if np.any(lengths > MAX_INT_HEADERS):
+        raise ValueError('IntHeader has more than {} IDs'.format(MAX_INT_HEADERS))
+    if np.any(sizes < INT_COUNT.size + INT_ID_SIZE * lengths.astype(np.int64)):
+        raise ValueError('IntHeader is truncated')
+
+    ids = records['id'].astype(np.uint32)
+    ids[np.arange(MAX_INT_HEADERS) >= lengths[:, None]] = 0
+
+    return ids, lengths
+
+
+def to_lists(ids: np.ndarray, lengths: np.ndarray) -> List[List[int]]:
+    """
+    Convert the output of decode_batch back into lists of IDs
+    :param ids: ID matrix
+    :param lengths: length vector
+    :return: list of IDs of each header
+    """
+    return [row[:length].tolist() for row, length in zip(ids, lengths)]
@@ -0,0 +1,75 @@
+from array import array
+from typing import Dict, List
+from pipeline import format_latency
+
+
+class Stream:
+    """
+    Stamped packets of one sender. Flooding delivers several copies of each packet, the first copy of each sequence
+    number counts for loss and reordering.
+    """
+
+    def __init__(self) -> None:
+        self.first = dict()  # type: Dict[int, float]
+        self.latency = array('d')
+        self.reordered = 0
+        self.highest = -1
+
+    def add(self, sequence: int, latency: float) -> None:
+        """
+        Record a received copy
+        :param sequence: sequence number of the packet
+        :param latency: one-way latency of the copy in seconds
+        :return: None
+        """
+        self.latency.append(latency)
+        if sequence in self.first:
+            return
+        self.first[sequence] = latency
+        if sequence < self.highest:
+            self.reordered += 1
+        else:
+            self.highest = sequence
+
+    def lost(self) -> int:
+        """
+        Count the sequence numbers missing between the lowest and the highest received ones
+        :return: number of lost packets
+        """
+        return self.highest + 1 - min(self.first) - len(self.first) if self.first else 0
+
+
+class SequenceTracker:
+    """
+    One-way latency, loss and reordering of the stamped packets of each sender
+    """
+
+    def __init__(self) -> None:
+        self.streams = dict()  # type: Dict[str, Stream]
+
+    def add(self, source: str, sequence: int, send_time: float, receive_time: float) -> float:
+        """
+        Record a received copy
+        :param source: source IP address of the sender
+        :param sequence: sequence number of the packet
+        :param send_time: time at which the packet is sent
+        :param receive_time: time at which the copy is received, on the same clock as the send time
+        :return: one-way latency in seconds
+        """
+        stream = self.streams.get(source)
+        if stream is None:
+            stream = self.streams[source] = Stream()
+        latency = receive_time - send_time
+        stream.add(sequence, latency)
+
+        return latency
+
+    def report(self) -> List[str]:
+        """
+        Report the loss, reordering and latency of each sender
+        :return: report lines
+        """
+        return ['{}: {} packets, {} lost, {} reordered, {} copies, first copy latency {}, all copies latency {}'.format(
+            source, len(stream.first), stream.lost(), stream.reordered, len(stream.latency),
+            format_latency(array('d', stream.first.values())), format_latency(stream.latency))
+            for source, stream in self.streams.items()]
@@ -0,0 +1,322 @@
+import os
+import atexit
+import bisect
+import cProfile
+import json
+import pstats
+import threading
+from argparse import ArgumentParser, Namespace
+from contextlib import contextmanager
+from time import perf_counter, sleep, time
+from typing import Dict, Iterator, List, Optional, Union
+
+
+# Upper bounds of the latency buckets in seconds, 1 us to 100 s
+BUCKETS = [10.0 ** (exponent / 2) for exponent in range(-12, 5)]
+
+PROMETHEUS_PREFIX = 'p4_'
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets, its size does not grow with the number of samples
+    """
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Record a sample
+        :param value: sample in seconds
+        :return: None
+        """
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile as the upper bound of the bucket holding it
+        :param q: quantile between 0 and 1
+        :return: estimated quantile in seconds, the maximum for the overflow bucket
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+
+class Metrics:
+    """
+    Counters, gauges and latency histograms of one process, safe to update from several threads
+    """
+
+    enabled = True
+
+    def __init__(self, job: str) -> None:
+        """
+        Create a registry
+        :param job: name of the program, e.g. receiver
+        :return: None
+        """
+        self.job = job
+        self.start = time()
+        self.counters = dict()  # type: Dict[str, float]
+        self.gauges = dict()  # type: Dict[str, float]
+        self.histograms = dict()  # type: Dict[str, Histogram]
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """
+        Increase a counter
+        :param name: name of the counter
+        :param value: increment
+        :return: None
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value: float) -> None:
+        """
+        Set a gauge
+        :param name: name of the gauge
+        :param value: value
+        :return: None
+        """
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Record a latency sample
+        :param name: name of the histogram
+        :param seconds: latency in seconds
+        :return: None
+        """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Record how long the block takes
+        :param name: name of the histogram
+        :return: context manager
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """
+        Get every metric
+        :return: json-serializable metrics
+        """
+        with self._lock:
+            return {'job': self.job, 'start': self.start, 'time': time(), 'counters': dict(self.counters),
+                    'gauges': dict(self.gauges),
+                    'histograms': {name: {'count': histogram.count, 'sum': histogram.sum, 'max': histogram.max,
+                                          'p50': histogram.quantile(0.5), 'p99': histogram.quantile(0.99),
+                                          'buckets': dict(zip([str(bound) for bound in BUCKETS] + ['+Inf'],
+                                                              histogram.counts))}
+                                   for name, histogram in self.histograms.items()}}
+
+    def prometheus(self) -> str:
+        """
+        Format every metric in the text exposition format of Prometheus, e.g. for the textfile collector
+        :return: text
+        """
+        snapshot = self.snapshot()
+        label = '{{job="{}"}}'.format(self.job)
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            lines += ['# TYPE {}{}_total counter'.format(PROMETHEUS_PREFIX, name),
+                      '{}{}_total{} {}'.format(PROMETHEUS_PREFIX, name, label, value)]
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines += ['# TYPE {}{} gauge'.format(PROMETHEUS_PREFIX, name),
+                      '{}{}{} {}'.format(PROMETHEUS_PREFIX, name, label, value)]
+        for name, histogram in sorted(snapshot['histograms'].items()):
+            lines.append('# TYPE {}{} histogram'.format(PROMETHEUS_PREFIX, name))
+            cumulative = 0
+            for bound, count in histogram['buckets'].items():
+                cumulative += count
+                lines.append('{}{}_bucket{{job="{}",le="{}"}} {}'.format(PROMETHEUS_PREFIX, name, self.job, bound,
+                                                                        cumulative))
+            lines += ['{}{}_sum{} {}'.format(PROMETHEUS_PREFIX, name, label, histogram['sum']),
+                      '{}{}_count{} {}'.format(PROMETHEUS_PREFIX, name, label, histogram['count'])]
+
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str) -> None:
+        """
+        Write every metric atomically, as Prometheus text if the path ends with .prom, as json otherwise
+        :param path: path of the file
+        :return: None
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + '.tmp', 'w') as out_file:
+            if path.endswith('.prom'):
+                out_file.write(self.prometheus())
+            else:
+                json.dump(self.snapshot(), out_file, indent=2)
+        os.replace(path + '.tmp', path)
+
+
+class NullTimer:
+    """
+    Reusable no-op context manager, cheaper than a generator-based one on every call
+    """
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_TIMER = NullTimer()
+
+
+class NullMetrics:
+    """
+    Registry used while metrics are disabled, every update is a no-op
+    """
+
+    enabled = False
+
+    def inc(self, name: str, value: float = 1) -> None:
+        pass
+
+    def set(self, name: str, value: float) -> None:
+        pass
+
+    def observe(self, name: str, seconds: float) -> None:
+        pass
+
+    def timer(self, name: str) -> NullTimer:
+        return _NULL_TIMER
+
+
+# Registry of the process, replaced by enable(). Look it up as metrics.registry when updating, not at import time.
+registry = NullMetrics()  # type: Union[Metrics, NullMetrics]
+
+
+def enable(job: str, path: str, interval: float = 0) -> Metrics:
+    """
+    Enable metrics for the process and export them to the file at exit, and every interval seconds if given
+    :param job: name of the program
+    :param path: path of the file, Prometheus text if it ends with .prom, json otherwise
+    :param interval: seconds between two exports (0 to export at exit only)
+    :return: registry
+    """
+    global registry
+    registry = Metrics(job)
+    atexit.register(registry.export, path)
+    if interval > 0:
+        def export_periodically(metrics: Metrics = registry) -> None:
+            while True:
+                sleep(interval)
+                metrics.export(path)
+
+        threading.Thread(target=export_periodically, daemon=True).start()
+
+    return registry
+
+
+def add_arguments(parser: ArgumentParser) -> None:
+    """
+    Add the --metrics, --metrics-interval and --profile arguments to a parser
+    :param parser: parser
+    :return: None
+    """
+    parser.add_argument('-mt', '--metrics', help='Export counters and stage latency to this file at exit, Prometheus '
+                                                 'text if it ends with .prom, json otherwise', type=str, default=None)
+    parser.add_argument('-mi', '--metrics-interval', help='Also export the metrics every this many seconds '
+                                                          '(0 to export at exit only)', type=float, default=0)
+    parser.add_argument('-pf', '--profile', help='Run under cProfile and dump the statistics to this file',
+                        type=str, default=None)
+
+
+def setup(job: str, args: Namespace) -> None:
+    """
+    Enable metrics if the arguments ask for them
+    :param job: name of the program
+    :param args: arguments parsed with add_arguments
+    :return: None
+    """
+    if args.metrics:
+        enable(job, args.metrics, args.metrics_interval)
+
+
+@contextmanager
+def profiled(path: Optional[str]) -> Iterator[None]:
+    """
+    Run the block under cProfile if a path is given. The statistics are dumped to the file and the slowest functions
+    are printed, even if the block is interrupted. The threads started in the block, such as the decode and write
+    stages of the pipeline, are profiled as well and their statistics merged with those of the calling thread.
+    :param path: path of the statistics, None not to profile
+    :return: context manager
+    """
+    if not path:
+        yield
+        return
+
+    thread_profiles = []  # type: List[cProfile.Profile]
+    lock = threading.Lock()
+
+    def profile_thread(*_) -> None:
+        # Called once by each new thread, enabling its own profile replaces this function
+        thread_profile = cProfile.Profile()
+        try:
+            thread_profile.enable()
+        except ValueError:
+            # Profilers built on sys.monitoring are process-wide, the profile of the calling thread sees every thread
+            return
+        with lock:
+            thread_profiles.append(thread_profile)
+
+    profile = cProfile.Profile()
+    threading.setprofile(profile_thread)
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profile)
+        with lock:
+            for thread_profile in thread_profiles:
+                stats.add(thread_profile)
+        stats.dump_stats(path)
+        stats.sort_stats('cumulative').print_stats(20)
+
+
+def phase_summary(metrics: Optional[Union[Metrics, NullMetrics]] = None) -> List[str]:
+    """
+    Summarize the latency histograms of a registry
+    :param metrics: registry, the registry of the process if not given
+    :return: one line per histogram, nothing if metrics are disabled
+    """
+    metrics = registry if metrics is None else metrics
+    if not metrics.enabled:
+        return []
+
+    return ['{}: {} samples, total {:.3f} s, p50 {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms'.format(
+        name, histogram.count, histogram.sum, histogram.quantile(0.5) * 1000, histogram.quantile(0.99) * 1000,
+        histogram.max * 1000) for name, histogram in sorted(metrics.histograms.items())]
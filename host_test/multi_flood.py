@@ -0,0 +1,343 @@
+import sys
+import os
+import asyncio
+import heapq
+import json
+import socket
+from argparse import ArgumentParser, Namespace
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from random import Random
+from time import perf_counter, time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import metrics
+from capture_daemon import mininet_namespace, open_in_namespace
+from flood import SendReport, build_frame, make_report, open_send_socket
+from int_codec import STAMP, STAMP_MAGIC
+
+
+# The event loop wakes up this many seconds before a frame is due and spins the rest, epoll waits in milliseconds
+SPIN_TIME = 0.002
+
+
+class Origin(NamedTuple):
+    host: str
+    interface: str
+    source: str
+    destination: str
+    rate: float
+    offset: float
+    count: int
+    ids: List[int]
+    first_sequence: int
+
+
+class Schedule:
+    """
+    Floods of several origins starting at a common wall-clock time. Each origin stamps its own range of sequence
+    numbers, so receivers attribute a stamped frame to its origin with the source IP and the sequence number.
+    """
+
+    def __init__(self, start_time: float, origins: List[Origin]) -> None:
+        """
+        Create a schedule
+        :param start_time: wall-clock time at which offsets are 0
+        :param origins: origins of the floods
+        :return: None
+        """
+        self.start_time = start_time
+        self.origins = origins
+        self._order = sorted(range(len(origins)), key=lambda index: origins[index].first_sequence)
+        self._first = [origins[index].first_sequence for index in self._order]
+        for before, after in zip(self._order, self._order[1:]):
+            if origins[before].first_sequence + origins[before].count > origins[after].first_sequence:
+                raise ValueError('Sequence numbers of origins {} and {} overlap'.format(before, after))
+
+    def attribute(self, source: str, sequence: int) -> Optional[int]:
+        """
+        Find the origin of a stamped frame
+        :param source: source IP address of the frame
+        :param sequence: sequence number of the stamp
+        :return: index of the origin, None if no origin sends it
+        """
+        position = bisect_right(self._first, sequence) - 1
+        if position < 0:
+            return None
+        index = self._order[position]
+        origin = self.origins[index]
+        if sequence >= origin.first_sequence + origin.count or source != origin.source:
+            return None
+
+        return index
+
+    def name(self, source: str, sequence: int) -> str:
+        """
+        Name the origin of a stamped frame
+        :param source: source IP address of the frame
+        :param sequence: sequence number of the stamp
+        :return: e.g. 'o12 (h3)', the source IP address if no origin sends it
+        """
+        index = self.attribute(source, sequence)
+
+        return source if index is None else 'o{} ({})'.format(index, self.origins[index].host)
+
+    def save(self, filename: str) -> None:
+        """
+        Write the schedule as json
+        :param filename: name of the schedule file
+        :return: None
+        """
+        with open(filename, 'w') as out_file:
+            json.dump({'start_time': self.start_time, 'origins': [origin._asdict() for origin in self.origins]},
+                      out_file, indent=1)
+
+    @classmethod
+    def load(cls, filename: str) -> 'Schedule':
+        """
+        Read a schedule written by save()
+        :param filename: name of the schedule file
+        :return: schedule
+        """
+        with open(filename) as in_file:
+            content = json.load(in_file)
+
+        return cls(content['start_time'], [Origin(**origin) for origin in content['origins']])
+
+
+def plan(number: int, num_of_hosts: int, rate: float, spread: float, offset: float, count: int, start_time: float,
+         destination: str = '10.0.2.2', seed: Optional[int] = None) -> Schedule:
+    """
+    Spread origins over the hosts h1, h2, ... in turn. The n-th origin of host hX sends from 10.n.(X >> 8).(X & 255),
+    so each origin has its own source IP, and origin i carries the IntHeader ID list [i + 1].
+    :param number: number of origins
+    :param num_of_hosts: number of hosts
+    :param rate: mean packets per second of an origin
+    :param spread: relative spread of the rates, drawn uniformly from rate * (1 +- spread)
+    :param offset: start offsets are drawn uniformly from 0 to this many seconds
+    :param count: number of frames sent by each origin
+    :param start_time: wall-clock time at which offsets are 0
+    :param destination: destination IP address of the ARP requests
+    :param seed: random seed of the rates and offsets
+    :return: schedule
+    """
+    if not 0 < num_of_hosts < 2 ** 16 or number > 256 * num_of_hosts:
+        raise ValueError('{} origins do not fit on {} hosts'.format(number, num_of_hosts))
+    if rate <= 0:
+        raise ValueError('The rate should be positive, got {}'.format(rate))
+    if not 0 <= spread < 1:
+        raise ValueError('The rate spread should be at least 0 and below 1, got {}'.format(spread))
+    rand = Random(seed)
+    origins = []
+    for index in range(number):
+        host_no = index % num_of_hosts + 1
+        origins.append(Origin(host='h{}'.format(host_no),
+                              interface='h{}-eth0'.format(host_no),
+                              source='10.{}.{}.{}'.format(index // num_of_hosts, host_no >> 8, host_no & 0xff),
+                              destination=destination,
+                              rate=rate * rand.uniform(1 - spread, 1 + spread),
+                              offset=rand.uniform(0, offset),
+                              count=count,
+                              ids=[index + 1],
+                              first_sequence=index * count))
+
+    return Schedule(start_time, origins)
+
+
+def open_unix_sender(path: str) -> socket.socket:
+    """
+    Open a unix datagram socket standing in for an interface, connected to capture_daemon.py -u
+    :param path: path of the socket of the interface
+    :return: socket
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.connect(path)
+
+    return sock
+
+
+def stand_in_mac(interface: str) -> bytes:
+    """
+    Make up a locally administered MAC address for an interface without one
+    :param interface: name of the interface, e.g. h3-eth0
+    :return: MAC address
+    """
+    host_no = int(interface.split('-')[0].lstrip('h') or 0)
+
+    return bytes([2, 0, 0, 0, host_no >> 8 & 0xff, host_no & 0xff])
+
+
+async def run(schedule: Schedule, sockets: Dict[str, Tuple[socket.socket, bytes]],
+              indices: Optional[Sequence[int]] = None) -> Tuple[SendReport, List[int]]:
+    """
+    Send the floods of many origins from one coroutine. Every origin has one pre-serialized frame and the next frame
+    of each origin waits in a heap, so the event loop only wakes up for the earliest one, and the sequence number and
+    send time are stamped just before the frame is sent. The lateness of each frame is reported as jitter.
+    :param schedule: schedule of the floods
+    :param sockets: interface -> socket and MAC address, for every interface of the origins
+    :param indices: indices of the origins to be sent, all of them if not given
+    :return: report of all floods and number of frames sent by each origin
+    """
+    origins = schedule.origins
+    indices = range(len(origins)) if indices is None else indices
+    buffers, offsets = dict(), dict()
+    for index in indices:
+        origin = origins[index]
+        sock, mac = sockets[origin.interface]
+        frame, offsets[index] = build_frame(mac, origin.source, origin.destination, origin.ids)
+        buffers[index] = bytearray(frame)
+
+    # Times of the schedule on the clock of perf_counter()
+    base = perf_counter() + schedule.start_time - time()
+    heap = [(base + origins[index].offset, index, 0) for index in indices if origins[index].count]
+    heapq.heapify(heap)
+    sent = [0] * len(origins)
+    lateness = array('d')
+    start = heap[0][0] if heap else perf_counter()
+    while heap:
+        remaining = heap[0][0] - perf_counter()
+        if remaining > SPIN_TIME:
+            await asyncio.sleep(remaining - SPIN_TIME)
+            continue
+        while perf_counter() < heap[0][0]:
+            pass
+
+        # Send every frame that is due, the earliest first
+        now = perf_counter()
+        while heap and heap[0][0] <= now:
+            scheduled, index, n = heap[0]
+            origin = origins[index]
+            buffer = buffers[index]
+            lateness.append(perf_counter() - scheduled)
+            STAMP.pack_into(buffer, offsets[index], STAMP_MAGIC, origin.first_sequence + n, time())
+            sockets[origin.interface][0].send(buffer)
+            sent[index] += 1
+            if n + 1 < origin.count:
+                heapq.heapreplace(heap, (base + origin.offset + (n + 1) / origin.rate, index, n + 1))
+            else:
+                heapq.heappop(heap)
+            now = perf_counter()
+    elapsed = perf_counter() - start
+    metrics.registry.inc('packets_sent', len(lateness))
+    metrics.registry.observe('flood_seconds', elapsed)
+    for late in lateness if metrics.registry.enabled else ():
+        metrics.registry.observe('send_lateness_seconds', late)
+
+    return make_report(len(lateness), elapsed, lateness), sent
+
+
+def open_sockets(interfaces: Sequence[str], mininet: bool = False,
+                 unix: Optional[str] = None) -> Dict[str, Tuple[socket.socket, bytes]]:
+    """
+    Open one sending socket per interface
+    :param interfaces: names of the interfaces
+    :param mininet: whether hX-eth0 is opened in the network namespace of Mininet host hX
+    :param unix: directory of the unix sockets of capture_daemon.py -u standing in for the interfaces, None to send
+                 on the interfaces
+    :return: interface -> socket and MAC address
+    """
+    sockets = dict()
+    try:
+        for interface in interfaces:
+            if unix is not None:
+                sockets[interface] = open_unix_sender(os.path.join(unix, interface)), stand_in_mac(interface)
+            else:
+                sock = open_in_namespace(interface, mininet_namespace(interface.split('-')[0]) if mininet else None,
+                                         lambda name: open_send_socket(name)[0])
+                sockets[interface] = sock, sock.getsockname()[4]
+    except BaseException:
+        for sock, _ in sockets.values():
+            sock.close()
+        raise
+
+    return sockets
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print('[\033[96mINFO\033[00m] {}'.format(log))
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-sc', '--schedule', help='Schedule file', type=str, default='../results/schedule.json')
+    parser.add_argument('-n', '--number', help='Number of origins of a new schedule (0 to send the schedule file)',
+                        type=int, default=0)
+    parser.add_argument('-hs', '--hosts', help='Number of hosts of the origins of a new schedule (0 for one host per '
+                                               'origin)', type=int, default=0)
+    parser.add_argument('-r', '--rate', help='Mean packets per second of an origin', type=float, default=100)
+    parser.add_argument('-rs', '--rate-spread', help='Relative spread of the rates of the origins', type=float,
+                        default=0.5)
+    parser.add_argument('-o', '--offset', help='Start offsets are drawn from 0 to this many seconds', type=float,
+                        default=1)
+    parser.add_argument('-c', '--count', help='Number of packets sent by each origin', type=int, default=100)
+    parser.add_argument('-dst', '--destination', help='Destination IP', type=str, default='10.0.2.2')
+    parser.add_argument('-st', '--start', help='Seconds from now to the start of a new schedule', type=float,
+                        default=3)
+    parser.add_argument('-s', '--seed', help='Random seed of a new schedule', type=int, default=None)
+    parser.add_argument('-po', '--plan-only', help='Write the new schedule without sending it', action='store_true')
+    parser.add_argument('-if', '--interfaces', help='Only send the origins of these interfaces', type=str, nargs='*',
+                        default=None)
+    parser.add_argument('-m', '--mininet', help='Open hX-eth0 in the network namespace of Mininet host hX',
+                        action='store_true')
+    parser.add_argument('-u', '--unix', help='Send to the unix sockets of capture_daemon.py -u in this directory '
+                                             'instead of the interfaces', type=str, default=None)
+    metrics.add_arguments(parser)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 multi_flood.py [-sc schedule] [-n number_of_origins] [-hs number_of_hosts] [-r rate]
+                 [-rs rate_spread] [-o offset] [-c count] [-dst dstIP] [-st start] [-s seed] [-po]
+                 [-if interfaces] [-m] [-u unix_directory] [-mt metrics] [-mi metrics_interval] [-pf profile]
+    """
+    args = parse_arguments()
+    metrics.setup('multi_flood', args)
+
+    if args.number:
+        schedule_dir = os.path.dirname(args.schedule)
+        if schedule_dir:
+            os.makedirs(schedule_dir, exist_ok=True)
+        plan(args.number, args.hosts or args.number, args.rate, args.rate_spread, args.offset, args.count,
+             time() + args.start, args.destination, args.seed).save(args.schedule)
+        info_log('Wrote the schedule of {} origins to {}'.format(args.number, args.schedule))
+        if args.plan_only:
+            sys.exit(0)
+    flood_schedule = Schedule.load(args.schedule)
+    selected = [index for index, item in enumerate(flood_schedule.origins)
+                if args.interfaces is None or item.interface in args.interfaces]
+    info_log('{}'.format(datetime.now()))
+    info_log('{} origins on {} interfaces start at {}'.format(
+        len(selected), len({flood_schedule.origins[index].interface for index in selected}),
+        datetime.fromtimestamp(flood_schedule.start_time)))
+    if flood_schedule.start_time < time():
+        info_log('The schedule started {:.3f} s ago, late frames are sent at once'.format(
+            time() - flood_schedule.start_time))
+
+    opened = open_sockets(list(dict.fromkeys(flood_schedule.origins[index].interface for index in selected)),
+                          args.mininet, args.unix)
+    loop = asyncio.get_event_loop()
+    try:
+        with metrics.profiled(args.profile):
+            report, _ = loop.run_until_complete(run(flood_schedule, opened, selected))
+        info_log('Sent {} packets in {:.3f} s, {:.0f} pps'.format(report.sent, report.elapsed, report.pps))
+        info_log('Schedule lateness mean {:.1f} us, p99 {:.1f} us, max {:.1f} us'.format(
+            report.jitter_mean * 1e6, report.jitter_p99 * 1e6, report.jitter_max * 1e6))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.close()
+        for opened_socket, _ in opened.values():
+            opened_socket.close()
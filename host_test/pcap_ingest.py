@@ -0,0 +1,319 @@
+import sys
+import os
+import json
+import struct
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from capture import decode_frame
+import metrics
+from measurement import SequenceTracker
+from result_log import FORMATS, next_result_path
+from result_sink import COLUMNS, LATENCY_COLUMNS
+from routes import RouteTable
+
+
+# Classic pcap as written by tcpdump and by the pcap dumps of the switches ("pcap_dump": true in p4app.json).
+# Magic -> unit of the fractional part of the timestamps (microseconds or nanoseconds)
+PCAP_MAGICS = {0xa1b2c3d4: 1e-6, 0xa1b23c4d: 1e-9}
+PCAP_SUFFIX = '.pcap'
+LINKTYPE_ETHERNET = 1
+
+_PCAP_HEADER = struct.Struct('IHHiIII')  # magic, major, minor, time zone, sigfigs, snaplen, link type
+
+# Bytes read from a pcap file at once
+CHUNK_SIZE = 1 << 20
+
+# Rows buffered by the result writer, results are written in bulk instead of row by row as by a live receiver
+FLUSH_ROWS = 10000
+
+# Suffixes of the pcap dumps of a switch port, frames leaving the port are the frames its neighbor receives
+DIRECTIONS = ('_in', '_out')
+
+
+class IngestJob(NamedTuple):
+    path: str
+    filename: str
+    start_time: float
+    latency: bool
+    result_format: str
+
+
+class IngestReport(NamedTuple):
+    path: str
+    filename: str
+    frames: int
+    requests: int
+    rows: int
+    size: int
+    elapsed: float
+    lines: List[str]
+
+
+def pcap_format(header: bytes, path: str) -> Tuple[struct.Struct, float]:
+    """
+    Check the global header of a pcap file
+    :param header: first bytes of the file
+    :param path: path of the file, for error messages
+    :return: struct of the record headers in the byte order of the file and unit of their fractional timestamps
+    """
+    if len(header) == _PCAP_HEADER.size:
+        for order in '<>':
+            magic, _, _, _, _, _, link_type = struct.unpack(order + _PCAP_HEADER.format, header)
+            if magic in PCAP_MAGICS:
+                if link_type != LINKTYPE_ETHERNET:
+                    raise ValueError('{} has link type {}, only Ethernet ({}) is supported'.format(
+                        path, link_type, LINKTYPE_ETHERNET))
+                return struct.Struct(order + 'IIII'), PCAP_MAGICS[magic]
+
+    raise ValueError('{} is not a pcap file (pcapng is not supported)'.format(path))
+
+
+def read_pcap(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[float, memoryview]]:
+    """
+    Stream the frames of a pcap file, only one chunk of the file is in memory at a time. A record being written, i.e.
+    a trailing partial record, is left out.
+    :param path: path of the pcap file
+    :param chunk_size: number of bytes read at once
+    :return: capture timestamp in seconds since the epoch and frame, as captured (up to the snaplen)
+    """
+    with open(path, 'rb', buffering=0) as in_file:
+        record, unit = pcap_format(in_file.read(_PCAP_HEADER.size), path)
+        data = b''
+        while True:
+            chunk = in_file.read(chunk_size)
+            if not chunk:
+                return
+            data = data[offset:] + chunk if data else chunk
+            view = memoryview(data)
+            offset = 0
+            while offset + record.size <= len(data):
+                seconds, fraction, captured_length, _ = record.unpack_from(data, offset)
+                end = offset + record.size + captured_length
+                if end > len(data):
+                    break
+                yield seconds + fraction * unit, view[offset + record.size:end]
+                offset = end
+
+
+def first_timestamp(path: str) -> Optional[float]:
+    """
+    Get the capture timestamp of the first frame of a pcap file
+    :param path: path of the pcap file
+    :return: seconds since the epoch, None if the file has no frame
+    """
+    for timestamp, _ in read_pcap(path, 4096):
+        return timestamp
+
+    return None
+
+
+def load_topology(path: str) -> Dict[str, str]:
+    """
+    Map the switch ports facing a host to the interface of that host, from the topology.db written by p4run
+    :param path: path of topology.db
+    :return: switch port, e.g. s1-eth1 -> host interface, e.g. h1-eth0
+    """
+    with open(path) as in_file:
+        network = json.load(in_file)
+
+    ports = dict()
+    for node, attributes in network.items():
+        for port, neighbor in attributes.get('interfaces_to_node', dict()).items():
+            if network.get(neighbor, dict()).get('type') == 'host':
+                ports[port] = network[neighbor][node]['intf']
+
+    return ports
+
+
+def interface_name(path: str, ports: Optional[Dict[str, str]]) -> Optional[str]:
+    """
+    Name the interface whose received frames are in a pcap file
+    :param path: path of the pcap file, <interface>.pcap or <switch port>_(in|out).pcap
+    :param ports: switch port -> host interface (see load_topology), None to name the results after the file, e.g.
+                  s1-eth1-out for s1-eth1_out.pcap
+    :return: name of the interface, None for the dumps of a switch port which is not facing a host or of the frames
+             entering a switch
+    """
+    stem = os.path.basename(path)[:-len(PCAP_SUFFIX)]
+    port, _, direction = stem.rpartition('_')
+    if ports is None or '_' + direction not in DIRECTIONS:
+        # Result files are named <interface>_<number>, the interface must not hold another underscore
+        return stem.replace('_', '-')
+
+    return ports.get(port) if '_' + direction == DIRECTIONS[1] else None
+
+
+def list_pcap_files(paths: List[str]) -> List[str]:
+    """
+    List the pcap files among the given paths, directories are listed
+    :param paths: paths of pcap files or of directories holding them
+    :return: paths of the pcap files
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(PCAP_SUFFIX))
+        else:
+            files.append(path)
+
+    return files
+
+
+def plan(files: List[str], ports: Optional[Dict[str, str]], dir_name: str, start_time: Optional[float],
+         latency: bool = False, result_format: str = 'csv') -> List[IngestJob]:
+    """
+    Assign each pcap file its result file, numbered after the results already in the directory as by receiver.py
+    :param files: paths of the pcap files
+    :param ports: switch port -> host interface (see load_topology), None to name the results after the files
+    :param dir_name: name of the results directory
+    :param start_time: capture timestamp at which Time is 0, the first frame of all files if None
+    :param latency: whether to store the sequence number, send time and one-way latency of stamped packets
+    :param result_format: format of the result files, one of FORMATS
+    :return: jobs, the largest files first
+    """
+    suffix = FORMATS[result_format][0]
+    named = [(path, interface_name(path, ports)) for path in files]
+    named = [(path, name) for path, name in named if name is not None]
+    if start_time is None:
+        timestamps = [timestamp for timestamp in map(first_timestamp, [path for path, _ in named])
+                      if timestamp is not None]
+        start_time = min(timestamps, default=0)
+
+    jobs = []
+    numbers = dict()  # type: Dict[str, int]
+    for path, name in named:
+        filename, number = next_result_path(dir_name, name, suffix, numbers.get(name, 0))
+        numbers[name] = number + 1
+        jobs.append(IngestJob(path, filename, start_time, latency, result_format))
+
+    return sorted(jobs, key=lambda job: os.path.getsize(job.path), reverse=True)
+
+
+def ingest_file(job: IngestJob) -> IngestReport:
+    """
+    Store the traversed routes of the ARP requests in a pcap file as receiver.py stores those it captures, Time being
+    the capture timestamp of the frame minus the start time
+    :param job: pcap file, result file and options
+    :return: report of the file
+    """
+    start = perf_counter()
+    writer_class = FORMATS[job.result_format][1]
+    route_table = RouteTable()
+    tracker = SequenceTracker()
+    writer = None
+    frames = requests = rows = 0
+    try:
+        for timestamp, frame in read_pcap(job.path):
+            frames += 1
+            decoded = decode_frame(frame)
+            if decoded is None:
+                continue
+            requests += 1
+            psrc, _, num_of_switches, ids, stamp = decoded
+            if num_of_switches is None:
+                continue
+            if writer is None:
+                writer = writer_class(job.filename, FLUSH_ROWS, 0, LATENCY_COLUMNS if job.latency else COLUMNS)
+
+            # Store the result, the INT header lists the last traversed switch first
+            route = route_table.names[route_table.intern_ids(ids[::-1])]
+            elapsed_time = timestamp - job.start_time
+            if not job.latency:
+                writer.write(num_of_switches, route, elapsed_time)
+            elif stamp is None:
+                writer.write(num_of_switches, route, elapsed_time, '', '', '')
+            else:
+                sequence, send_time = stamp
+                writer.write(num_of_switches, route, elapsed_time, sequence, send_time,
+                             tracker.add(psrc, sequence, send_time, timestamp))
+            rows += 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return IngestReport(job.path, job.filename, frames, requests, rows, os.path.getsize(job.path),
+                        perf_counter() - start, tracker.report())
+
+
+def ingest(jobs: List[IngestJob], num_of_workers: int) -> Iterator[IngestReport]:
+    """
+    Ingest pcap files, in parallel if there are several workers
+    :param jobs: pcap files and their result files (see plan)
+    :param num_of_workers: number of processes ingesting pcap files (1 to ingest them in this process)
+    :return: report of each file, as it is done
+    """
+    if num_of_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=num_of_workers) as executor:
+            yield from executor.map(ingest_file, jobs)
+    else:
+        yield from map(ingest_file, jobs)
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print('[\033[96mINFO\033[00m] {}'.format(log))
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-p', '--pcaps', help='pcap files, or directories holding them', type=str, nargs='+',
+                        default=['../pcap'])
+    parser.add_argument('-t', '--topology', help='topology.db of p4run, to store the frames leaving each switch port '
+                                                 'as the results of the host behind it', type=str, default=None)
+    parser.add_argument('-d', '--directory', help='Name of the results directory', type=str, default='../results')
+    parser.add_argument('-w', '--workers', help='Number of processes ingesting pcap files', type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument('-st', '--start-time', help='Capture timestamp at which Time is 0 (default: first frame of all '
+                                                    'pcap files)', type=float, default=None)
+    parser.add_argument('-l', '--latency', help='Store the sequence number, send time and one-way latency of packets '
+                                                'stamped by sender.py -m raw', action='store_true')
+    parser.add_argument('-fm', '--format', help='Format of the result files', type=str, choices=list(FORMATS),
+                        default='csv')
+    metrics.add_arguments(parser)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 pcap_ingest.py [-p pcaps] [-t topology] [-d directory] [-w num_of_workers] [-st start_time]
+                 [-l] [-fm (csv|binary)] [-mt metrics] [-mi metrics_interval] [-pf profile]
+    """
+    args = parse_arguments()
+    metrics.setup('pcap_ingest', args)
+
+    info_log('{}'.format(datetime.now()))
+    start = perf_counter()
+    ingest_jobs = plan(list_pcap_files(args.pcaps), load_topology(args.topology) if args.topology else None,
+                       args.directory, args.start_time, args.latency, args.format)
+    total_size = total_rows = 0
+    with metrics.profiled(args.profile):
+        for report in ingest(ingest_jobs, args.workers):
+            info_log('{}: {} frames, {} ARP requests, {} rows{} in {:.2f} s'.format(
+                report.path, report.frames, report.requests, report.rows,
+                ' -> {}'.format(report.filename) if report.rows else '', report.elapsed))
+            for line in report.lines:
+                info_log('  {}'.format(line))
+            metrics.registry.inc('frames', report.frames)
+            metrics.registry.inc('requests', report.requests)
+            metrics.registry.inc('rows_written', report.rows)
+            metrics.registry.observe('ingest_seconds', report.elapsed)
+            total_size += report.size
+            total_rows += report.rows
+
+    elapsed = perf_counter() - start
+    info_log('Ingested {} pcap file(s), {:.2f} MiB into {} rows in {:.2f} s ({:.1f} MiB/s)'.format(
+        len(ingest_jobs), total_size / 2 ** 20, total_rows, elapsed, total_size / 2 ** 20 / max(elapsed, 1e-9)))
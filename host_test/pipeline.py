@@ -0,0 +1,266 @@
+import sys
+import threading
+from array import array
+from collections import deque
+from time import perf_counter
+from typing import Any, Callable, List, Optional
+import metrics
+
+
+POLICIES = ['block', 'drop-newest', 'drop-oldest']
+
+
+class BoundedQueue:
+    """
+    FIFO queue holding at most maxsize items. When it is full, put() follows the backpressure policy:
+        - block: wait until there is room
+        - drop-newest: drop the new item
+        - drop-oldest: drop the oldest queued item to make room
+    """
+
+    def __init__(self, maxsize: int, policy: str = 'block') -> None:
+        """
+        Create a queue
+        :param maxsize: maximum number of queued items
+        :param policy: backpressure policy, one of POLICIES
+        :return: None
+        """
+        if policy not in POLICIES:
+            raise ValueError('Unknown backpressure policy: {}'.format(policy))
+        self.maxsize = max(maxsize, 1)
+        self.policy = policy
+        self.drops = 0
+        self.high_water = 0
+
+        self._items = deque()  # type: deque
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+
+    def put(self, item: Any) -> bool:
+        """
+        Queue an item
+        :param item: item to be queued
+        :return: whether the item is queued
+        """
+        with self._lock:
+            while len(self._items) >= self.maxsize:
+                if self.policy == 'block':
+                    self._not_full.wait()
+                    continue
+                self.drops += 1
+                if self.policy == 'drop-newest':
+                    return False
+                self._items.popleft()
+            self._items.append(item)
+            self.high_water = max(self.high_water, len(self._items))
+            self._not_empty.notify()
+
+        return True
+
+    def get(self) -> Optional[Any]:
+        """
+        Take the oldest item, waiting for one if the queue is empty
+        :return: item, None once the queue is closed and empty
+        """
+        with self._lock:
+            while not self._items:
+                if self._closed:
+                    return None
+                self._not_empty.wait()
+            item = self._items.popleft()
+            self._not_full.notify()
+
+        return item
+
+    def close(self) -> None:
+        """
+        Close the queue, get() returns None once the queued items are taken
+        :return: None
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+
+class StageStats:
+    """
+    Latency of a pipeline stage: how long items wait in its queue and how long it takes to process them
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Create the statistics of a stage
+        :param name: name of the stage
+        :return: None
+        """
+        self.name = name
+        self.wait = array('d')
+        self.service = array('d')
+        self.errors = 0
+
+    def add(self, wait: float, service: float) -> None:
+        """
+        Record an item
+        :param wait: seconds the item waited in the queue
+        :param service: seconds the stage took to process it
+        :return: None
+        """
+        self.wait.append(wait)
+        self.service.append(service)
+
+    def summary(self) -> str:
+        """
+        Summarize the latency of the stage
+        :return: summary
+        """
+        errors = ', {} failed'.format(self.errors) if self.errors else ''
+        if not self.wait:
+            return '{}: no item{}'.format(self.name, errors)
+
+        return '{}: {} items{}, wait {}, service {}'.format(self.name, len(self.wait), errors,
+                                                          format_latency(self.wait), format_latency(self.service))
+
+
+class Pipeline:
+    """
+    Capture -> decode -> write pipeline. The capture thread only timestamps frames and submits them, decoding and
+    writing run on their own threads behind bounded queues, so a slow stage never blocks the capture loop unless the
+    backpressure policy is 'block'.
+    """
+
+    def __init__(self, decode: Callable[[bytes], Optional[Any]], write: Callable[[Any, float], None],
+                 maxsize: int = 10000, policy: str = 'block') -> None:
+        """
+        Start the decode and write threads
+        :param decode: function decoding a frame, None to drop it
+        :param write: function writing a decoded frame with its capture timestamp
+        :param maxsize: maximum number of items in each queue
+        :param policy: backpressure policy of both queues, one of POLICIES
+        :return: None
+        """
+        self.decode = decode
+        self.write = write
+        self.submitted = 0
+        self.captured = BoundedQueue(maxsize, policy)
+        self.decoded = BoundedQueue(maxsize, policy)
+        self.stats = [StageStats('decode'), StageStats('write')]
+
+        self._threads = [threading.Thread(target=self._decode, daemon=True),
+                         threading.Thread(target=self._write, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, frame: bytes, timestamp: float) -> None:
+        """
+        Submit a captured frame
+        :param frame: frame, which must not be reused by the caller
+        :param timestamp: time at which the frame is captured
+        :return: None
+        """
+        self.submitted += 1
+        metrics.registry.inc('frames_submitted')
+        self.captured.put((frame, timestamp, perf_counter()))
+
+    def close(self) -> None:
+        """
+        Process the queued frames and stop the threads
+        :return: None
+        """
+        self.captured.close()
+        for thread in self._threads:
+            thread.join()
+        metrics.registry.set('decode_queue_drops', self.captured.drops)
+        metrics.registry.set('write_queue_drops', self.decoded.drops)
+
+    def report(self) -> List[str]:
+        """
+        Report the drops and the latency of each stage
+        :return: report lines
+        """
+        return ['{} frames submitted'.format(self.submitted)] + \
+            ['{} queue: {} dropped ({}), high water {}/{}'.format(name, queue.drops, queue.policy, queue.high_water,
+                                                                  queue.maxsize)
+             for name, queue in (('decode', self.captured), ('write', self.decoded))] + \
+            [stats.summary() for stats in self.stats]
+
+    def _decode(self) -> None:
+        try:
+            for frame, timestamp, queued in iter(self.captured.get, None):
+                start = perf_counter()
+                try:
+                    decoded = self.decode(frame)
+                except Exception as e:
+                    self._failed(self.stats[0], 'decode_errors', e)
+                    continue
+                done = perf_counter()
+                self.stats[0].add(start - queued, done - start)
+                metrics.registry.observe('decode_wait_seconds', start - queued)
+                metrics.registry.observe('decode_seconds', done - start)
+                if decoded is None:
+                    metrics.registry.inc('frames_filtered')
+                else:
+                    metrics.registry.inc('frames_decoded')
+                    self.decoded.put((decoded, timestamp, done))
+        finally:
+            self.decoded.close()
+            # Never leave the capture loop blocked on a stage which stopped
+            for _ in iter(self.captured.get, None):
+                self.captured.drops += 1
+
+    def _write(self) -> None:
+        try:
+            for decoded, timestamp, queued in iter(self.decoded.get, None):
+                start = perf_counter()
+                try:
+                    self.write(decoded, timestamp)
+                except Exception as e:
+                    self._failed(self.stats[1], 'write_errors', e)
+                    continue
+                done = perf_counter()
+                self.stats[1].add(start - queued, done - start)
+                metrics.registry.observe('write_wait_seconds', start - queued)
+                metrics.registry.observe('write_seconds', done - start)
+        finally:
+            # Never leave the decode stage, and close() waiting on it, blocked on a stage which stopped
+            for _ in iter(self.decoded.get, None):
+                self.decoded.drops += 1
+
+    @staticmethod
+    def _failed(stats: StageStats, counter: str, error: Exception) -> None:
+        """
+        Count and log an item a stage failed to process, the stage goes on with the next item
+        :param stats: statistics of the stage
+        :param counter: name of the error counter of the stage
+        :param error: exception raised by the stage
+        :return: None
+        """
+        stats.errors += 1
+        metrics.registry.inc(counter)
+        error_log('{} failed: {!r}'.format(stats.name, error))
+
+
+def format_latency(samples: array) -> str:
+    """
+    Format the median, 99th percentile and maximum of latency samples
+    :param samples: latency samples in seconds
+    :return: formatted latency
+    """
+    ordered = sorted(samples)
+
+    return 'p50 {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms'.format(ordered[len(ordered) // 2] * 1000,
+                                                               ordered[min(len(ordered) * 99 // 100,
+                                                                           len(ordered) - 1)] * 1000,
+                                                               ordered[-1] * 1000)
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print('[\033[91mERROR\033[00m] {}'.format(log))
+    sys.stdout.flush()
@@ -1,68 +1,152 @@
 import sys
-import os
+import signal
 from time import time
-from pandas import DataFrame, read_csv
 from argparse import ArgumentParser, Namespace
 from scapy.layers.l2 import Ether, ARP
 from scapy.packet import Packet, Padding
-from scapy.sendrecv import sniff
+from scapy.arch.linux import L2ListenSocket
 from datetime import datetime
+from typing import List, Optional, Tuple
 from header import IntHeader
-
-
-def sniffer(name_of_interface: str) -> None:
+from capture import CAPTURING, Decoded, open_raw_socket, capture, decode_frame, enable_timestamps, \
+    kernel_statistics, set_receive_buffer
+from int_codec import INT_COUNT, INT_ID_SIZE, find_stamp
+import metrics
+from measurement import SequenceTracker
+from multi_flood import Schedule
+from pipeline import POLICIES, Pipeline
+from result_log import FORMATS, next_result_path
+from result_sink import COLUMNS, LATENCY_COLUMNS
+from routes import RouteTable
+
+
+def sniffer(name_of_interface: str, engine: str, dir_name: str) -> None:
     """
-    Sniffer sniffing ARP packets
+    Sniffer sniffing ARP packets. The capture loop only submits frames with their kernel receive timestamps to a
+    pipeline, which decodes and stores them on its own threads
     :param name_of_interface: name of the interface to be sniffed
+    :param engine: 'scapy' for a scapy listening socket, 'raw' for an AF_PACKET socket with a kernel BPF filter
+    :param dir_name: name of the results directory
     :return: None
     """
     start_time = time()
-    sniff(lfilter=lambda pkt: ARP in pkt, iface=name_of_interface,
-          prn=lambda x: handler(x, name_of_interface, start_time))
+    pipeline = Pipeline(lambda frame: decode(frame, engine),
+                        lambda decoded, timestamp: store(name_of_interface, dir_name, timestamp - start_time,
+                                                         *decoded, receive_time=timestamp),
+                        queue_size, backpressure)
+    sock = None
+    try:
+        if engine == 'raw':
+            sock = open_raw_socket(name_of_interface)
+            set_receive_buffer(sock, receive_buffer)
+            enable_timestamps(sock)
+            info_log(CAPTURING.format(name_of_interface))
+            capture(sock, lambda frame, timestamp: pipeline.submit(bytes(frame), timestamp), kernel_timestamps=True)
+        else:
+            listener = L2ListenSocket(iface=name_of_interface)
+            sock = listener.ins
+            set_receive_buffer(sock, receive_buffer)
+            info_log(CAPTURING.format(name_of_interface))
+            while True:
+                _, frame, timestamp = listener.recv_raw()
+                if frame is not None:
+                    pipeline.submit(frame, time() if timestamp is None else float(timestamp))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.close()
+        if writer is not None:
+            writer.close()
+
+        # Report what was lost on the way
+        statistics = None if sock is None else kernel_statistics(sock)
+        if statistics is not None:
+            info_log('Kernel: {} frames received, {} dropped'.format(*statistics))
+            metrics.registry.set('kernel_frames_received', statistics[0])
+            metrics.registry.set('kernel_frames_dropped', statistics[1])
+        for line in pipeline.report() + tracker.report():
+            info_log(line)
+        if sock is not None:
+            sock.close()
+
+
+def decode(frame: bytes, engine: str) -> Optional[Decoded]:
+    """
+    Decode a captured frame
+    :param frame: raw Ethernet frame
+    :param engine: 'scapy' to dissect it with scapy, 'raw' for decode_frame()
+    :return: source IP, source MAC, number of switches (None without INT header), switch IDs and sequence stamp
+             (None without stamp), or None if the frame is not a broadcast ARP request
+    """
+    if engine == 'raw':
+        return decode_frame(memoryview(frame))
+    pkt = Ether(frame)
 
+    return dissect(pkt) if ARP in pkt else None
 
-def handler(pkt: Packet, name_of_interface: str, start_time: float) -> None:
+
+def dissect(pkt: Packet) -> Optional[Decoded]:
     """
-    Handler dealing with captured ARP requests
+    Extract the INT header and the sequence stamp behind it from an ARP request dissected by scapy
     :param pkt: packet received
-    :param name_of_interface: name of the interface to be sniffed
-    :param start_time: start time
-    :return: None
+    :return: source IP, source MAC, number of switches (None without INT header), switch IDs and sequence stamp
+             (None without stamp), or None if the packet is not a broadcast ARP request
     """
-    elapsed_time = time() - start_time
     # Only process ARP requests
     if pkt[ARP].op == 1 and pkt[Ether].dst == 'ff:ff:ff:ff:ff:ff':
-        info_log('Got ARP request from IP: {}, MAC: {}, {}'.format(pkt[ARP].psrc, pkt[ARP].hwsrc, elapsed_time))
         arp = pkt[ARP]
         if Padding in arp:
-            int_header = IntHeader(bytes(arp[Padding]))
-            info_log('Traverse {} switch(es) with id(s): {}\n'.format(int_header.len, int_header.id))
-
-            # Get file number
-            global number
-            if not number > -1:
-                number = 0
-                filename = '../results/{}_{}.csv'.format(name_of_interface, number)
-                while os.path.exists(filename):
-                    number += 1
-                    filename = '../results/{}_{}.csv'.format(name_of_interface, number)
-            else:
-                filename = '../results/{}_{}.csv'.format(name_of_interface, number)
-
-            # Store the result
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
-            ids = list(int_header.id)
-            ids.reverse()
-            new_entry = DataFrame([[int_header.len, ', '.join([str(i) for i in ids]), elapsed_time]],
-                                  columns=['Num_of_switch', 'IDs', 'Time'])
-            if os.path.exists(filename):
-                result = read_csv(filename)
-                result = result.append(new_entry, ignore_index=True)
-                result.to_csv(filename, index=False)
-            else:
-                new_entry.to_csv(filename, index=False)
-
-    return
+            payload = bytes(arp[Padding])
+            int_header = IntHeader(payload)
+            return arp.psrc, arp.hwsrc, int_header.len, list(int_header.id), \
+                find_stamp(payload, INT_COUNT.size + INT_ID_SIZE * int_header.len)
+        return arp.psrc, arp.hwsrc, None, [], None
+
+    return None
+
+
+def store(name_of_interface: str, dir_name: str, elapsed_time: float, psrc: str, hwsrc: str,
+          num_of_switches: Optional[int], ids: List[int], stamp: Optional[Tuple[int, float]] = None,
+          receive_time: float = 0) -> None:
+    """
+    Log an ARP request and store the traversed route if it carries an INT header
+    :param name_of_interface: name of the interface to be sniffed
+    :param dir_name: name of the results directory
+    :param elapsed_time: time at which the packet is received, relative to the start of this receiver, so it cannot be
+                         compared across hosts (the latency can)
+    :param psrc: source IP address
+    :param hwsrc: source MAC address
+    :param num_of_switches: number of traversed switches, None if there is no INT header
+    :param ids: IDs of the traversed switches in the order of the INT header
+    :param stamp: sequence number and send time stamped by the sender, None if there is no stamp
+    :param receive_time: kernel receive timestamp, on the same clock as the send time
+    :return: None
+    """
+    info_log('Got ARP request from IP: {}, MAC: {}, {}'.format(psrc, hwsrc, elapsed_time))
+    if num_of_switches is None:
+        return
+    info_log('Traverse {} switch(es) with id(s): {}\n'.format(num_of_switches, ids))
+
+    # Get file number
+    global number, writer
+    if not number > -1:
+        suffix, writer_class = FORMATS[result_format]
+        filename, file_number = next_result_path(dir_name, name_of_interface, suffix)
+        writer = writer_class(filename, flush_rows, flush_time, LATENCY_COLUMNS if latency else COLUMNS)
+        # Only once the writer is open, so that a failed open is retried by the next packet
+        number = file_number
+
+    # Store the result, the INT header lists the last traversed switch first
+    route = route_table.intern_ids(ids[::-1])
+    if not latency:
+        writer.write(num_of_switches, route_table.names[route], elapsed_time)
+    elif stamp is None:
+        writer.write(num_of_switches, route_table.names[route], elapsed_time, '', '', '')
+    else:
+        sequence, send_time = stamp
+        writer.write(num_of_switches, route_table.names[route], elapsed_time, sequence, send_time,
+                     tracker.add(psrc if schedule is None else schedule.name(psrc, sequence), sequence, send_time,
+                                 receive_time))
 
 
 def info_log(log: str) -> None:
@@ -82,6 +166,25 @@ def parse_arguments() -> Namespace:
     """
     parser = ArgumentParser()
     parser.add_argument('-if', '--interface', help='Name of the interface', type=str, default='h2-eth0')
+    parser.add_argument('-e', '--engine', help='Capture engine', type=str, choices=['scapy', 'raw'], default='scapy')
+    parser.add_argument('-d', '--directory', help='Name of the results directory', type=str, default='../results')
+    parser.add_argument('-fr', '--flush-rows', help='Flush results after this many rows (0 to disable)', type=int,
+                        default=1)
+    parser.add_argument('-ft', '--flush-time', help='Flush results every this many milliseconds (0 to disable)',
+                        type=float, default=0)
+    parser.add_argument('-q', '--queue-size', help='Maximum number of frames in each queue of the pipeline', type=int,
+                        default=10000)
+    parser.add_argument('-bp', '--backpressure', help='What to do when a queue of the pipeline is full', type=str,
+                        choices=POLICIES, default='block')
+    parser.add_argument('-rb', '--receive-buffer', help='Size of the kernel receive buffer in KiB', type=int,
+                        default=4096)
+    parser.add_argument('-l', '--latency', help='Store the sequence number, send time and one-way latency of packets '
+                                                'stamped by sender.py -m raw', action='store_true')
+    parser.add_argument('-fm', '--format', help='Format of the result files', type=str, choices=list(FORMATS),
+                        default='csv')
+    parser.add_argument('-sc', '--schedule', help='Schedule of multi_flood.py, to report the latency and loss of '
+                                                  'each origin with -l', type=str, default=None)
+    metrics.add_arguments(parser)
 
     return parser.parse_args()
 
@@ -89,16 +192,34 @@ def parse_arguments() -> Namespace:
 if __name__ == '__main__':
     """
     Main function
-        command: python3 receiver.py [-if interface]
+        command: python3 receiver.py [-if interface] [-e (scapy|raw)] [-d directory] [-fr flush_rows] [-ft flush_time]
+                 [-q queue_size] [-bp backpressure] [-rb receive_buffer] [-l] [-fm (csv|binary)] [-sc schedule]
+                 [-mt metrics] [-mi metrics_interval] [-pf profile]
     """
     # Parse arguments
     args = parse_arguments()
     interface = args.interface
-
-    # Set file number
+    engine = args.engine
+    flush_rows = args.flush_rows
+    flush_time = args.flush_time
+    queue_size = args.queue_size
+    backpressure = args.backpressure
+    receive_buffer = args.receive_buffer * 1024
+    latency = args.latency
+    result_format = args.format
+    schedule = None if args.schedule is None else Schedule.load(args.schedule)
+    metrics.setup('receiver', args)
+
+    # Set file number, result writer, route dictionary and sequence tracker
     number = -1
+    writer = None
+    route_table = RouteTable()
+    tracker = SequenceTracker()
 
     # Start sniffer
     info_log('{}'.format(datetime.now()))
     info_log('Start sniffer on interface {}. Quit the sniffer with CONTROL-C.\n'.format(interface))
-    sniffer(interface)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    signal.signal(signal.SIGHUP, signal.default_int_handler)
+    with metrics.profiled(args.profile):
+        sniffer(interface, engine, args.directory)
@@ -0,0 +1,245 @@
+import os
+import numpy as np
+from typing import Dict, List, Tuple
+from int_codec import MAX_INT_HEADERS
+from result_sink import COLUMNS, LATENCY_COLUMNS, ResultWriter
+from routes import RouteTable, route_name
+
+
+# Binary result log, an alternative to the csv results with the same name and the .bin suffix.
+#   hX-eth0_N.bin:    header, then one fixed-size record per received packet (time, route code, number of switches)
+#   hX-eth0_N.routes: header, then one fixed-size record per distinct route (number of switches, padded IDs)
+# Both files are append-only and little-endian, so readers open them with np.memmap without parsing or copying.
+LOG_SUFFIX = '.bin'
+ROUTES_SUFFIX = '.routes'
+LOG_MAGIC = b'P4RL'
+ROUTES_MAGIC = b'P4RT'
+LOG_VERSION = 1
+
+# Flags of the header
+LATENCY_FLAG = 1
+
+HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u2'), ('flags', '<u2'), ('record_size', '<u4'),
+                         ('reserved', '<u4')])
+RECORD_DTYPE = np.dtype([('time', '<f8'), ('route', '<u4'), ('num_of_switch', '<u4')])
+LATENCY_RECORD_DTYPE = np.dtype(RECORD_DTYPE.descr + [('sequence', '<f8'), ('send_time', '<f8'),
+                                                      ('latency', '<f8')])
+ROUTE_DTYPE = np.dtype([('len', '<u4'), ('ids', '<u4', (MAX_INT_HEADERS,))])
+
+
+class ResultLogWriter(ResultWriter):
+    """
+    ResultWriter appending to a binary result log instead of a csv file, with the same flush policies.
+    A new route is appended to the route table before the first record referring to it.
+    """
+
+    def _open(self, columns: List[str]) -> None:
+        """
+        Open the result log and its route table for appending and write their headers if they are new
+        :param columns: COLUMNS or LATENCY_COLUMNS
+        :return: None
+        """
+        if columns not in (COLUMNS, LATENCY_COLUMNS):
+            raise ValueError('A result log stores {} or {}, not {}'.format(COLUMNS, LATENCY_COLUMNS, columns))
+        flags = LATENCY_FLAG if columns == LATENCY_COLUMNS else 0
+        self.dtype = LATENCY_RECORD_DTYPE if flags & LATENCY_FLAG else RECORD_DTYPE
+        self.routes = RouteTable(read_routes(routes_path(self.filename)) if os.path.exists(self.filename) else ())
+
+        self._file = open(self.filename, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(make_header(LOG_MAGIC, flags, self.dtype))
+            self._file.flush()
+        elif read_header(self.filename, LOG_MAGIC)['flags'] != flags:
+            raise ValueError('{} is not a result log of {}'.format(self.filename, columns))
+        self._routes_file = open(routes_path(self.filename), 'ab')
+        if self._routes_file.tell() == 0:
+            self._routes_file.write(make_header(ROUTES_MAGIC, 0, ROUTE_DTYPE))
+            self._routes_file.flush()
+
+    def _write_rows(self, rows: List[list]) -> None:
+        """
+        Append rows to the result log, the empty latency values of packets without stamp are stored as NaN
+        :param rows: rows to be written
+        :return: None
+        """
+        num_of_routes = len(self.routes)
+        records = np.array([(row[2], self.routes.intern_name(row[1]), row[0],
+                             *[float('nan') if value == '' else value for value in row[3:]]) for row in rows],
+                           dtype=self.dtype)
+        if len(self.routes) > num_of_routes:
+            self._routes_file.write(encode_routes(self.routes.ids[num_of_routes:]).tobytes())
+            self._routes_file.flush()
+        self._file.write(records.tobytes())
+        self._file.flush()
+
+    def _close(self) -> None:
+        """
+        Close the result log and its route table
+        :return: None
+        """
+        self._file.close()
+        self._routes_file.close()
+
+
+# Result formats of receiver.py and capture_daemon.py: suffix and writer of the result files
+FORMATS = {'csv': ('.csv', ResultWriter), 'binary': (LOG_SUFFIX, ResultLogWriter)}
+
+
+def routes_path(path: str) -> str:
+    """
+    Get the path of the route table of a result log
+    :param path: path of the result log
+    :return: path of the route table
+    """
+    return path[:-len(LOG_SUFFIX)] + ROUTES_SUFFIX
+
+
+def next_result_path(dir_name: str, name_of_interface: str, suffix: str, number: int = 0) -> Tuple[str, int]:
+    """
+    Get the path of the next result file of an interface, numbered after the results already in the directory
+    :param dir_name: name of the results directory
+    :param name_of_interface: name of the interface
+    :param suffix: suffix of the result format, see FORMATS
+    :param number: lowest number of the result file
+    :return: path of the result file and its number
+    """
+    filename = os.path.join(dir_name, '{}_{}{}'.format(name_of_interface, number, suffix))
+    while os.path.exists(filename):
+        number += 1
+        filename = os.path.join(dir_name, '{}_{}{}'.format(name_of_interface, number, suffix))
+
+    return filename, number
+
+
+def make_header(magic: bytes, flags: int, dtype: np.dtype) -> bytes:
+    """
+    Build the header of a result log or a route table
+    :param magic: LOG_MAGIC or ROUTES_MAGIC
+    :param flags: flags of the header
+    :param dtype: type of the records
+    :return: header
+    """
+    return np.array([(magic, LOG_VERSION, flags, dtype.itemsize, 0)], dtype=HEADER_DTYPE).tobytes()
+
+
+def read_header(path: str, magic: bytes) -> np.void:
+    """
+    Read and check the header of a result log or a route table
+    :param path: path of the file
+    :param magic: expected magic
+    :return: header
+    """
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) != 1 or header[0]['magic'] != magic:
+        raise ValueError('{} is not a {} file'.format(path, magic.decode()))
+    if header[0]['version'] != LOG_VERSION:
+        raise ValueError('{} has schema version {}, only {} is supported'.format(path, header[0]['version'],
+                                                                                 LOG_VERSION))
+
+    return header[0]
+
+
+def map_records(path: str, magic: bytes, dtype: np.dtype) -> np.ndarray:
+    """
+    Map the records of a result log or a route table without reading them. A record being appended, i.e. a trailing
+    partial record, is left out.
+    :param path: path of the file
+    :param magic: expected magic
+    :param dtype: type of the records
+    :return: read-only records
+    """
+    record_size = read_header(path, magic)['record_size']
+    if record_size != dtype.itemsize:
+        raise ValueError('{} has records of {} bytes, expected {}'.format(path, record_size, dtype.itemsize))
+    num_of_records = (os.path.getsize(path) - HEADER_DTYPE.itemsize) // dtype.itemsize
+    if num_of_records == 0:
+        return np.empty(0, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_DTYPE.itemsize, shape=(num_of_records,))
+
+
+def open_log(path: str) -> np.ndarray:
+    """
+    Map the records of a result log
+    :param path: path of the result log
+    :return: read-only records, with the latency fields if the log was written by receiver.py -l
+    """
+    latency = read_header(path, LOG_MAGIC)['flags'] & LATENCY_FLAG
+
+    return map_records(path, LOG_MAGIC, LATENCY_RECORD_DTYPE if latency else RECORD_DTYPE)
+
+
+def read_routes(path: str) -> List[str]:
+    """
+    Read a route table
+    :param path: path of the route table
+    :return: names of the routes, indexed by route code
+    """
+    return [route_name(route['ids'][:route['len']].tolist()) for route in map_records(path, ROUTES_MAGIC, ROUTE_DTYPE)]
+
+
+def read_log(path: str) -> Tuple[np.ndarray, List[str]]:
+    """
+    Map the records of a result log and read its route table
+    :param path: path of the result log
+    :return: read-only records and names of the routes, indexed by route code
+    """
+    return open_log(path), read_routes(routes_path(path))
+
+
+def log_columns(path: str) -> Dict[str, np.ndarray]:
+    """
+    Read a result log as the columns of the csv results
+    :param path: path of the result log
+    :return: column name -> column values, the latency columns are included if the log has them
+    """
+    records, names = read_log(path)
+    columns = {'Num_of_switch': np.array(records['num_of_switch'], dtype=np.int64),
+               'IDs': np.array(names, dtype=object)[records['route']],
+               'Time': np.array(records['time'])}
+    if records.dtype == LATENCY_RECORD_DTYPE:
+        columns.update({'Sequence': np.array(records['sequence']), 'Send_time': np.array(records['send_time']),
+                        'Latency': np.array(records['latency'])})
+
+    return columns
+
+
+def write_log(path: str, columns: Dict[str, np.ndarray]) -> None:
+    """
+    Write whole columns, e.g. of a csv result, as a new result log
+    :param path: path of the result log
+    :param columns: column name -> column values, with the latency columns for a log of receiver.py -l
+    :return: None
+    """
+    latency = all(column in columns for column in LATENCY_COLUMNS)
+    dtype = LATENCY_RECORD_DTYPE if latency else RECORD_DTYPE
+    routes = RouteTable()
+    records = np.empty(len(columns['Time']), dtype=dtype)
+    records['route'] = routes.encode(columns['IDs'])
+    records['num_of_switch'] = columns['Num_of_switch']
+    records['time'] = columns['Time']
+    if latency:
+        records['sequence'] = columns['Sequence']
+        records['send_time'] = columns['Send_time']
+        records['latency'] = columns['Latency']
+
+    with open(routes_path(path), 'wb') as out_file:
+        out_file.write(make_header(ROUTES_MAGIC, 0, ROUTE_DTYPE) + encode_routes(routes.ids).tobytes())
+    with open(path, 'wb') as out_file:
+        out_file.write(make_header(LOG_MAGIC, LATENCY_FLAG if latency else 0, dtype) + records.tobytes())
+
+
+def encode_routes(ids: List[Tuple[int, ...]]) -> np.ndarray:
+    """
+    Encode routes as route table records
+    :param ids: IDs of the traversed switches of each route
+    :return: records
+    """
+    records = np.zeros(len(ids), dtype=ROUTE_DTYPE)
+    for code, route in enumerate(ids):
+        if len(route) > MAX_INT_HEADERS:
+            raise ValueError('Route has {} switches, at most {} are allowed'.format(len(route), MAX_INT_HEADERS))
+        records['len'][code] = len(route)
+        records['ids'][code, :len(route)] = route
+
+    return records
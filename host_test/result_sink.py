@@ -0,0 +1,159 @@
+import csv
+import os
+import signal
+import threading
+from time import perf_counter, time
+from typing import List, Optional
+import metrics
+
+
+COLUMNS = ['Num_of_switch', 'IDs', 'Time']
+
+# Columns of the latency mode of receiver.py, taken from the sequence stamp of the sender
+LATENCY_COLUMNS = COLUMNS + ['Sequence', 'Send_time', 'Latency']
+
+
+class ResultWriter:
+    """
+    Open-once, buffered, append-only writer of the results of a receiver.
+    Rows are kept in memory and written to the csv file when one of the flush policies fires:
+        - every flush_rows rows
+        - every flush_time milliseconds
+        - on the given signals (see flush_on_signal)
+    """
+
+    def __init__(self, filename: str, flush_rows: int = 1, flush_time: float = 0, columns: List[str] = None) -> None:
+        """
+        Open the result file
+        :param filename: name of the csv file
+        :param flush_rows: flush after this many buffered rows (<= 0 to disable)
+        :param flush_time: flush buffered rows every flush_time milliseconds (<= 0 to disable)
+        :param columns: header of the csv file, COLUMNS if not given
+        :return: None
+        """
+        self.filename = filename
+        self.flush_rows = flush_rows
+        self.flush_time = flush_time / 1000.0
+        self.rows_written = 0
+
+        self._buffer = []  # type: List[list]
+        # Reentrant, so that a flush_on_signal handler running during write() or flush() does not deadlock
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._last_flush = time()
+
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open(COLUMNS if columns is None else columns)
+
+        self._timer = None  # type: Optional[threading.Thread]
+        if self.flush_time > 0:
+            self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._timer.start()
+
+    def write(self, num_of_switch: int, ids: str, elapsed_time: float, *extra) -> None:
+        """
+        Append one result row
+        :param num_of_switch: number of traversed switches
+        :param ids: traversed route
+        :param elapsed_time: time at which the packet is received
+        :param extra: values of the columns after Time, if any
+        :return: None
+        """
+        with self._lock:
+            self._buffer.append([num_of_switch, ids, elapsed_time, *extra])
+            if 0 < self.flush_rows <= len(self._buffer) or \
+                    (0 < self.flush_time <= time() - self._last_flush):
+                self._flush()
+
+    def flush(self) -> None:
+        """
+        Write all buffered rows to the file
+        :return: None
+        """
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """
+        Flush the remaining rows and close the file
+        :return: None
+        """
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._flush()
+            self._closed.set()
+            self._close()
+
+    def flush_on_signal(self, *signals: int) -> None:
+        """
+        Flush buffered rows when one of the signals arrives, then hand the signal to the previous handler
+        :param signals: signals to be handled, SIGINT if not given
+        :return: None
+        """
+        for signum in signals or (signal.SIGINT,):
+            previous = signal.getsignal(signum)
+
+            def handler(num, frame, previous=previous):
+                self.flush()
+                if callable(previous):
+                    previous(num, frame)
+                elif previous != signal.SIG_IGN:
+                    raise SystemExit(128 + num)
+
+            signal.signal(signum, handler)
+
+    def _flush(self) -> None:
+        """
+        Write all buffered rows to the file, the caller must hold the lock (or be a signal handler of the thread
+        holding it)
+        :return: None
+        """
+        self._last_flush = time()
+        if not self._buffer or self._closed.is_set():
+            return
+        # Take the rows first, a flush reentered from a signal handler must not write them twice
+        rows, self._buffer = self._buffer, []
+        start = perf_counter()
+        self._write_rows(rows)
+        metrics.registry.observe('flush_seconds', perf_counter() - start)
+        metrics.registry.inc('rows_written', len(rows))
+        self.rows_written += len(rows)
+
+    def _open(self, columns: List[str]) -> None:
+        """
+        Open the file for appending and write the header if the file is new
+        :param columns: header of the csv file
+        :return: None
+        """
+        self._file = open(self.filename, 'a', newline='')
+        self._writer = csv.writer(self._file)
+        if self._file.tell() == 0:
+            self._writer.writerow(columns)
+            self._file.flush()
+
+    def _write_rows(self, rows: List[list]) -> None:
+        """
+        Append rows to the file
+        :param rows: rows to be written
+        :return: None
+        """
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _close(self) -> None:
+        """
+        Close the file
+        :return: None
+        """
+        self._file.close()
+
+    def _flush_periodically(self) -> None:
+        """
+        Flush buffered rows every flush_time seconds until the writer is closed
+        :return: None
+        """
+        while not self._closed.wait(self.flush_time):
+            self.flush()
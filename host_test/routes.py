@@ -0,0 +1,106 @@
+import numpy as np
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+class RouteTable:
+    """
+    Route dictionary mapping each distinct sequence of switch IDs to a small integer code.
+    Routes are named as in the IDs column of the results, e.g. '1, 12, 2' for s1 -> s12 -> s2.
+    """
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        """
+        Create a route table
+        :param names: names of the routes to be interned first
+        :return: None
+        """
+        self.names = []  # type: List[str]
+        self.ids = []  # type: List[Tuple[int, ...]]
+        self._code_of_name = dict()  # type: Dict[str, int]
+        self._code_of_ids = dict()  # type: Dict[Tuple[int, ...], int]
+        for name in names:
+            self.intern_name(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern_ids(self, ids: Sequence[int]) -> int:
+        """
+        Get the code of a route, adding it to the table if it is new
+        :param ids: IDs of the traversed switches in the traversal order
+        :return: code of the route
+        """
+        ids = tuple(ids)
+        code = self._code_of_ids.get(ids)
+        if code is None:
+            code = self._add(route_name(ids), ids)
+
+        return code
+
+    def intern_name(self, name: str) -> int:
+        """
+        Get the code of a route, adding it to the table if it is new
+        :param name: name of the route
+        :return: code of the route
+        """
+        code = self._code_of_name.get(name)
+        if code is None:
+            code = self._add(name, parse_route(name))
+
+        return code
+
+    def encode(self, names: np.ndarray) -> np.ndarray:
+        """
+        Encode a column of route names, interning each distinct name once
+        :param names: route names
+        :return: route codes
+        """
+        distinct, inverse = np.unique(np.asarray(names).astype(str), return_inverse=True)
+
+        return self.translate(distinct.tolist(), inverse)
+
+    def translate(self, distinct: List[str], local_codes: np.ndarray) -> np.ndarray:
+        """
+        Translate codes of a local route dictionary, e.g. of one result file, into codes of this table
+        :param distinct: names of the local routes
+        :param local_codes: local route codes
+        :return: route codes of this table
+        """
+        lookup = np.array([self.intern_name(name) for name in distinct], dtype=np.uint32)
+
+        return lookup[np.asarray(local_codes).ravel()] if len(lookup) else np.empty(0, dtype=np.uint32)
+
+    def _add(self, name: str, ids: Tuple[int, ...]) -> int:
+        """
+        Add a new route to the table
+        :param name: name of the route
+        :param ids: IDs of the traversed switches
+        :return: code of the route
+        """
+        code = len(self.names)
+        self.names.append(name)
+        self.ids.append(ids)
+        self._code_of_name[name] = code
+        self._code_of_ids[ids] = code
+
+        return code
+
+
+def route_name(ids: Sequence[int]) -> str:
+    """
+    Name a route as in the IDs column of the results
+    :param ids: IDs of the traversed switches in the traversal order
+    :return: name of the route
+    """
+    return ', '.join([str(i) for i in ids])
+
+
+def parse_route(name: str) -> Tuple[int, ...]:
+    """
+    Parse the name of a route, the empty name of a packet without INT header is the empty route
+    :param name: name of the route
+    :return: IDs of the traversed switches in the traversal order
+    """
+    name = str(name).strip()
+
+    return tuple(int(i) for i in name.split(',')) if name else ()
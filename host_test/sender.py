@@ -1,8 +1,11 @@
 import sys
 from argparse import ArgumentParser, Namespace, ArgumentTypeError
 from scapy.layers.l2 import Ether, ARP
+from scapy.packet import Raw
 from scapy.sendrecv import sendp
-from header import IntHeader
+from int_codec import encode
+import metrics
+from flood import SendReport, build_frame, flood, open_send_socket
 from time import sleep
 
 
@@ -19,6 +22,17 @@ def check_int_range(value: str) -> int:
     return int_value
 
 
+def report_log(report: SendReport) -> None:
+    """
+    Print the report of a raw flood
+    :param report: report returned by flood()
+    :return: None
+    """
+    info_log('Sent {} packets in {:.3f} s, {:.0f} pps'.format(report.sent, report.elapsed, report.pps))
+    info_log('Pacing jitter mean {:.1f} us, p99 {:.1f} us, max {:.1f} us'.format(
+        report.jitter_mean * 1e6, report.jitter_p99 * 1e6, report.jitter_max * 1e6))
+
+
 def info_log(log: str) -> None:
     """
     Print logs
@@ -42,8 +56,17 @@ def parse_arguments() -> Namespace:
     parser.add_argument('-ch', '--check', help='Whether send packets again to test convergence', type=check_int_range,
                         default=0)
     parser.add_argument('-t', '--test', help='Whether test variable length field', type=check_int_range, default=0)
+    parser.add_argument('-m', '--mode', help='scapy sendp() or pre-serialized frames on a raw socket', type=str,
+                        choices=['scapy', 'raw'], default='scapy')
+    parser.add_argument('-r', '--rate', help='Packets per second in raw mode (0 for as fast as possible)', type=float,
+                        default=0)
+    parser.add_argument('-b', '--burst', help='Packets sent back to back in raw mode', type=int, default=1)
+    parser.add_argument('-d', '--duration', help='Seconds to keep sending in raw mode (0 to send count packets)',
+                        type=float, default=0)
+    parser.add_argument('-ci', '--check-interval', help='Seconds to wait before sending again', type=float, default=1)
     parser.add_argument('-i', '--id', help='IDs to be placed in variable length field', type=int, nargs='*',
                         default=[1])
+    metrics.add_arguments(parser)
 
     return parser.parse_args()
 
@@ -52,7 +75,8 @@ if __name__ == '__main__':
     """
     Main function
         command: python3 sender.py [-src srcIP] [-dst dstIP] [-if interface] [-c count] [-ch (0-1)] [-t (0-1)]
-                    [-i list_of_ids]
+                    [-m (scapy|raw)] [-r rate] [-b burst] [-d duration] [-ci check_interval] [-i list_of_ids]
+                    [-mt metrics] [-mi metrics_interval] [-pf profile]
     """
     # Parse arguments
     args = parse_arguments()
@@ -62,17 +86,40 @@ if __name__ == '__main__':
     count = args.count
     check = args.check
     test = args.test
+    mode = args.mode
+    rate = args.rate
+    burst = args.burst
+    duration = args.duration
+    check_interval = args.check_interval
     ids = args.id
+    metrics.setup('sender', args)
 
-    # Send packets
-    if test:
-        info_log('INT ARP with ids: {}'.format(ids))
-        packet = Ether(dst='ff:ff:ff:ff:ff:ff') / ARP(op=1, psrc=src_ip, pdst=dst_ip) / IntHeader(
-            proto=int('0x0800', 16), len=len(ids), id=ids)
-    else:
-        info_log('Pure ARP')
-        packet = Ether(dst='ff:ff:ff:ff:ff:ff') / ARP(op=1, psrc=src_ip, pdst=dst_ip)
-    sendp(packet, iface=interface, count=count)
-    if check:
-        sleep(1)
-        sendp(packet, iface=interface, count=count)
+    with metrics.profiled(args.profile):
+        if mode == 'raw':
+            # Send pre-serialized frames
+            info_log('{} with sequence stamps'.format('INT ARP with ids: {}'.format(ids) if test else 'Pure ARP'))
+            sock, src_mac = open_send_socket(interface)
+            frame, stamp_offset = build_frame(src_mac, src_ip, dst_ip, ids if test else None)
+            result = flood(sock, frame, stamp_offset, count=0 if duration else count, duration=duration, rate=rate,
+                           burst=burst)
+            report_log(result)
+            if check:
+                sleep(check_interval)
+                report_log(flood(sock, frame, stamp_offset, count=0 if duration else count, duration=duration,
+                                 rate=rate, burst=burst, first_sequence=result.sent))
+            sock.close()
+        else:
+            # Send packets
+            if test:
+                info_log('INT ARP with ids: {}'.format(ids))
+                packet = Ether(dst='ff:ff:ff:ff:ff:ff') / ARP(op=1, psrc=src_ip, pdst=dst_ip) / Raw(
+                    encode(ids, proto=int('0x0800', 16)))
+            else:
+                info_log('Pure ARP')
+                packet = Ether(dst='ff:ff:ff:ff:ff:ff') / ARP(op=1, psrc=src_ip, pdst=dst_ip)
+            with metrics.registry.timer('send_seconds'):
+                sendp(packet, iface=interface, count=count)
+            if check:
+                sleep(check_interval)
+                with metrics.registry.timer('send_seconds'):
+                    sendp(packet, iface=interface, count=count)
@@ -1,73 +1,623 @@
 import sys
 import os
+import csv
+import json
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gs
+from matplotlib.figure import Figure
 import numpy as np
 from pandas import read_csv, DataFrame
 from argparse import ArgumentParser, Namespace
 from math import ceil, floor, sqrt
 from random import sample
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, TypeVar
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from timeline import route_timeline, step_coords
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+import metrics  # noqa: E402
+from multi_flood import Schedule  # noqa: E402
+from result_log import LATENCY_RECORD_DTYPE, LOG_SUFFIX, log_columns, read_log  # noqa: E402
+from result_sink import LATENCY_COLUMNS  # noqa: E402
+from routes import RouteTable  # noqa: E402
 
-def aggregate(dir_name: str, num_of_pkt: int, num_of_rounds: int) -> None:
+
+RESULT_COLUMNS = ['Num_of_switch', 'IDs', 'Time']
+RESULT_DTYPES = {'Num_of_switch': np.int64, 'IDs': object, 'Time': np.float64, 'Sequence': np.float64,
+                 'Send_time': np.float64, 'Latency': np.float64}
+
+# Csv results up to this size are parsed with the csv module, read_csv costs about a millisecond per file
+SMALL_CSV_SIZE = 1 << 16
+# Floats are parsed by read_csv as by float() and the csv module, so that no value depends on the size of the file
+FLOAT_PRECISION = 'round_trip'
+
+T = TypeVar('T')
+
+
+class CodedResults(NamedTuple):
+    """
+    Results of all hosts as integer-coded columns, one entry per received packet
+    """
+    hosts: List[str]
+    routes: RouteTable
+    host_code: np.ndarray
+    test_no: np.ndarray
+    route_code: np.ndarray
+    num_of_switch: np.ndarray
+    time: np.ndarray
+    sequence: np.ndarray
+    latency: np.ndarray
+
+
+class Totals(NamedTuple):
+    """
+    Running totals of each host, whose size only depends on the number of distinct (host, route) pairs and tests
+    """
+    route_count: Dict[str, Dict[str, int]]
+    pkt_in_each_test: Dict[str, Dict[str, int]]
+    time_range: Dict[str, List[float]]
+
+
+# Schedule written into the results directory by multi_flood.py
+SCHEDULE_NAME = 'schedule.json'
+
+# Aggregation cache next to the results directory, e.g. results.cache.json
+CACHE_SUFFIX = '.cache.json'
+CACHE_VERSION = 2
+
+
+def aggregate(dir_name: str, num_of_pkt: int, num_of_rounds: int, num_of_workers: int, rebuild: bool,
+              bin_width: float, chunk_size: int = 0) -> None:
     """
     Aggregate the csv results in the given directory
     :param dir_name: name of the given directory
     :param num_of_pkt: number of packets sent in each round
     :param num_of_rounds: number of rounds in each test
+    :param num_of_workers: number of processes parsing csv files
+    :param rebuild: whether to ignore the aggregation cache and parse every file again
+    :param bin_width: width of a time bin of the route timelines in seconds
+    :param chunk_size: stream the csv results in chunks of this many rows without cache (0 to load whole files)
     :return: None
     """
-    # Aggregate all csv
-    aggregation_result = dict()
-    zero_serial_number_csv = dict()
-    pkt_in_each_test = dict()
-
-    with os.scandir(dir_name) as directory:
-        for file in directory:
-            if file.path.endswith('.csv') and file.is_file():
-                if file.name.partition('-')[1] != '':
-                    result = read_csv(file.path)
-                    host = file.name.partition('_')[0]  # which host the file belongs to
-                    if aggregation_result.get(host) is None:  # not exist -> create one
-                        aggregation_result[host] = result
-                    else:  # exist -> append to old one
-                        aggregation_result[host] = aggregation_result[host].append(result, ignore_index=True)
-
-                    # serial number
-                    serial_number = file.name.partition('_')[2][:-4]
-                    if serial_number == '0':
-                        zero_serial_number_csv[host] = result
-
-                    # Get number of received packets in each test
-                    if pkt_in_each_test.get(host) is None:
-                        pkt_in_each_test[host] = {serial_number: len(result.index)}
-                    else:
-                        pkt_in_each_test[host][serial_number] = len(result.index)
+    if chunk_size > 0:
+        # Stream all csv, memory only grows with the number of distinct (host, route) pairs
+        with metrics.registry.timer('parse_seconds'):
+            totals = stream_summaries(dir_name, num_of_workers, chunk_size)
+        names = [file.name for file in list_result_files(dir_name)]
+    else:
+        # Aggregate all csv, only new or changed files are parsed
+        with metrics.registry.timer('parse_seconds'):
+            summaries = load_summaries(dir_name, num_of_workers, rebuild)
+        with metrics.registry.timer('group_seconds'):
+            totals = merge_summary_totals(summaries)
+        names = list(summaries)
+    route_count, pkt_in_each_test = totals.route_count, totals.pkt_in_each_test
+    for host in sorted(totals.time_range, key=lambda key: (len(key), key)):
+        info_log(f'{host}: {sum(pkt_in_each_test[host].values())} packets in {len(pkt_in_each_test[host])} test(s), '
+                 f'{len(route_count[host])} route(s), time {totals.time_range[host][0]:.6f} s to '
+                 f'{totals.time_range[host][1]:.6f} s')
+    zero_serial_number_path = {get_host(name): os.path.join(dir_name, name) for name in names
+                               if get_serial_number(name) == '0'}
 
     # Get number of rows/columns for display
-    num_of_hosts = len(zero_serial_number_csv.keys())
+    num_of_hosts = len(zero_serial_number_path.keys())
     num_of_rows_or_cols = int(floor(sqrt(num_of_hosts)))
 
     # Get keys
     if num_of_rows_or_cols > 3:
-        keys = get_sampled_keys(list(zero_serial_number_csv), 9)
+        keys = get_sampled_keys(list(zero_serial_number_path), 9)
         num_of_rows_or_cols = 3
     else:
-        keys = get_sampled_keys(list(zero_serial_number_csv), num_of_rows_or_cols ** 2)
+        keys = get_sampled_keys(list(zero_serial_number_path), num_of_rows_or_cols ** 2)
 
     # Draw the results of first test
-    draw_first_results(zero_serial_number_csv, num_of_rows_or_cols, keys)
+    with metrics.registry.timer('parse_seconds'):
+        zero_serial_number_csv = {key: DataFrame(parse_result_file(zero_serial_number_path[key]),
+                                                 columns=RESULT_COLUMNS) for key in keys}
+    with metrics.registry.timer('render_seconds'):
+        draw_first_results(zero_serial_number_csv, num_of_rows_or_cols, keys, bin_width)
 
-    # Draw aggregation results
-    draw_aggregation(aggregation_result, num_of_rows_or_cols, keys, num_of_pkt, num_of_rounds)
+        # Draw aggregation results
+        draw_aggregation(route_count, pkt_in_each_test, num_of_rows_or_cols, keys, num_of_pkt, num_of_rounds)
 
-    # Draw number of received packets in each test
-    draw_pkt_in_each_round(pkt_in_each_test, num_of_rows_or_cols, keys)
+        # Draw number of received packets in each test
+        draw_pkt_in_each_round(pkt_in_each_test, num_of_rows_or_cols, keys)
+    for line in metrics.phase_summary():
+        info_log(line)
 
     plt.show()
 
 
+def list_result_files(dir_name: str) -> List[os.DirEntry]:
+    """
+    List the csv results and binary result logs, named as <host>-<interface>_<serial number>.csv (or .bin), in the
+    given directory
+    :param dir_name: name of the given directory
+    :return: entries of the results
+    """
+    with metrics.registry.timer('scan_seconds'), os.scandir(dir_name) as directory:
+        return [file for file in directory
+                if file.path.endswith(('.csv', LOG_SUFFIX)) and file.is_file() and file.name.partition('-')[1] != '']
+
+
+def get_host(name: str) -> str:
+    """
+    Get which host the result file belongs to
+    :param name: name of the result file
+    :return: name of the host
+    """
+    return name.partition('_')[0]
+
+
+def get_serial_number(name: str) -> str:
+    """
+    Get the serial number of the test from the name of the result file
+    :param name: name of the result file
+    :return: serial number
+    """
+    return name.partition('_')[2][:-4]
+
+
+def parse_in_pool(function: Callable[[str], T], paths: List[str], num_of_workers: int) -> List[T]:
+    """
+    Apply the function to every path with a process pool
+    :param function: function parsing one file
+    :param paths: paths of the files
+    :param num_of_workers: number of processes (<= 1 to parse in this process)
+    :return: results in the order of the paths
+    """
+    return list(iterate_in_pool(function, paths, num_of_workers))
+
+
+def iterate_in_pool(function: Callable[[str], T], paths: List[str], num_of_workers: int) -> Iterator[T]:
+    """
+    Apply the function to every path with a process pool, yielding each result as soon as it is in order
+    :param function: function parsing one file
+    :param paths: paths of the files
+    :param num_of_workers: number of processes (<= 1 to parse in this process)
+    :return: results in the order of the paths
+    """
+    if num_of_workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=num_of_workers) as executor:
+            yield from executor.map(function, paths, chunksize=max(1, len(paths) // num_of_workers // 4))
+    else:
+        yield from map(function, paths)
+
+
+def parse_result_file(path: str) -> Dict[str, np.ndarray]:
+    """
+    Parse one csv result or binary result log into typed columns
+    :param path: path of the result file
+    :return: column name -> column values
+    """
+    result = read_result_columns(path)
+
+    return {column: result[column] for column in RESULT_COLUMNS}
+
+
+def read_result_columns(path: str) -> Dict[str, np.ndarray]:
+    """
+    Parse every column of one csv result or binary result log, with the latency columns of receiver.py -l if present
+    :param path: path of the result file
+    :return: column name -> column values
+    """
+    if path.endswith(LOG_SUFFIX):
+        return log_columns(path)
+    if os.path.getsize(path) <= SMALL_CSV_SIZE:
+        return read_small_csv(path)
+    result = read_csv(path, dtype=RESULT_DTYPES, float_precision=FLOAT_PRECISION)
+    result['IDs'] = result['IDs'].fillna('')
+
+    return {column: result[column].to_numpy() for column in result.columns}
+
+
+def read_small_csv(path: str) -> Dict[str, np.ndarray]:
+    """
+    Parse one small csv result with the csv module into the same columns as read_csv
+    :param path: path of the result file
+    :return: column name -> column values, empty latency values of packets without stamp are NaN
+    """
+    with open(path, newline='') as in_file:
+        reader = csv.reader(in_file)
+        header = next(reader, RESULT_COLUMNS)
+        rows = list(reader)
+    values = list(zip(*rows)) if rows else [()] * len(header)
+
+    columns = dict()
+    for column, value in zip(header, values):
+        dtype = RESULT_DTYPES.get(column, object)
+        if dtype is object:
+            columns[column] = np.array(value, dtype=object)
+        elif dtype is np.float64 and '' in value:
+            columns[column] = np.array([item or 'nan' for item in value], dtype=np.float64)
+        else:
+            columns[column] = np.array(value, dtype=dtype)
+
+    return columns
+
+
+def load_coded_results(dir_name: str, num_of_workers: int, routes: RouteTable = None) -> CodedResults:
+    """
+    Parse the csv results in the given directory into integer-coded columns with a global route table
+    :param dir_name: name of the given directory
+    :param num_of_workers: number of processes parsing csv files (<= 1 to parse in this process)
+    :param routes: route table to be extended, a new one if not given
+    :return: coded results
+    """
+    routes = RouteTable() if routes is None else routes
+    files = list_result_files(dir_name)
+    parsed = parse_in_pool(parse_coded_result_file, [file.path for file in files], num_of_workers)
+
+    hosts = sorted({get_host(file.name) for file in files}, key=lambda host: (len(host), host))
+    code_of_host = {host: code for code, host in enumerate(hosts)}
+    host_code, test_no, route_code = [], [], []
+    for file, (distinct, local_codes, *_) in zip(files, parsed):
+        host_code.append(np.full(len(local_codes), code_of_host[get_host(file.name)], dtype=np.uint16))
+        test_no.append(np.full(len(local_codes), int(get_serial_number(file.name)), dtype=np.uint32))
+        route_code.append(routes.translate(distinct, local_codes))
+    return CodedResults(hosts=hosts,
+                        routes=routes,
+                        host_code=concatenate_columns(host_code, np.uint16),
+                        test_no=concatenate_columns(test_no, np.uint32),
+                        route_code=concatenate_columns(route_code, np.uint32),
+                        num_of_switch=concatenate_columns([columns[2] for columns in parsed], np.uint8),
+                        time=concatenate_columns([columns[3] for columns in parsed], np.float64),
+                        sequence=concatenate_columns([columns[4] for columns in parsed], np.float64),
+                        latency=concatenate_columns([columns[5] for columns in parsed], np.float64))
+
+
+def concatenate_columns(columns: List[np.ndarray], dtype: type) -> np.ndarray:
+    """
+    Concatenate the column of every file
+    :param columns: column of every file
+    :param dtype: type of an empty column
+    :return: concatenated column
+    """
+    return np.concatenate(columns).astype(dtype, copy=False) if columns else np.empty(0, dtype=dtype)
+
+
+def parse_coded_result_file(path: str) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray,
+                                                 np.ndarray]:
+    """
+    Parse one csv result with a local route dictionary, a binary result log already has one
+    :param path: path of the result file
+    :return: distinct routes, route codes into them, number of switches, time, sequence number and one-way latency
+             of each packet, the last two are NaN without the stamps of receiver.py -l
+    """
+    if path.endswith(LOG_SUFFIX):
+        records, names = read_log(path)
+        stamped = records.dtype == LATENCY_RECORD_DTYPE
+        return (names, np.array(records['route'], dtype=np.uint32), np.array(records['num_of_switch'], dtype=np.uint8),
+                np.array(records['time']), np.array(records['sequence']) if stamped else np.full(len(records), np.nan),
+                np.array(records['latency']) if stamped else np.full(len(records), np.nan))
+    result = read_result_columns(path)
+    distinct, local_codes = np.unique(result['IDs'].astype(str), return_inverse=True)
+    unstamped = np.full(len(local_codes), np.nan)
+
+    return (distinct.tolist(), local_codes.ravel().astype(np.uint32), result['Num_of_switch'].astype(np.uint8),
+            result['Time'], result.get('Sequence', unstamped), result.get('Latency', unstamped))
+
+
+def count_routes(coded: CodedResults) -> np.ndarray:
+    """
+    Count the occurrences of each route on each host
+    :param coded: coded results
+    :return: (number of hosts, number of routes) occurrences
+    """
+    num_of_routes = len(coded.routes)
+    cells = coded.host_code.astype(np.int64) * num_of_routes + coded.route_code
+
+    return np.bincount(cells, minlength=len(coded.hosts) * num_of_routes).reshape(len(coded.hosts), num_of_routes)
+
+
+def summarize_result_file(path: str) -> dict:
+    """
+    Summarize one csv result into route counts, row count and time range
+    :param path: path of the result file
+    :return: summary of the file
+    """
+    if path.endswith(LOG_SUFFIX):
+        return stream_result_file(path, 0)
+    result = parse_result_file(path)
+    routes, counts = np.unique(result['IDs'].astype(str), return_counts=True)
+    times = result['Time']
+
+    return {'rows': len(times),
+            'routes': dict(zip(routes.tolist(), counts.tolist())),
+            'time': [float(times.min()), float(times.max())] if len(times) else None}
+
+
+def stream_result_file(path: str, chunk_size: int) -> dict:
+    """
+    Summarize one csv result like summarize_result_file, reading at most chunk_size rows at a time.
+    The records of a binary result log are mapped and counted in place chunk by chunk.
+    :param path: path of the result file
+    :param chunk_size: number of rows of a chunk (<= 0 for the whole file, only for a binary result log)
+    :return: summary of the file
+    """
+    if path.endswith(LOG_SUFFIX):
+        records, names = read_log(path)
+        counts = np.zeros(len(names), dtype=np.int64)
+        low, high = float('inf'), float('-inf')
+        step = chunk_size if chunk_size > 0 else max(len(records), 1)
+        for begin in range(0, len(records), step):
+            chunk = records[begin:begin + step]
+            counts += np.bincount(chunk['route'], minlength=len(names))
+            low, high = min(low, float(chunk['time'].min())), max(high, float(chunk['time'].max()))
+        return {'rows': len(records), 'routes': {names[code]: int(counts[code]) for code in np.flatnonzero(counts)},
+                'time': [low, high] if len(records) else None}
+
+    routes = dict()
+    rows = 0
+    low, high = float('inf'), float('-inf')
+    for chunk in read_csv(path, usecols=['IDs', 'Time'], dtype=RESULT_DTYPES, float_precision=FLOAT_PRECISION,
+                          chunksize=chunk_size):
+        for route, occurrences in chunk['IDs'].fillna('').value_counts(sort=False).items():
+            routes[route] = routes.get(route, 0) + int(occurrences)
+        if len(chunk):
+            rows += len(chunk)
+            low, high = min(low, float(chunk['Time'].min())), max(high, float(chunk['Time'].max()))
+
+    return {'rows': rows, 'routes': routes, 'time': [low, high] if rows else None}
+
+
+def stream_summaries(dir_name: str, num_of_workers: int, chunk_size: int) -> Totals:
+    """
+    Stream every csv result in the given directory into running totals, one chunk of rows at a time
+    :param dir_name: name of the given directory
+    :param num_of_workers: number of processes parsing csv files
+    :param chunk_size: number of rows of a chunk
+    :return: totals of each host
+    """
+    files = list_result_files(dir_name)
+    totals = Totals(dict(), dict(), dict())
+    summaries = iterate_in_pool(partial(stream_result_file, chunk_size=chunk_size), [file.path for file in files],
+                                num_of_workers)
+    for file, summary in zip(files, summaries):
+        add_summary(totals, file.name, summary)
+
+    return totals
+
+
+def get_cache_path(dir_name: str) -> str:
+    """
+    Get the path of the aggregation cache, which is next to the given directory
+    :param dir_name: name of the given directory
+    :return: path of the cache file
+    """
+    return os.path.normpath(dir_name) + CACHE_SUFFIX
+
+
+def load_summaries(dir_name: str, num_of_workers: int, rebuild: bool) -> Dict[str, dict]:
+    """
+    Summarize every csv result in the given directory.
+    Summaries are cached on disk keyed by file name, size and modification time, so only new or changed files are
+    parsed again.
+    :param dir_name: name of the given directory
+    :param num_of_workers: number of processes parsing csv files
+    :param rebuild: whether to ignore the cache
+    :return: file name -> summary
+    """
+    cache_path = get_cache_path(dir_name)
+    cached = dict()
+    if not rebuild and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as in_file:
+                cache = json.load(in_file)
+            if cache.get('version') == CACHE_VERSION:
+                cached = cache['files']
+        except (OSError, ValueError, KeyError):
+            info_log(f'Ignore unreadable aggregation cache {cache_path}')
+
+    summaries = dict()
+    stale = []
+    for file in list_result_files(dir_name):
+        stat = file.stat()
+        summary = cached.get(file.name)
+        if summary is not None and summary['size'] == stat.st_size and summary['mtime_ns'] == stat.st_mtime_ns:
+            summaries[file.name] = summary
+        else:
+            stale.append((file, stat))
+
+    parsed = parse_in_pool(summarize_result_file, [file.path for file, _ in stale], num_of_workers)
+    for (file, stat), summary in zip(stale, parsed):
+        summary.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        summaries[file.name] = summary
+    info_log(f'Parsed {len(stale)} new or changed file(s), {len(summaries) - len(stale)} file(s) from cache')
+
+    if stale or len(summaries) != len(cached):
+        temp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as out_file:
+            json.dump({'version': CACHE_VERSION, 'files': summaries}, out_file)
+        os.replace(temp_path, cache_path)
+
+    return summaries
+
+
+def merge_summary_totals(summaries: Dict[str, dict]) -> Totals:
+    """
+    Merge file summaries into totals of each host
+    :param summaries: file name -> summary
+    :return: totals of each host
+    """
+    totals = Totals(dict(), dict(), dict())
+    for name, summary in summaries.items():
+        add_summary(totals, name, summary)
+
+    return totals
+
+
+def add_summary(totals: Totals, name: str, summary: dict) -> None:
+    """
+    Add the summary of one file to the totals of its host
+    :param totals: totals of each host
+    :param name: name of the file
+    :param summary: summary of the file
+    :return: None
+    """
+    host = get_host(name)
+    count = totals.route_count.setdefault(host, dict())
+    for route, occurrences in summary['routes'].items():
+        count[route] = count.get(route, 0) + occurrences
+    totals.pkt_in_each_test.setdefault(host, dict())[get_serial_number(name)] = summary['rows']
+    if summary['time'] is not None:
+        time_range = totals.time_range.setdefault(host, [float('inf'), float('-inf')])
+        time_range[0], time_range[1] = min(time_range[0], summary['time'][0]), max(time_range[1], summary['time'][1])
+
+
+def parse_latency_file(path: str) -> Optional[Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Parse the latency columns of one result written by receiver.py -l, rows without sequence stamp are skipped
+    :param path: path of the result file
+    :return: distinct routes, route codes into them, sequence number and one-way latency of each copy in arrival
+             order, or None if the file has no latency columns
+    """
+    result = DataFrame(read_result_columns(path))
+    if not set(LATENCY_COLUMNS).issubset(result.columns):
+        return None
+    result = result[result['Latency'].notna()].sort_values('Time', kind='stable')
+    distinct, local_codes = np.unique(result['IDs'].to_numpy().astype(str), return_inverse=True)
+
+    return (distinct.tolist(), local_codes.ravel().astype(np.uint32), result['Sequence'].to_numpy(dtype=np.int64),
+            result['Latency'].to_numpy(dtype=np.float64))
+
+
+def origin_of(sequence: np.ndarray, schedule: Optional[Schedule]) -> np.ndarray:
+    """
+    Find the origin of stamped packets by their sequence numbers, each origin of a schedule stamps its own range
+    :param sequence: sequence numbers
+    :param schedule: schedule of multi_flood.py, None for the single sender of sender.py
+    :return: index of the origin of each packet, -1 for the packets of no origin
+    """
+    if schedule is None:
+        return np.zeros(len(sequence), dtype=np.int64)
+    origins = sorted(range(len(schedule.origins)), key=lambda index: schedule.origins[index].first_sequence)
+    first = np.array([schedule.origins[index].first_sequence for index in origins], dtype=np.int64)
+    end = first + np.array([schedule.origins[index].count for index in origins], dtype=np.int64)
+    position = np.searchsorted(first, sequence, side='right') - 1
+    inside = (position >= 0) & (sequence < end[np.maximum(position, 0)])
+
+    return np.where(inside, np.array(origins, dtype=np.int64)[np.maximum(position, 0)], -1)
+
+
+def expected_packets(packets: np.ndarray, schedule: Optional[Schedule]) -> int:
+    """
+    Count the packets a test should deliver: the span of the sequence numbers received from each origin, so the
+    sequence numbers between the ranges of two origins are not lost
+    :param packets: sorted distinct sequence numbers received by any host in the test
+    :param schedule: schedule of multi_flood.py, None for the single sender of sender.py
+    :return: number of packets
+    """
+    origins = origin_of(packets, schedule)
+    total = 0
+    for origin in np.unique(origins):
+        span = packets[origins == origin]
+        total += int(span[-1] - span[0] + 1)
+
+    return total
+
+
+def latency_statistics(dir_name: str, num_of_workers: int, schedule: Optional[Schedule] = None) -> Optional[dict]:
+    """
+    Compute the one-way latency, loss and reordering of each host and the latency of each route.
+    Flooding delivers several copies of each packet, the first copy of each sequence number counts for loss and
+    reordering. The packets of a test are the sequence numbers received by any host in that test, between the lowest
+    and the highest of each origin.
+    :param dir_name: name of the given directory
+    :param num_of_workers: number of processes parsing csv files
+    :param schedule: schedule of multi_flood.py whose origins sent the packets, None for the single sender of sender.py
+    :return: 'hosts': host -> (packets, lost, reordered, latency of first copies), 'routes': route -> latency of
+             all copies, or None if no result has latency columns
+    """
+    files = list_result_files(dir_name)
+    parsed = parse_in_pool(parse_latency_file, [file.path for file in files], num_of_workers)
+    files, parsed = [file for file, columns in zip(files, parsed) if columns is not None], \
+        [columns for columns in parsed if columns is not None]
+    if not files:
+        return None
+
+    # Packets of each test
+    sent = dict()
+    for file, (_, _, sequence, _) in zip(files, parsed):
+        test = get_serial_number(file.name)
+        sent[test] = np.union1d(sent.get(test, np.empty(0, dtype=np.int64)), sequence)
+    expected = {test: expected_packets(packets, schedule) for test, packets in sent.items()}
+
+    hosts = dict()
+    route_latency = dict()
+    for file, (distinct, local_codes, sequence, latency) in zip(files, parsed):
+        received, first = np.unique(sequence, return_index=True)
+        first.sort()
+        arrival = sequence[first]
+        lost = expected[get_serial_number(file.name)] - len(received)
+        reordered = int(np.count_nonzero(arrival[1:] < np.maximum.accumulate(arrival)[:-1]))
+
+        total = hosts.setdefault(get_host(file.name), [0, 0, 0, []])
+        total[0] += len(received)
+        total[1] += lost
+        total[2] += reordered
+        total[3].append(latency[first])
+
+        order = np.argsort(local_codes, kind='stable')
+        bounds = np.searchsorted(local_codes[order], np.arange(len(distinct) + 1))
+        for code, route in enumerate(distinct):
+            route_latency.setdefault(route, []).append(latency[order[bounds[code]:bounds[code + 1]]])
+
+    return {'hosts': {host: (packets, lost, reordered, np.concatenate(latency))
+                      for host, (packets, lost, reordered, latency) in hosts.items()},
+            'routes': {route: np.concatenate(latency) for route, latency in route_latency.items()}}
+
+
+def format_percentiles(latency: np.ndarray) -> str:
+    """
+    Format the percentiles of latency samples
+    :param latency: latency samples in seconds
+    :return: formatted percentiles in milliseconds
+    """
+    if not len(latency):
+        return 'no packet'
+    p50, p90, p99 = np.percentile(latency * 1000, [50, 90, 99])
+
+    return f'p50 {p50:.3f} ms, p90 {p90:.3f} ms, p99 {p99:.3f} ms, max {latency.max() * 1000:.3f} ms'
+
+
+def report_latency(dir_names: List[str], num_of_workers: int, num_of_routes: int,
+                   schedule: Optional[Schedule] = None) -> None:
+    """
+    Report the one-way latency, loss and reordering of each host and the latency of the most frequent routes of
+    each directory, e.g. of v1 and v2 results side by side
+    :param dir_names: names of the given directories
+    :param num_of_workers: number of processes parsing csv files
+    :param num_of_routes: number of routes reported for each directory
+    :param schedule: schedule of multi_flood.py whose origins sent the packets, the schedule.json of each directory
+                     if None and present, otherwise the single sender of sender.py
+    :return: None
+    """
+    for dir_name in dir_names:
+        dir_schedule = schedule
+        if dir_schedule is None and os.path.exists(os.path.join(dir_name, SCHEDULE_NAME)):
+            dir_schedule = Schedule.load(os.path.join(dir_name, SCHEDULE_NAME))
+        statistics = latency_statistics(dir_name, num_of_workers, dir_schedule)
+        if statistics is None:
+            info_log(f'{dir_name}: no result with latency columns (see receiver.py -l)')
+            continue
+
+        hosts = sorted(statistics['hosts'], key=lambda host: (len(host), host))
+        first_copies = np.concatenate([statistics['hosts'][host][3] for host in hosts])
+        info_log(f'{dir_name}: {sum(statistics["hosts"][host][0] for host in hosts)} packets, '
+                 f'{sum(statistics["hosts"][host][1] for host in hosts)} lost, '
+                 f'{sum(statistics["hosts"][host][2] for host in hosts)} reordered, '
+                 f'first copy latency {format_percentiles(first_copies)}')
+        for host in hosts:
+            packets, lost, reordered, latency = statistics['hosts'][host]
+            info_log(f'  {host}: {packets} packets, {lost} lost, {reordered} reordered, '
+                     f'first copy latency {format_percentiles(latency)}')
+        routes = sorted(statistics['routes'].items(), key=lambda item: -len(item[1]))
+        for route, latency in routes[:num_of_routes]:
+            info_log(f'  Route {route}: {len(latency)} copies, latency {format_percentiles(latency)}')
+
+
 def get_sampled_keys(keys: List[str], num_of_keys: int) -> List[str]:
     """
     Get the requested number of keys
@@ -82,97 +632,118 @@ def get_sampled_keys(keys: List[str], num_of_keys: int) -> List[str]:
     return sampled_keys
 
 
-def draw_first_results(zero_serial_number_csv: Dict[str, DataFrame], num_of_rows_or_cols: int, keys: List[str]) -> None:
+def draw_first_results(zero_serial_number_csv: Dict[str, DataFrame], num_of_rows_or_cols: int, keys: List[str],
+                       bin_width: float) -> None:
     """
     Draw the results of first test with <= 9 hosts
     :param zero_serial_number_csv: first result of each host
     :param num_of_rows_or_cols: number of rows/columns for display
     :param keys: randomly sampled hosts to be displayed
+    :param bin_width: width of a time bin in seconds
     :return: None
     """
-    for idx, key in enumerate(keys):
+    for key in keys:
         fig = plt.figure()
-        grid = gs.GridSpec(1, 2)
-        result = zero_serial_number_csv[key]
-
-        # Occurrences vs. Route
-        ax = plt.Subplot(fig, grid[0])
-        count = result.groupby(['IDs'], as_index=False).count()
-        count.rename(columns={'Num_of_switch': 'Count'}, inplace=True)
-        rects = ax.bar(count['IDs'], count['Count'])
-        for rect in rects:
-            height = rect.get_height()
-            ax.annotate(f'{height}',
-                        xy=(rect.get_x() + rect.get_width() / 2, height),
-                        xytext=(0, 3),  # 3 points vertical offset
-                        textcoords='offset points',
-                        ha='center',
-                        va='bottom')
-
-        ax.set_yticks(range(0, ceil(max(count['Count'])) + 3))
-        ax.set_ylabel('Occurrences')
-        ax.set_xlabel('Route')
-        ax.set_title(f'{key}')
-        fig.add_subplot(ax)
-
-        # Occurrence of the route vs. Time
-        ax = plt.Subplot(fig, grid[1])
-        result.sort_values(by=['Time'], inplace=True)
-        minimum = min(result['Time'])
-        x_coord = np.arange(minimum, max(result['Time']), 0.001, dtype=float)
-        for i in result['IDs'].unique():
-            selected = result[result['IDs'] == i]
-            y_coord = np.zeros(x_coord.shape, dtype=int)
-            for t in selected['Time']:
-                y_coord[int((t - minimum) / 0.001)] = 1
-            ax.plot(x_coord, y_coord, label=f'{i}')
+        plot_first_result(fig, zero_serial_number_csv[key], key, bin_width)
+        set_window_title(fig, f'First test of {key}')
+
+
+def plot_first_result(fig: Figure, result: DataFrame, key: str, bin_width: float) -> None:
+    """
+    Plot the occurrences and the timeline of each route in the first test of a host
+    :param fig: figure to be drawn on
+    :param result: first result of the host
+    :param key: host
+    :param bin_width: width of a time bin in seconds
+    :return: None
+    """
+    grid = gs.GridSpec(1, 2)
+
+    # Occurrences vs. Route
+    ax = fig.add_subplot(grid[0])
+    count = result.groupby(['IDs'], as_index=False).count()
+    count.rename(columns={'Num_of_switch': 'Count'}, inplace=True)
+    rects = ax.bar(count['IDs'], count['Count'])
+    for rect in rects:
+        height = rect.get_height()
+        ax.annotate(f'{height}',
+                    xy=(rect.get_x() + rect.get_width() / 2, height),
+                    xytext=(0, 3),  # 3 points vertical offset
+                    textcoords='offset points',
+                    ha='center',
+                    va='bottom')
+
+    ax.set_yticks(range(0, ceil(max(count['Count'], default=0)) + 3))
+    ax.set_ylabel('Occurrences')
+    ax.set_xlabel('Route')
+    ax.set_title(f'{key}')
+
+    # Occurrence of the route vs. Time
+    ax = fig.add_subplot(grid[1])
+    timeline = route_timeline(result['IDs'].to_numpy(), result['Time'].to_numpy(), bin_width)
+    for code in dict.fromkeys(timeline.run_route[np.argsort(timeline.run_start, kind='stable')].tolist()):
+        x_coord, y_coord = step_coords(timeline, code)
+        ax.plot(x_coord, y_coord, label=f'{timeline.routes[code]}')
+    if len(timeline.routes):
         ax.legend()
-        ax.set_yticks([0, 1])
-        ax.set_yticklabels(['F', 'T'])
-        ax.set_ylabel('Appear or not')
-        ax.set_xlabel('Time (s)')
-        ax.set_title(f'{key}')
-        fig.add_subplot(ax)
+    ax.set_yticks([0, 1])
+    ax.set_yticklabels(['F', 'T'])
+    ax.set_ylabel('Appear or not')
+    ax.set_xlabel('Time (s)')
+    ax.set_title(f'{key}')
 
-        fig.tight_layout()
-        fig.canvas.set_window_title(f'First test of {key}')
+    fig.tight_layout()
 
 
-def draw_aggregation(aggregation_result: Dict[str, DataFrame], num_of_rows_or_cols: int, keys: List[str],
-                     num_of_pkt: int, num_of_rounds: int) -> None:
+def draw_aggregation(route_count: Dict[str, Dict[str, int]], pkt_in_each_test: Dict[str, Dict[str, int]],
+                     num_of_rows_or_cols: int, keys: List[str], num_of_pkt: int, num_of_rounds: int) -> None:
     """
     Draw the aggregation results
-    :param aggregation_result: aggregation result of each host
+    :param route_count: occurrences of each route on each host
+    :param pkt_in_each_test: number of received packets on each host in each test
     :param num_of_rows_or_cols: number of rows/columns for display
     :param keys: randomly sampled hosts to be displayed
     :param num_of_pkt: number of packets in each round
     :param num_of_rounds: number of rounds in each test
     :return: None
     """
-    for idx, key in enumerate(keys):
-        result = aggregation_result[key]
-        del result['Time']
-
-        # Plot the aggregation
-        num_of_tests = float(len(result.index)) / num_of_pkt / num_of_rounds
-        count = result.groupby(['IDs'], as_index=False).count()
-        count.rename(columns={'Num_of_switch': 'Count'}, inplace=True)
-        count['Count'] = count['Count'] / num_of_tests
-        fig, ax = plt.subplots()
-        rects = ax.bar(count['IDs'], count['Count'])
-        for rect in rects:
-            height = rect.get_height()
-            ax.annotate(f'{height:.2f}',
-                        xy=(rect.get_x() + rect.get_width() / 2, height),
-                        xytext=(0, 3),  # 3 points vertical offset
-                        textcoords="offset points",
-                        ha='center', va='bottom')
-        ax.set_yticks(range(0, ceil(max(count['Count'])) + 3))
-        ax.set_ylabel('Occurrences')
-        ax.set_xlabel('Route')
-        ax.set_title(f'{key}')
-        fig.tight_layout()
-        fig.canvas.set_window_title(f'Aggregation result of {key}')
+    for key in keys:
+        fig = plt.figure()
+        plot_aggregation(fig, route_count[key], pkt_in_each_test[key], key, num_of_pkt, num_of_rounds)
+        set_window_title(fig, f'Aggregation result of {key}')
+
+
+def plot_aggregation(fig: Figure, route_count: Dict[str, int], pkt_in_each_test: Dict[str, int], key: str,
+                     num_of_pkt: int, num_of_rounds: int) -> None:
+    """
+    Plot the average occurrences of each route of a host per test
+    :param fig: figure to be drawn on
+    :param route_count: occurrences of each route on the host
+    :param pkt_in_each_test: number of received packets on the host in each test
+    :param key: host
+    :param num_of_pkt: number of packets in each round
+    :param num_of_rounds: number of rounds in each test
+    :return: None
+    """
+    routes = sorted(route_count)
+
+    # Plot the aggregation
+    num_of_tests = float(sum(pkt_in_each_test.values())) / num_of_pkt / num_of_rounds
+    count = [route_count[route] / num_of_tests for route in routes]
+    ax = fig.add_subplot()
+    rects = ax.bar(routes, count)
+    for rect in rects:
+        height = rect.get_height()
+        ax.annotate(f'{height:.2f}',
+                    xy=(rect.get_x() + rect.get_width() / 2, height),
+                    xytext=(0, 3),  # 3 points vertical offset
+                    textcoords="offset points",
+                    ha='center', va='bottom')
+    ax.set_yticks(range(0, ceil(max(count, default=0)) + 3))
+    ax.set_ylabel('Occurrences')
+    ax.set_xlabel('Route')
+    ax.set_title(f'{key}')
+    fig.tight_layout()
 
 
 def draw_pkt_in_each_round(pkt_in_each_round: Dict[str, Dict[str, int]], num_of_rows_or_cols: int, keys: List[str]) -> None:
@@ -184,7 +755,22 @@ def draw_pkt_in_each_round(pkt_in_each_round: Dict[str, Dict[str, int]], num_of_
     :return: None
     """
     fig = plt.figure()
-    grid = gs.GridSpec(num_of_rows_or_cols, num_of_rows_or_cols)
+    plot_pkt_in_each_round(fig, pkt_in_each_round, num_of_rows_or_cols, num_of_rows_or_cols, keys)
+    set_window_title(fig, 'Received packets in each test')
+
+
+def plot_pkt_in_each_round(fig: Figure, pkt_in_each_round: Dict[str, Dict[str, int]], num_of_rows: int,
+                           num_of_cols: int, keys: List[str]) -> None:
+    """
+    Plot the number of received packets of each host in each test, one subplot per host
+    :param fig: figure to be drawn on
+    :param pkt_in_each_round: number of received packets on each host in each round
+    :param num_of_rows: number of rows of subplots
+    :param num_of_cols: number of columns of subplots
+    :param keys: hosts to be plotted, at most num_of_rows * num_of_cols
+    :return: None
+    """
+    grid = gs.GridSpec(num_of_rows, num_of_cols)
     for idx, host in enumerate(keys):
         results = pkt_in_each_round[host]
         test_no = list(results.keys())
@@ -193,7 +779,7 @@ def draw_pkt_in_each_round(pkt_in_each_round: Dict[str, Dict[str, int]], num_of_
 
         values = [results[number] for number in test_no]
 
-        ax = plt.Subplot(fig, grid[idx])
+        ax = fig.add_subplot(grid[idx])
         rects = ax.bar(test_no, values)
         for rect in rects:
             height = rect.get_height()
@@ -202,13 +788,22 @@ def draw_pkt_in_each_round(pkt_in_each_round: Dict[str, Dict[str, int]], num_of_
                         xytext=(0, 3),  # 3 points vertical offset
                         textcoords="offset points",
                         ha='center', va='bottom')
-        ax.set_yticks(range(0, ceil(max(values)) + 3))
+        ax.set_yticks(range(0, ceil(max(values, default=0)) + 3))
         ax.set_ylabel('Packets')
         ax.set_xlabel('Test')
         ax.set_title(f'{host}')
-        fig.add_subplot(ax)
     fig.tight_layout()
-    fig.canvas.set_window_title('Received packets in each test')
+
+
+def set_window_title(fig: Figure, title: str) -> None:
+    """
+    Set the title of the window of a figure, figures of non-interactive backends have no window
+    :param fig: figure
+    :param title: title of the window
+    :return: None
+    """
+    if fig.canvas.manager is not None:
+        fig.canvas.manager.set_window_title(title)
 
 
 def info_log(log: str) -> None:
@@ -221,6 +816,16 @@ def info_log(log: str) -> None:
     sys.stdout.flush()
 
 
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
 def parse_arguments() -> Namespace:
     """
     Parse arguments from command line
@@ -230,6 +835,25 @@ def parse_arguments() -> Namespace:
     parser.add_argument('-d', '--directory', help='Name of the directory', type=str, default='results')
     parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
     parser.add_argument('-r', '--round', help='Number of rounds in each test', type=int, default=2)
+    parser.add_argument('-w', '--workers', help='Number of processes parsing csv files', type=int,
+                        default=os.cpu_count())
+    parser.add_argument('-bw', '--bin-width', help='Width of a time bin of the route timelines in milliseconds',
+                        type=float, default=1)
+    parser.add_argument('-rb', '--rebuild', help='Ignore the aggregation cache and parse every file again',
+                        action='store_true')
+    parser.add_argument('-cs', '--chunk-size', help='Stream the csv results in chunks of this many rows without cache '
+                                                    '(0 to load whole files)', type=int, default=0)
+    parser.add_argument('-ld', '--latency-directories', help='Report the one-way latency, loss and reordering of '
+                                                             'these directories instead of drawing', type=str,
+                        nargs='+', default=None)
+    parser.add_argument('-lr', '--latency-routes', help='Number of routes of each directory in the latency report',
+                        type=int, default=10)
+    parser.add_argument('-sc', '--schedule', help='Schedule of multi_flood.py, to count the loss of each origin in '
+                                                  'the latency report (default: schedule.json of each directory)',
+                        type=str, default=None)
+    parser.add_argument('-q', '--query', help='Aggregate the experiments of the store given by -d matching terms such '
+                                              'as version=v2 number>=25', type=str, nargs='+', default=None)
+    metrics.add_arguments(parser)
 
     return parser.parse_args()
 
@@ -238,13 +862,34 @@ if __name__ == '__main__':
     """
     Main function
         command: python3 aggregator.py [-d name_of_the_directory] [-c num_of_packets] [-r num_of_rounds]
+                    [-w num_of_workers] [-bw bin_width] [-rb] [-cs chunk_size] [-ld latency_directories]
+                    [-lr latency_routes] [-sc schedule] [-q term ...] [-mt metrics] [-mi metrics_interval] [-pf profile]
     """
     # Parse arguments
     args = parse_arguments()
     name = args.directory
+    if args.query:
+        from experiments import select_experiments
+        try:
+            name = select_experiments(args.directory, args.query)
+        except ValueError as e:
+            error_log(str(e))
+            sys.exit(1)
     c = args.count
     r = args.round
+    w = args.workers
+    rb = args.rebuild
+    bw = args.bin_width / 1000
+    metrics.setup('aggregator', args)
+
+    # Report latency
+    if args.latency_directories:
+        with metrics.profiled(args.profile):
+            report_latency(args.latency_directories, w, args.latency_routes,
+                           None if args.schedule is None else Schedule.load(args.schedule))
+        sys.exit(0)
 
     # Aggregate
     info_log('Start aggregator')
-    aggregate(name, c, r)
+    with metrics.profiled(args.profile):
+        aggregate(name, c, r, w, rb, bw, args.chunk_size)
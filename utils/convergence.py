@@ -0,0 +1,321 @@
+import sys
+import os
+import re
+import csv
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+from aggregator import CodedResults, load_coded_results
+from predictor import format_table
+
+# Columns of the statistics of each (host, test)
+STATS_COLUMNS = ['Directory', 'Host', 'Test', 'Copies', 'Originals', 'Lost', 'Duplicates', 'Routes', 'First_arrival',
+                 'Stable_time', 'Stable_round']
+
+
+class FloodStats(NamedTuple):
+    """
+    Flooding efficiency and convergence of every (host, test) of a directory, one entry per host and test, including
+    the hosts that received nothing in a test. The first arrival is NaN without stamps nor shared clock and the route
+    statistics are NaN without any copy.
+    """
+    host: np.ndarray
+    test_no: np.ndarray
+    copies: np.ndarray
+    originals: np.ndarray
+    lost: np.ndarray
+    routes: np.ndarray
+    first_arrival: np.ndarray
+    stable_time: np.ndarray
+    stable_round: np.ndarray
+    expected: int
+
+
+# Metrics compared between the versions: name, value of each (host, test) of the statistics
+METRICS = [('First arrival (ms)', lambda stats: stats.first_arrival * 1e3),
+           ('Duplicates per original', lambda stats: duplicates(stats)),
+           ('Distinct routes', lambda stats: stats.routes),
+           ('Stable after (ms)', lambda stats: stats.stable_time * 1e3),
+           ('Stable in round 1', lambda stats: np.where(stats.copies > 0, stats.stable_round == 0, np.nan)),
+           ('Loss', lambda stats: stats.lost / stats.expected)]
+
+
+def flood_stats(coded: CodedResults, count: int, rounds: int, gap: float, shared_clock: bool) -> FloodStats:
+    """
+    Compute the statistics of every (host, test) of a directory at once.
+    Copies stamped by receiver.py -l are counted per sequence number and their latency is the first arrival.
+    Without stamps, the rounds are split at the longest silences of at least gap seconds, a round holding at most
+    count originals, so that duplicates and loss are lower bounds.
+    :param coded: coded results of the directory
+    :param count: number of packets sent in each round
+    :param rounds: number of rounds, 2 with the --check resend of sender.py
+    :param gap: minimum seconds of silence between two rounds
+    :param shared_clock: whether all hosts share the clock of the Time column, as with simulator.py or
+                         pcap_ingest.py, to take the first arrival after the first host of the test without stamps
+    :return: statistics
+    """
+    tests, test_index = np.unique(coded.test_no, return_inverse=True)
+    num_of_hosts = len(coded.hosts)
+    num_of_units = len(tests) * num_of_hosts
+    unit = test_index.ravel().astype(np.int64) * num_of_hosts + coded.host_code
+    order = np.lexsort((coded.time, unit))
+    unit, time, route = unit[order], coded.time[order], coded.route_code[order].astype(np.int64)
+    sequence, latency = coded.sequence[order], coded.latency[order]
+    num_of_rows = len(unit)
+
+    new_unit = np.r_[True, unit[1:] != unit[:-1]] if num_of_rows else np.zeros(0, dtype=bool)
+    start = np.flatnonzero(new_unit)
+    received = unit[start]
+    row_start = np.maximum.accumulate(np.where(new_unit, np.arange(num_of_rows), 0))
+
+    # Round of each copy, from the sequence number if stamped
+    stamped = np.isfinite(sequence)
+    silence = np.where(new_unit, 0, np.r_[0, np.diff(time)])
+    by_silence = np.lexsort((-silence, unit))
+    rank = np.empty(num_of_rows, dtype=np.int64)
+    rank[by_silence] = np.arange(num_of_rows) - row_start[by_silence]
+    silences = np.cumsum((silence >= gap) & (rank < rounds - 1) & ~new_unit)
+    round_no = np.where(stamped, np.floor_divide(np.where(stamped, sequence, 0), count),
+                        silences - silences[row_start])
+    round_no = np.clip(round_no, 0, rounds - 1).astype(np.int64)
+
+    # Originals of each (host, test, round): distinct stamped sequence numbers, unstamped copies up to count
+    cell = unit * rounds + round_no
+    num_of_cells = num_of_units * rounds
+    copies_of_cell = np.bincount(cell, minlength=num_of_cells)
+    stamped_rows = np.flatnonzero(stamped)
+    by_sequence = stamped_rows[np.lexsort((sequence[stamped_rows], cell[stamped_rows]))]
+    distinct = np.r_[True, (cell[by_sequence][1:] != cell[by_sequence][:-1]) |
+                     (sequence[by_sequence][1:] != sequence[by_sequence][:-1])] if len(by_sequence) else \
+        np.zeros(0, dtype=bool)
+    distinct_of_cell = np.bincount(cell[by_sequence[distinct]], minlength=num_of_cells)
+    unstamped_of_cell = copies_of_cell - np.bincount(cell[stamped_rows], minlength=num_of_cells)
+    originals_of_cell = distinct_of_cell + np.minimum(unstamped_of_cell, np.maximum(count - distinct_of_cell, 0))
+    lost_of_cell = np.maximum(count - originals_of_cell, 0)
+
+    # Distinct routes and the last route change of each (host, test)
+    routes = np.full(num_of_units, np.nan)
+    routes[received] = 0
+    pairs = np.unique(unit * max(len(coded.routes), 1) + route)
+    np.add.at(routes, pairs // max(len(coded.routes), 1), 1)
+    change = new_unit | np.r_[False, route[1:] != route[:-1]]
+    last_change = np.maximum.reduceat(np.where(change, np.arange(num_of_rows), 0), start) if num_of_rows else start
+    stable_time, stable_round = np.full(num_of_units, np.nan), np.full(num_of_units, np.nan)
+    stable_time[received] = time[last_change] - time[start]
+    stable_round[received] = round_no[last_change]
+
+    # First arrival from the stamps, else after the first host of the test on a shared clock
+    first_arrival = np.full(num_of_units, np.nan)
+    first_arrival[received] = latency[start]
+    if shared_clock:
+        earliest = np.full(len(tests), np.inf)
+        np.minimum.at(earliest, received // num_of_hosts, time[start])
+        relative = time[start] - earliest[received // num_of_hosts]
+        first_arrival[received] = np.where(np.isfinite(latency[start]), latency[start], relative)
+
+    return FloodStats(host=np.tile(np.arange(num_of_hosts), len(tests)),
+                      test_no=np.repeat(tests, num_of_hosts),
+                      copies=copies_of_cell.reshape(-1, rounds).sum(axis=1),
+                      originals=originals_of_cell.reshape(-1, rounds).sum(axis=1),
+                      lost=lost_of_cell.reshape(-1, rounds).sum(axis=1),
+                      routes=routes, first_arrival=first_arrival, stable_time=stable_time, stable_round=stable_round,
+                      expected=count * rounds)
+
+
+def duplicates(stats: FloodStats) -> np.ndarray:
+    """
+    Get the duplicate copies per original packet of every (host, test)
+    :param stats: statistics
+    :return: duplicates per original, NaN without any copy
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(stats.originals > 0, (stats.copies - stats.originals) / stats.originals, np.nan)
+
+
+def get_group(dir_name: str) -> str:
+    """
+    Get the version compared by a results directory from its name, e.g. v1 for v1_10_results
+    :param dir_name: name of the results directory
+    :return: version, or the name of the directory if it does not start with one
+    """
+    name = os.path.basename(dir_name.rstrip('/'))
+    matched = re.match(r'(v\d+)_', name)
+
+    return matched.group(1) if matched else name
+
+
+def cluster_sums(values: np.ndarray, cluster: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sum the defined values of each cluster, the (host, test) of a test are resampled together
+    :param values: value of each (host, test)
+    :param cluster: cluster of each (host, test)
+    :return: sum and number of defined values of each cluster with any
+    """
+    valid = np.isfinite(values)
+    _, inverse = np.unique(cluster[valid], return_inverse=True)
+    inverse = inverse.ravel()
+
+    return np.bincount(inverse, weights=values[valid]), np.bincount(inverse)
+
+
+def bootstrap(sums: np.ndarray, counts: np.ndarray, num_of_samples: int, rand: np.random.Generator) -> np.ndarray:
+    """
+    Resample the clusters with replacement, all samples at once
+    :param sums: sum of the values of each cluster
+    :param counts: number of values of each cluster
+    :param num_of_samples: number of bootstrap samples
+    :param rand: random generator
+    :return: mean of each sample
+    """
+    if not len(counts):
+        return np.full(num_of_samples, np.nan)
+    draws = rand.integers(0, len(counts), (num_of_samples, len(counts)))
+
+    return sums[draws].sum(axis=1) / counts[draws].sum(axis=1)
+
+
+def compare(all_stats: Dict[str, FloodStats], num_of_samples: int, confidence: float,
+            seed: int) -> Tuple[List[str], List[List[str]]]:
+    """
+    Compare the mean of every metric between the versions with percentile bootstrap intervals over the tests
+    :param all_stats: directory -> statistics
+    :param num_of_samples: number of bootstrap samples
+    :param confidence: confidence level of the intervals
+    :param seed: random seed of the resampling
+    :return: header and rows of the comparison, the differences are against the first version
+    """
+    rand = np.random.default_rng(seed)
+    groups = sorted({get_group(dir_name) for dir_name in all_stats})
+    tails = [50 * (1 - confidence), 50 * (1 + confidence)]
+    header = ['Metric'] + groups + [f'{group} - {groups[0]}' for group in groups[1:]]
+    rows = []
+    for name, metric in METRICS:
+        means, samples = [], []
+        for group in groups:
+            selected = [(idx, stats) for idx, (dir_name, stats) in enumerate(all_stats.items())
+                        if get_group(dir_name) == group]
+            values = np.concatenate([metric(stats) for _, stats in selected])
+            cluster = np.concatenate([stats.test_no.astype(np.int64) * len(all_stats) + idx for idx, stats in selected])
+            sums, counts = cluster_sums(values.astype(np.float64), cluster)
+            means.append(sums.sum() / counts.sum() if counts.sum() else np.nan)
+            samples.append(bootstrap(sums, counts, num_of_samples, rand))
+        cells = [format_interval(mean, np.percentile(sample, tails)) for mean, sample in zip(means, samples)]
+        cells += [format_interval(mean - means[0], np.percentile(sample - samples[0], tails))
+                  for mean, sample in zip(means[1:], samples[1:])]
+        rows.append([name] + cells)
+
+    return header, rows
+
+
+def format_interval(mean: float, interval: np.ndarray) -> str:
+    """
+    Format a mean and its confidence interval
+    :param mean: mean
+    :param interval: lower and upper bounds
+    :return: formatted cell, n/a if undefined
+    """
+    if not np.isfinite(mean):
+        return 'n/a'
+
+    return f'{mean:.3f} [{interval[0]:.3f}, {interval[1]:.3f}]'
+
+
+def summarize(stats: FloodStats) -> List[str]:
+    """
+    Summarize the statistics of a directory into the cells of a table row
+    :param stats: statistics
+    :return: cells of the tests, files and the mean of every metric
+    """
+    cells = [str(len(np.unique(stats.test_no))), str(int((stats.copies > 0).sum()))]
+    for _, metric in METRICS:
+        values = metric(stats).astype(np.float64)
+        values = values[np.isfinite(values)]
+        cells.append(f'{values.mean():.3f}' if len(values) else 'n/a')
+
+    return cells
+
+
+def write_stats(filename: str, all_stats: Dict[str, Tuple[CodedResults, FloodStats]]) -> None:
+    """
+    Write the statistics of every (host, test) into a csv file
+    :param filename: name of the csv file
+    :param all_stats: directory -> coded results and statistics
+    :return: None
+    """
+    with open(filename, 'w', newline='') as out_file:
+        writer = csv.writer(out_file)
+        writer.writerow(STATS_COLUMNS)
+        for dir_name, (coded, stats) in all_stats.items():
+            writer.writerows(zip([dir_name] * len(stats.host), [coded.hosts[code] for code in stats.host],
+                                 stats.test_no.tolist(), stats.copies.tolist(), stats.originals.tolist(),
+                                 stats.lost.tolist(), duplicates(stats).tolist(), stats.routes.tolist(),
+                                 stats.first_arrival.tolist(), stats.stable_time.tolist(),
+                                 stats.stable_round.tolist()))
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-d', '--directories', help='Names of the result directories, vN_ prefixes name the versions',
+                        type=str, nargs='+', default=['results'])
+    parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
+    parser.add_argument('-r', '--rounds', help='Number of rounds (2 with the --check resend of sender.py)', type=int,
+                        default=2)
+    parser.add_argument('-g', '--gap', help='Minimum seconds of silence between two rounds', type=float,
+                        default=0.25)
+    parser.add_argument('-sc', '--shared-clock', help='Whether all hosts share the clock of the results (simulator.py, '
+                                                      'pcap_ingest.py)', action='store_true')
+    parser.add_argument('-b', '--bootstrap', help='Number of bootstrap samples', type=int, default=2000)
+    parser.add_argument('-ci', '--confidence', help='Confidence level of the intervals', type=float, default=0.95)
+    parser.add_argument('-s', '--seed', help='Random seed of the bootstrap', type=int, default=0)
+    parser.add_argument('-w', '--workers', help='Number of processes parsing csv files', type=int, default=1)
+    parser.add_argument('-o', '--output', help='csv file of the statistics of every host and test (default: do not '
+                                               'write)', type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 utils/convergence.py [-d directories] [-c count] [-r rounds] [-g gap] [-sc] [-b bootstrap]
+                 [-ci confidence] [-s seed] [-w num_of_workers] [-o output]
+    """
+    args = parse_arguments()
+    start_time = perf_counter()
+    results = dict()
+    for directory in args.directories:
+        directory = directory.rstrip('/')
+        coded_results = load_coded_results(directory, args.workers)
+        results[directory] = (coded_results, flood_stats(coded_results, args.count, args.rounds, args.gap,
+                                                         args.shared_clock))
+    comparison = compare({directory: stats for directory, (_, stats) in results.items()}, args.bootstrap,
+                         args.confidence, args.seed)
+    info_log(f'{sum(len(coded.time) for coded, _ in results.values())} packets of {len(results)} directories in '
+             f'{perf_counter() - start_time:.3f} s')
+
+    for line in format_table(['Directory', 'Version', 'Tests', 'Files'] + [name for name, _ in METRICS],
+                             [[directory, get_group(directory)] + summarize(stats)
+                              for directory, (_, stats) in results.items()]):
+        info_log(line)
+    info_log(f'Means with {args.confidence:.0%} bootstrap intervals over {args.bootstrap} resamples of the tests')
+    for line in format_table(*comparison):
+        info_log(line)
+    if args.output:
+        write_stats(args.output, results)
+        info_log(f'Wrote the statistics of every host and test into {args.output}')
@@ -0,0 +1,76 @@
+import sys
+import os
+from argparse import ArgumentParser, Namespace
+from functools import partial
+from aggregator import list_result_files, parse_in_pool, read_result_columns
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from result_log import LOG_SUFFIX, routes_path, write_log  # noqa: E402
+
+
+def convert(dir_name: str, output: str, num_of_workers: int) -> None:
+    """
+    Convert the csv results in the given directory into binary result logs
+    :param dir_name: name of the given directory
+    :param output: name of the directory of the result logs
+    :param num_of_workers: number of processes converting csv files
+    :return: None
+    """
+    files = [file for file in list_result_files(dir_name) if file.name.endswith('.csv')]
+    os.makedirs(output, exist_ok=True)
+    sizes = parse_in_pool(partial(convert_file, output=output), [file.path for file in files], num_of_workers)
+
+    info_log(f'Converted {len(files)} file(s) into {output}: {sum(size[0] for size in sizes)} rows, '
+             f'{sum(size[1] for size in sizes) / 2 ** 20:.2f} MiB of csv into '
+             f'{sum(size[2] for size in sizes) / 2 ** 20:.2f} MiB')
+
+
+def convert_file(path: str, output: str) -> tuple:
+    """
+    Convert one csv result into a binary result log of the same name
+    :param path: path of the csv file
+    :param output: name of the directory of the result log
+    :return: number of rows, size of the csv file and size of the result log with its route table in bytes
+    """
+    # Parsed as aggregator.py parses the csv results, so that both hold the same values
+    columns = read_result_columns(path)
+    log_path = os.path.join(output, os.path.basename(path)[:-len('.csv')] + LOG_SUFFIX)
+    write_log(log_path, columns)
+    log_size = os.path.getsize(log_path) + os.path.getsize(routes_path(log_path))
+
+    return len(columns['Time']), os.path.getsize(path), log_size
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-d', '--directory', help='Name of the directory of the csv results', type=str,
+                        default='results')
+    parser.add_argument('-o', '--output', help='Name of the directory of the result logs (default: <directory>_bin)',
+                        type=str, default=None)
+    parser.add_argument('-w', '--workers', help='Number of processes converting csv files', type=int,
+                        default=os.cpu_count() or 1)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 convert_results.py [-d name_of_the_directory] [-o output] [-w num_of_workers]
+    """
+    args = parse_arguments()
+    convert(args.directory.rstrip('/'), args.output or args.directory.rstrip('/') + '_bin', args.workers)
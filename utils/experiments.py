@@ -0,0 +1,505 @@
+import sys
+import os
+import json
+import shutil
+import hashlib
+import operator
+import re
+import threading
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from functools import lru_cache
+from itertools import product
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from aggregator import get_host, get_serial_number, list_result_files
+from orchestrator import format_durations, make_backend, run_test
+from predictor import format_table
+from randomizer import TOPOLOGIES, randomize
+from simulator import CONFIG_NAME
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from result_log import ROUTES_SUFFIX, routes_path  # noqa: E402
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# P4 program of each version of the architecture
+PROGRAMS = ['project.p4', 'project_v2.p4']
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Directories of the store which are not experiments
+SELECTION_DIR = 'selections'
+SLOT_DIR = '.slots'
+
+# Longest operators first, so that >= is not parsed as >
+OPERATORS = [('>=', operator.ge), ('<=', operator.le), ('!=', operator.ne), ('=', operator.eq), ('>', operator.gt),
+             ('<', operator.lt)]
+TERM_PATTERN = re.compile(r'^(\w+)(' + '|'.join(re.escape(op) for op, _ in OPERATORS) + r')(.+)$')
+
+# Fields of the manifests which queries can compare, besides the fields of the key
+MANIFEST_FIELDS = ['id', 'seed', 'topology', 'tests', 'backend']
+
+
+class Experiment(NamedTuple):
+    """
+    Configuration of a sweep, identified by the hash of its key.
+    The key holds everything the results depend on, the seed only tells randomizer.py how to write the config again.
+    """
+    id: str
+    key: dict
+    seed: Optional[int]
+    topology: str
+
+
+@lru_cache(maxsize=None)
+def program_digest(version: int) -> str:
+    """
+    Hash the P4 program of a version, so that changing the program gives new experiments
+    :param version: version of the P4 architecture
+    :return: sha256 of the program
+    """
+    with open(os.path.join(REPO_DIR, PROGRAMS[version]), 'rb') as in_file:
+        return hashlib.sha256(in_file.read()).hexdigest()
+
+
+def make_key(config: str, version: int, random_mode: int, count: int, check: int, source: str) -> dict:
+    """
+    Build the key of an experiment from the p4app.json written by randomizer.py
+    :param config: name of the p4app.json
+    :param version: version of the P4 architecture
+    :param random_mode: mode of link delay
+    :param count: number of packets sent in each round
+    :param check: whether packets are sent again to test convergence
+    :param source: host sending the packets
+    :return: key
+    """
+    with open(config) as in_file:
+        data = json.load(in_file)
+    links = sorted([min(link[0], link[1]), max(link[0], link[1]), link[2].get('delay') if len(link) > 2 else None]
+                   for link in data['topology']['links'])
+
+    return {'program': data['program'],
+            'program_sha256': program_digest(version),
+            'version': version,
+            'random': random_mode,
+            'number': len(data['topology']['switches']),
+            'links': links,
+            'count': count,
+            'check': check,
+            'source': source}
+
+
+def experiment_id(key: dict) -> str:
+    """
+    Hash the canonical form of a key
+    :param key: key of the experiment
+    :return: ID of the experiment
+    """
+    return hashlib.sha256(json.dumps(key, sort_keys=True, separators=(',', ':')).encode()).hexdigest()[:16]
+
+
+def write_config(experiment: Experiment, out_dir: str) -> str:
+    """
+    Write the p4app.json and the runtime commands of an experiment again, and check they still give the same key
+    :param experiment: experiment
+    :param out_dir: output directory
+    :return: name of the p4app.json
+    """
+    key = experiment.key
+    randomize(key['version'], key['random'], key['number'], experiment.topology, experiment.seed, out_dir=out_dir)
+    config = os.path.join(out_dir, 'p4app.json')
+    if experiment_id(make_key(config, key['version'], key['random'], key['count'], key['check'],
+                              key['source'])) != experiment.id:
+        raise ValueError(f'randomizer.py no longer writes the config of experiment {experiment.id} with seed '
+                         f'{experiment.seed}')
+
+    return config
+
+
+def plan(versions: List[int], random_modes: List[int], numbers: List[int], topology: str, seeds: List[int],
+         count: int, check: int, source: str, work_dir: str) -> List[Experiment]:
+    """
+    Randomize the config of every point of a sweep and keep one experiment per distinct key: seeds which give the same
+    delays, as in the equal delay mode, are the same experiment
+    :param versions: versions of the P4 architecture
+    :param random_modes: modes of link delay
+    :param numbers: numbers of switches
+    :param topology: shape of the links between switches
+    :param seeds: random seeds of randomizer.py
+    :param count: number of packets sent in each round
+    :param check: whether packets are sent again to test convergence
+    :param source: host sending the packets
+    :param work_dir: scratch directory of the configs
+    :return: experiments in the order of the sweep
+    """
+    experiments = dict()  # type: Dict[str, Experiment]
+    for version, random_mode, number, seed in product(versions, random_modes, numbers, seeds):
+        try:
+            with open(os.devnull, 'w') as null, redirect_stdout(null):
+                randomize(version, random_mode, number, topology, seed, out_dir=work_dir)
+        except ValueError as e:
+            error_log(f'v{version + 1} mode {random_mode} with {number} switches: {e}')
+            continue
+        key = make_key(os.path.join(work_dir, 'p4app.json'), version, random_mode, count, check, source)
+        exp_id = experiment_id(key)
+        if exp_id not in experiments:
+            experiments[exp_id] = Experiment(id=exp_id, key=key, seed=seed, topology=topology)
+
+    return list(experiments.values())
+
+
+def read_manifest(dir_name: str) -> Optional[dict]:
+    """
+    Read the manifest of an experiment directory
+    :param dir_name: name of the experiment directory
+    :return: manifest, None if the directory has none
+    """
+    try:
+        with open(os.path.join(dir_name, MANIFEST_NAME)) as in_file:
+            return json.load(in_file)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(dir_name: str, manifest: dict) -> None:
+    """
+    Replace the manifest of an experiment directory at once, so that an interrupted sweep never leaves half of it
+    :param dir_name: name of the experiment directory
+    :param manifest: manifest
+    :return: None
+    """
+    temp_name = os.path.join(dir_name, MANIFEST_NAME + '.tmp')
+    with open(temp_name, 'w') as out_file:
+        json.dump(manifest, out_file, indent=2)
+    os.replace(temp_name, os.path.join(dir_name, MANIFEST_NAME))
+
+
+def remove_test(dir_name: str, test_no: int) -> None:
+    """
+    Remove what a failed attempt of a test left in an experiment directory
+    :param dir_name: name of the experiment directory
+    :param test_no: serial number of the test
+    :return: None
+    """
+    for file in list_result_files(dir_name):
+        if int(get_serial_number(file.name)) == test_no:
+            os.remove(file.path)
+            if os.path.exists(routes_path(file.path)):
+                os.remove(routes_path(file.path))
+    if os.path.exists(os.path.join(dir_name, CONFIG_NAME.format(test_no))):
+        os.remove(os.path.join(dir_name, CONFIG_NAME.format(test_no)))
+
+
+def run_experiment(experiment: Experiment, store: str, tests: int, args: Namespace, work_dir: str) -> int:
+    """
+    Run the tests an experiment still misses, the manifest is updated after each of them
+    :param experiment: experiment
+    :param store: directory of the store
+    :param tests: number of tests the experiment should have
+    :param args: arguments of the sweep, as the orchestrator takes them
+    :param work_dir: directory of the p4app.json of the worker slot
+    :return: number of tests run
+    """
+    exp_dir = os.path.join(store, experiment.id)
+    os.makedirs(exp_dir, exist_ok=True)
+    manifest = read_manifest(exp_dir) or {'manifest_version': MANIFEST_VERSION,
+                                          'id': experiment.id,
+                                          'key': experiment.key,
+                                          'seed': experiment.seed,
+                                          'topology': experiment.topology,
+                                          'backend': args.backend,
+                                          'created': datetime.now().isoformat(timespec='seconds'),
+                                          'tests': 0,
+                                          'durations': [],
+                                          'files': []}
+    test_args = Namespace(**{**vars(args), 'directory': exp_dir, 'version': experiment.key['version'],
+                             'random': experiment.key['random'], 'number': experiment.key['number'],
+                             'topology': experiment.topology, 'seed': experiment.seed})
+    backend = make_backend(test_args)
+    start = manifest['tests']
+    for test_no in range(start, tests):
+        remove_test(exp_dir, test_no)
+        config = write_config(experiment, work_dir)
+        durations = run_test(backend, test_no, test_args, config)
+        info_log(f'{experiment.id} test {test_no + 1}/{tests}: {format_durations(durations)}')
+        manifest.update(tests=test_no + 1,
+                        durations=manifest['durations'] + [durations],
+                        files=sorted(file.name for file in list_result_files(exp_dir)),
+                        updated=datetime.now().isoformat(timespec='seconds'))
+        write_manifest(exp_dir, manifest)
+
+    return tests - start
+
+
+def sweep(experiments: List[Experiment], store: str, tests: int, args: Namespace, slots: int) -> Tuple[int, int]:
+    """
+    Run the experiments which miss tests, independent experiments run in parallel worker slots.
+    The mininet backend has a single slot in the current directory: p4run networks share the host names, the thrift
+    ports and the relative paths of p4app.json.
+    :param experiments: experiments of the sweep
+    :param store: directory of the store
+    :param tests: number of tests each experiment should have
+    :param args: arguments of the sweep, as the orchestrator takes them
+    :param slots: number of worker slots
+    :return: number of tests run and of failed experiments
+    """
+    pending = [experiment for experiment in experiments
+               if (read_manifest(os.path.join(store, experiment.id)) or {'tests': 0})['tests'] < tests]
+    info_log(f'{len(experiments)} experiment(s), {len(experiments) - len(pending)} already complete')
+    if args.backend == 'mininet':
+        slots = 1
+    free = [os.path.join(store, SLOT_DIR, str(slot)) if args.backend == 'local' else '.' for slot in range(slots)]
+    lock = threading.Lock()
+
+    def run(experiment: Experiment) -> Optional[int]:
+        with lock:
+            work_dir = free.pop()
+        try:
+            os.makedirs(work_dir, exist_ok=True)
+            return run_experiment(experiment, store, tests, args, work_dir)
+        except Exception as e:
+            # A failed experiment must not abort the others of the pool, whatever the backend raised
+            error_log(f'{experiment.id}: {type(e).__name__}: {e}')
+            return None
+        finally:
+            with lock:
+                free.append(work_dir)
+
+    try:
+        with ThreadPoolExecutor(max(min(slots, len(pending)), 1)) as executor:
+            done = list(executor.map(run, pending))
+    finally:
+        shutil.rmtree(os.path.join(store, SLOT_DIR), ignore_errors=True)
+
+    return sum(num for num in done if num is not None), sum(num is None for num in done)
+
+
+def parse_value(field: str, value: str):
+    """
+    Parse the value of a query term, versions may be written as v1 and v2
+    :param field: field of the term
+    :param value: value of the term
+    :return: int or str
+    """
+    if field == 'version' and re.fullmatch(r'v\d+', value):
+        return int(value[1:]) - 1
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse_query(terms: List[str]) -> List[Tuple[str, Callable, object]]:
+    """
+    Parse the terms of a query such as version=v2 number>=25
+    :param terms: terms, every one must hold
+    :return: field, operator and value of each term
+    """
+    parsed = []
+    for term in terms:
+        match = TERM_PATTERN.match(term.replace(' ', ''))
+        if match is None:
+            raise ValueError(f'Invalid query term {term}')
+        field, symbol, value = match.groups()
+        parsed.append((field, dict(OPERATORS)[symbol], parse_value(field, value)))
+
+    return parsed
+
+
+def list_experiments(store: str) -> List[dict]:
+    """
+    List the manifests of a store
+    :param store: directory of the store
+    :return: manifests in the order of their keys
+    """
+    manifests = []
+    if os.path.isdir(store):
+        for entry in os.scandir(store):
+            if entry.is_dir() and not entry.name.startswith('.') and entry.name != SELECTION_DIR:
+                manifest = read_manifest(entry.path)
+                if manifest is not None:
+                    manifests.append(manifest)
+
+    return sorted(manifests, key=lambda manifest: (manifest['key']['version'], manifest['key']['random'],
+                                                   manifest['key']['number'], str(manifest['seed']), manifest['id']))
+
+
+def query(store: str, terms: List[str]) -> List[dict]:
+    """
+    Find the experiments with tests which match every term of a query
+    :param store: directory of the store
+    :param terms: terms of the query
+    :return: manifests
+    """
+    parsed = parse_query(terms)
+    matched = []
+    for manifest in list_experiments(store):
+        fields = {**manifest['key'], **{field: manifest.get(field) for field in MANIFEST_FIELDS}}
+        for field, _, _ in parsed:
+            if field not in fields:
+                raise ValueError(f'Unknown query field {field}, one of {", ".join(sorted(fields))}')
+        try:
+            if manifest['tests'] and all(compare(fields[field], value) for field, compare, value in parsed):
+                matched.append(manifest)
+        except TypeError:
+            continue
+
+    return matched
+
+
+def select_experiments(store: str, terms: List[str]) -> str:
+    """
+    Link the results of the experiments matching a query into one directory, the tests are numbered again one
+    experiment after another, so that aggregator.py and the other tools read it as a results directory
+    :param store: directory of the store
+    :param terms: terms of the query
+    :return: name of the results directory
+    """
+    manifests = query(store, terms)
+    if not manifests:
+        raise ValueError(f'No experiment matches {" ".join(terms)}')
+    digest = hashlib.sha256(' '.join(sorted(terms)).encode()).hexdigest()[:16]
+    out_dir = os.path.join(store, SELECTION_DIR, digest)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    offset = 0
+    for manifest in manifests:
+        exp_dir = os.path.abspath(os.path.join(store, manifest['id']))
+        for file in list_result_files(exp_dir):
+            test_no = int(get_serial_number(file.name))
+            if test_no >= manifest['tests']:
+                continue
+            name = f'{get_host(file.name)}_{offset + test_no}{file.name[-4:]}'
+            os.symlink(file.path, os.path.join(out_dir, name))
+            if os.path.exists(routes_path(file.path)):
+                os.symlink(routes_path(file.path), os.path.join(out_dir, name[:-4] + ROUTES_SUFFIX))
+        for test_no in range(manifest['tests']):
+            config = os.path.join(exp_dir, CONFIG_NAME.format(test_no))
+            if os.path.exists(config):
+                os.symlink(config, os.path.join(out_dir, CONFIG_NAME.format(offset + test_no)))
+        offset += manifest['tests']
+    with open(os.path.join(out_dir, 'query.json'), 'w') as out_file:
+        json.dump({'query': terms, 'experiments': [manifest['id'] for manifest in manifests]}, out_file, indent=2)
+
+    return out_dir
+
+
+def print_experiments(experiments: List[Tuple[str, dict, Optional[int]]], store: str) -> None:
+    """
+    Print the experiments with the number of tests they have in the store
+    :param experiments: ID, key and seed of each experiment
+    :param store: directory of the store
+    :return: None
+    """
+    rows = [[exp_id, f'v{key["version"] + 1}', str(key['random']), str(key['number']), str(seed),
+             str((read_manifest(os.path.join(store, exp_id)) or {'tests': 0})['tests'])]
+            for exp_id, key, seed in experiments]
+    for line in format_table(['ID', 'Version', 'Random', 'Switches', 'Seed', 'Tests'], rows):
+        print(line)
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-st', '--store', help='Directory of the experiment store', type=str, default='experiments')
+    parser.add_argument('-v', '--version', help='Versions of the P4 architecture', type=int, nargs='*',
+                        choices=[0, 1], default=[0])
+    parser.add_argument('-r', '--random', help='Modes of link delay', type=int, nargs='*', choices=[0, 1, 2],
+                        default=[0])
+    parser.add_argument('-n', '--number', help='Numbers of switches', type=int, nargs='*', default=[4])
+    parser.add_argument('-tp', '--topology', help='Shape of the links between switches', type=str, choices=TOPOLOGIES,
+                        default='mesh')
+    parser.add_argument('-s', '--seed', help='Random seed of the first config of each point', type=int, default=0)
+    parser.add_argument('-sn', '--seeds', help='Number of configs randomized for each point', type=int, default=1)
+    parser.add_argument('-t', '--tests', help='Number of tests of each experiment', type=int, default=1)
+    parser.add_argument('-src', '--source', help='Host sending the packets', type=str, default='h1')
+    parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
+    parser.add_argument('-ch', '--check', help='Whether send packets again to test convergence', type=int,
+                        choices=[0, 1], default=1)
+    parser.add_argument('-e', '--engine', help='Capture engine of the receivers, daemon for one capture_daemon.py',
+                        type=str, choices=['scapy', 'raw', 'daemon'], default='scapy')
+    parser.add_argument('-i', '--idle', help='Milliseconds without new results before the receivers are stopped',
+                        type=float, default=500)
+    parser.add_argument('-bt', '--boot-timeout', help='Seconds to wait for the network to boot', type=float,
+                        default=600)
+    parser.add_argument('-pt', '--phase-timeout', help='Seconds to wait for any other phase', type=float, default=60)
+    parser.add_argument('-b', '--backend', help='Backend running the tests', type=str, choices=['mininet', 'local'],
+                        default='mininet')
+    parser.add_argument('-lb', '--local-boot', help='Seconds the local backend takes to boot and to shut down',
+                        type=float, default=0.5)
+    parser.add_argument('-w', '--workers', help='Number of worker slots running experiments in parallel, the mininet '
+                                                'backend has one', type=int, default=1)
+    parser.add_argument('-dr', '--dry-run', help='Only list the experiments of the sweep', action='store_true')
+    parser.add_argument('-q', '--query', help='List the experiments matching terms such as version=v2 number>=25 '
+                                              'instead of running a sweep', type=str, nargs='*', default=None)
+    parser.add_argument('-sl', '--select', help='Link the results matching the query into one results directory',
+                        action='store_true')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 utils/experiments.py [-st store] [-v (0-1) ...] [-r (0-2) ...] [-n number ...] [-tp topology]
+                 [-s seed] [-sn seeds] [-t tests] [-src source] [-c count] [-ch (0-1)] [-e engine] [-i idle]
+                 [-bt boot_timeout] [-pt phase_timeout] [-b backend] [-lb local_boot] [-w num_of_workers] [-dr]
+                 [-q term ...] [-sl]
+    """
+    args = parse_arguments()
+    try:
+        if args.query is not None:
+            matched = query(args.store, args.query)
+            print_experiments([(manifest['id'], manifest['key'], manifest['seed']) for manifest in matched],
+                              args.store)
+            if args.select:
+                selection = select_experiments(args.store, args.query)
+                info_log(f'Results of {len(matched)} experiment(s) linked in {selection}')
+            sys.exit(0)
+
+        plan_dir = os.path.join(args.store, SLOT_DIR, 'plan')
+        os.makedirs(plan_dir, exist_ok=True)
+        sweep_plan = plan(args.version, args.random, args.number, args.topology,
+                          list(range(args.seed, args.seed + args.seeds)), args.count, args.check, args.source,
+                          plan_dir)
+        if args.dry_run:
+            shutil.rmtree(os.path.join(args.store, SLOT_DIR), ignore_errors=True)
+            print_experiments([(experiment.id, experiment.key, experiment.seed) for experiment in sweep_plan],
+                              args.store)
+            sys.exit(0)
+
+        num_of_tests, failed = sweep(sweep_plan, args.store, args.tests, args, args.workers)
+        info_log(f'{num_of_tests} test(s) run in {args.store}')
+        if failed:
+            error_log(f'{failed} experiment(s) failed')
+            sys.exit(1)
+    except ValueError as e:
+        error_log(str(e))
+        sys.exit(1)
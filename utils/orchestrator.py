@@ -0,0 +1,625 @@
+import sys
+import os
+import json
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import threading
+from argparse import ArgumentParser, Namespace
+from contextlib import contextmanager
+from time import perf_counter, sleep
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from randomizer import TOPOLOGIES, randomize
+from simulator import CONFIG_NAME, Topology, load_topology, send_times, simulate, write_results
+
+
+PHASES = ['randomize', 'boot', 'receivers', 'send', 'drain', 'stop', 'shutdown', 'clean']
+
+# Same as CAPTURING in capture.py, without the interface
+CAPTURING = 'Capturing on interface'
+
+# p4run gives the switches consecutive thrift ports from 9090
+THRIFT_PORT = 9090
+
+POLL_INTERVAL = 0.05
+CONNECT_TIMEOUT = 0.2
+
+
+class Program:
+    """
+    Program started by a backend on a host, its output lines are collected in the background
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Create a program
+        :param name: name of the program in logs
+        :return: None
+        """
+        self.name = name
+        self.lines = queue.Queue()  # type: queue.Queue
+
+    def wait_for(self, text: str, timeout: float) -> bool:
+        """
+        Wait until the program outputs a line containing the text
+        :param text: text to be waited for
+        :param timeout: seconds to wait at most
+        :return: whether the text was output in time
+        """
+        deadline = perf_counter() + timeout
+        while True:
+            try:
+                line = self.lines.get(timeout=max(min(POLL_INTERVAL, deadline - perf_counter()), 0))
+            except queue.Empty:
+                if perf_counter() >= deadline or not self.running():
+                    return False
+                continue
+            if text in line:
+                return True
+
+    def running(self) -> bool:
+        """
+        Check whether the program is still running
+        :return: whether it is running
+        """
+        raise NotImplementedError
+
+    def stop(self) -> None:
+        """
+        Ask the program to stop, as CONTROL-C does
+        :return: None
+        """
+        raise NotImplementedError
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait until the program exits
+        :param timeout: seconds to wait at most
+        :return: whether it exited in time
+        """
+        raise NotImplementedError
+
+
+class ProcessProgram(Program):
+    """
+    Program running as a child process
+    """
+
+    def __init__(self, name: str, args: List[str], cwd: Optional[str] = None) -> None:
+        """
+        Start the process
+        :param name: name of the program in logs
+        :param args: command line
+        :param cwd: working directory
+        :return: None
+        """
+        super().__init__(name)
+        self.process = subprocess.Popen(args, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, universal_newlines=True, bufsize=1)
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self) -> None:
+        for line in self.process.stdout:
+            self.lines.put(line)
+
+    def running(self) -> bool:
+        return self.process.poll() is None
+
+    def stop(self) -> None:
+        if self.running():
+            self.process.send_signal(signal.SIGINT)
+
+    def wait(self, timeout: float) -> bool:
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            return False
+
+        return True
+
+
+class ThreadProgram(Program):
+    """
+    Stand-in program running as a thread, the target gets a stop event and a function outputting a line
+    """
+
+    def __init__(self, name: str, target: Callable[[threading.Event, Callable[[str], None]], None]) -> None:
+        """
+        Start the thread
+        :param name: name of the program in logs
+        :param target: body of the program
+        :return: None
+        """
+        super().__init__(name)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=target, args=(self._stopped, self.lines.put), daemon=True)
+        self._thread.start()
+
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def wait(self, timeout: float) -> bool:
+        self._thread.join(timeout)
+
+        return not self._thread.is_alive()
+
+
+class Backend:
+    """
+    Runs the network and the programs of each test
+    """
+
+    def start_network(self, config: str, test_no: int) -> None:
+        """
+        Start the network of the configuration
+        :param config: p4app.json written by randomizer.py
+        :param test_no: serial number of the test
+        :return: None
+        """
+        raise NotImplementedError
+
+    def switch_address(self, index: int) -> Tuple[str, int]:
+        """
+        Get the address of the thrift server of a switch
+        :param index: index of the switch
+        :return: host and port
+        """
+        raise NotImplementedError
+
+    def interface_up(self, host: str) -> bool:
+        """
+        Check whether the interface of a host is up
+        :param host: name of the host
+        :return: whether it is up
+        """
+        raise NotImplementedError
+
+    def start_receiver(self, host: str) -> Program:
+        """
+        Start a receiver on a host
+        :param host: name of the host
+        :return: receiver
+        """
+        raise NotImplementedError
+
+    def start_receivers(self, hosts: List[str]) -> List[Program]:
+        """
+        Start the receivers of hosts, each of them is ready once it logs CAPTURING
+        :param hosts: names of the hosts
+        :return: receivers
+        """
+        return [self.start_receiver(host) for host in hosts]
+
+    def start_sender(self, host: str, num_of_pkt: int, check: bool) -> Program:
+        """
+        Start a sender on a host
+        :param host: name of the host
+        :param num_of_pkt: number of packets sent in each round
+        :param check: whether to send another round
+        :return: sender
+        """
+        raise NotImplementedError
+
+    def stop_network(self) -> None:
+        """
+        Ask the network to stop
+        :return: None
+        """
+        raise NotImplementedError
+
+    def network_stopped(self) -> bool:
+        """
+        Check whether the network stopped
+        :return: whether it stopped
+        """
+        raise NotImplementedError
+
+    def clean(self) -> None:
+        """
+        Remove what the test left behind
+        :return: None
+        """
+        raise NotImplementedError
+
+
+class MininetBackend(Backend):
+    """
+    p4run with Mininet, programs are started in the namespace of their host with mx.
+    With the daemon engine, one capture_daemon.py captures the interfaces of every receiving host.
+    """
+
+    def __init__(self, engine: str, dir_name: str) -> None:
+        """
+        Create the backend
+        :param engine: capture engine of the receivers
+        :param dir_name: name of the results directory of the receivers
+        :return: None
+        """
+        self.engine = engine
+        # The receivers run in host_test
+        self.dir_name = os.path.abspath(dir_name)
+        self.network = None  # type: Optional[subprocess.Popen]
+
+    def start_network(self, config: str, test_no: int) -> None:
+        with open('p4run.log', 'w') as log:
+            self.network = subprocess.Popen(['sudo', 'p4run', '--config', config], stdin=subprocess.PIPE,
+                                            stdout=log, stderr=subprocess.STDOUT, universal_newlines=True)
+
+    def switch_address(self, index: int) -> Tuple[str, int]:
+        return '127.0.0.1', THRIFT_PORT + index
+
+    def interface_up(self, host: str) -> bool:
+        state = subprocess.run(['sudo', 'mx', host, 'cat', '/sys/class/net/{}-eth0/operstate'.format(host)],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+
+        return state.stdout.strip() == 'up'
+
+    def start_receiver(self, host: str) -> Program:
+        return ProcessProgram(host, ['sudo', 'mx', host, sys.executable, 'receiver.py', '-if', host + '-eth0', '-e',
+                                     self.engine, '-d', self.dir_name], cwd='host_test')
+
+    def start_receivers(self, hosts: List[str]) -> List[Program]:
+        if self.engine != 'daemon':
+            return super().start_receivers(hosts)
+
+        # The daemon logs CAPTURING once every interface is captured
+        return [ProcessProgram('capture_daemon', ['sudo', sys.executable, 'capture_daemon.py', '-m', '-d',
+                                                  self.dir_name, '-if'] + [host + '-eth0' for host in hosts],
+                               cwd='host_test')]
+
+    def start_sender(self, host: str, num_of_pkt: int, check: bool) -> Program:
+        return ProcessProgram(host, ['sudo', 'mx', host, sys.executable, 'sender.py', '-if', host + '-eth0', '-c',
+                                     str(num_of_pkt), '-ch', str(int(check))], cwd='host_test')
+
+    def stop_network(self) -> None:
+        if self.network is not None and self.network.poll() is None:
+            try:
+                self.network.stdin.write('exit\n')
+                self.network.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def network_stopped(self) -> bool:
+        return self.network is None or self.network.poll() is not None
+
+    def clean(self) -> None:
+        subprocess.run(['make', 'clean'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class LocalBackend(Backend):
+    """
+    Offline stand-in for p4run: switches are local TCP listeners that accept connections after the boot time,
+    receivers only report that they capture and the sender writes the results of simulator.py
+    """
+
+    def __init__(self, dir_name: str, boot_time: float, shutdown_time: float, time_scale: float) -> None:
+        """
+        Create the backend
+        :param dir_name: name of the results directory
+        :param boot_time: seconds until the switches and interfaces are ready
+        :param shutdown_time: seconds until the network stops
+        :param time_scale: ratio of the wall-clock time of the sender to the simulated time
+        :return: None
+        """
+        self.dir_name = dir_name
+        self.boot_time = boot_time
+        self.shutdown_time = shutdown_time
+        self.time_scale = time_scale
+        self.topology = None  # type: Optional[Topology]
+        self.test_no = 0
+        self.started = 0.0
+        self.listeners = []  # type: List[socket.socket]
+        self.stopped = threading.Event()
+
+    def start_network(self, config: str, test_no: int) -> None:
+        self.topology = load_topology(config)
+        self.test_no = test_no
+        self.started = perf_counter()
+        self.stopped.clear()
+        self.listeners = []
+        for _ in self.topology.switches:
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.bind(('127.0.0.1', 0))
+            self.listeners.append(listener)
+        timer = threading.Timer(self.boot_time, lambda: [listener.listen() for listener in self.listeners])
+        timer.daemon = True
+        timer.start()
+
+    def switch_address(self, index: int) -> Tuple[str, int]:
+        return self.listeners[index].getsockname()
+
+    def interface_up(self, host: str) -> bool:
+        return perf_counter() - self.started >= self.boot_time
+
+    def start_receiver(self, host: str) -> Program:
+        def receive(stopped: threading.Event, output: Callable[[str], None]) -> None:
+            output('{} {}-eth0\n'.format(CAPTURING, host))
+            stopped.wait()
+
+        return ThreadProgram(host, receive)
+
+    def start_sender(self, host: str, num_of_pkt: int, check: bool) -> Program:
+        def send(stopped: threading.Event, output: Callable[[str], None]) -> None:
+            times = send_times(num_of_pkt, 2 if check else 1, 0.02, 1.0)
+            deliveries = simulate(self.topology, self.topology.version, host, times, 1, self.test_no, 0.001, 0.0005,
+                                  False, 'numpy', 1)
+            stopped.wait(float(times[-1]) * self.time_scale)
+            write_results(deliveries, self.topology, self.dir_name, self.test_no)
+            output('Sent {} packets\n'.format(len(times)))
+
+        return ThreadProgram(host, send)
+
+    def stop_network(self) -> None:
+        def stop() -> None:
+            for listener in self.listeners:
+                listener.close()
+            self.stopped.set()
+
+        timer = threading.Timer(self.shutdown_time, stop)
+        timer.daemon = True
+        timer.start()
+
+    def network_stopped(self) -> bool:
+        return self.stopped.is_set()
+
+    def clean(self) -> None:
+        return
+
+
+class PhaseTimer:
+    """
+    Wall-clock time spent in each phase of a test
+    """
+
+    def __init__(self) -> None:
+        self.durations = dict()  # type: Dict[str, float]
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time a phase
+        :param name: name of the phase
+        :return: context of the phase
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + perf_counter() - start
+
+
+def port_open(address: Tuple[str, int]) -> bool:
+    """
+    Check whether a TCP server accepts connections
+    :param address: host and port
+    :return: whether it accepts
+    """
+    try:
+        with socket.create_connection(address, timeout=CONNECT_TIMEOUT):
+            return True
+    except OSError:
+        return False
+
+
+def wait_for_all(items: List, ready: Callable[..., bool], timeout: float, what: str) -> None:
+    """
+    Wait until every item is ready, items are checked again only while they are not
+    :param items: items to be checked
+    :param ready: readiness check of an item
+    :param timeout: seconds to wait at most
+    :param what: description of the wait for the error
+    :return: None
+    """
+    deadline = perf_counter() + timeout
+    pending = list(items)
+    while True:
+        pending = [item for item in pending if not ready(item)]
+        if not pending:
+            return
+        if perf_counter() > deadline:
+            raise TimeoutError('Timed out after {:g} s waiting for {} ({} left)'.format(timeout, what, len(pending)))
+        sleep(POLL_INTERVAL)
+
+
+def snapshot(dir_name: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Get the size and modification time of every csv result
+    :param dir_name: name of the results directory
+    :return: file name -> (size, modification time)
+    """
+    if not os.path.isdir(dir_name):
+        return dict()
+    with os.scandir(dir_name) as directory:
+        return {file.name: (file.stat().st_size, file.stat().st_mtime_ns) for file in directory
+                if file.name.endswith('.csv')}
+
+
+def wait_idle(dir_name: str, idle: float, timeout: float) -> None:
+    """
+    Wait until the receivers stop writing results
+    :param dir_name: name of the results directory
+    :param idle: seconds without any change
+    :param timeout: seconds to wait at most
+    :return: None
+    """
+    deadline = perf_counter() + timeout
+    last = snapshot(dir_name)
+    changed = perf_counter()
+    while perf_counter() - changed < idle:
+        if perf_counter() > deadline:
+            raise TimeoutError('Timed out after {:g} s waiting for the receivers to go idle'.format(timeout))
+        sleep(POLL_INTERVAL)
+        current = snapshot(dir_name)
+        if current != last:
+            last, changed = current, perf_counter()
+
+
+def run_test(backend: Backend, test_no: int, args: Namespace, config: Optional[str] = None) -> Dict[str, float]:
+    """
+    Run one test, each phase starts as soon as the previous one is ready
+    :param backend: backend running the network and the programs
+    :param test_no: serial number of the test
+    :param args: arguments of the orchestrator
+    :param config: p4app.json already written by randomizer.py, a new one is randomized in place if None
+    :return: phase -> seconds
+    """
+    timer = PhaseTimer()
+    receivers = []  # type: List[Program]
+    try:
+        with timer.phase('randomize'):
+            if config is None:
+                randomize(args.version, args.random, args.number, args.topology,
+                          None if args.seed is None else args.seed + test_no)
+                config = 'p4app.json'
+            hosts = [host for host in load_topology(config).hosts if host is not None]
+            os.makedirs(args.directory, exist_ok=True)
+            shutil.copyfile(config, os.path.join(args.directory, CONFIG_NAME.format(test_no)))
+
+        with timer.phase('boot'):
+            backend.start_network(config, test_no)
+            wait_for_all(list(range(args.number)), lambda idx: port_open(backend.switch_address(idx)),
+                         args.boot_timeout, 'the thrift ports of the switches')
+            wait_for_all(hosts, backend.interface_up, args.boot_timeout, 'the interfaces of the hosts')
+
+        with timer.phase('receivers'):
+            receivers = backend.start_receivers([host for host in hosts if host != args.source])
+            wait_for_all(receivers, lambda receiver: receiver.wait_for(CAPTURING, 0), args.phase_timeout,
+                         'the receivers to capture')
+
+        with timer.phase('send'):
+            sender = backend.start_sender(args.source, args.count, bool(args.check))
+            if not sender.wait(args.phase_timeout):
+                sender.stop()
+                raise TimeoutError('Timed out after {:g} s waiting for the sender'.format(args.phase_timeout))
+
+        with timer.phase('drain'):
+            wait_idle(args.directory, args.idle / 1000, args.phase_timeout)
+
+    finally:
+        with timer.phase('stop'):
+            for receiver in receivers:
+                receiver.stop()
+            for receiver in receivers:
+                if not receiver.wait(args.phase_timeout):
+                    error_log('Receiver on {} did not stop'.format(receiver.name))
+
+        with timer.phase('shutdown'):
+            backend.stop_network()
+            wait_for_all([backend], lambda network: network.network_stopped(), args.phase_timeout,
+                         'the network to stop')
+
+        with timer.phase('clean'):
+            backend.clean()
+
+    return timer.durations
+
+
+def make_backend(args: Namespace) -> Backend:
+    """
+    Create the backend chosen by the arguments
+    :param args: arguments of the orchestrator
+    :return: backend writing the results into args.directory
+    """
+    if args.backend == 'local':
+        return LocalBackend(args.directory, args.local_boot, args.local_boot, 0.1)
+
+    return MininetBackend(args.engine, args.directory)
+
+
+def format_durations(durations: Dict[str, float]) -> str:
+    """
+    Format the time spent in each phase
+    :param durations: phase -> seconds
+    :return: formatted durations
+    """
+    return ', '.join(['{} {:.2f} s'.format(name, durations[name]) for name in PHASES if name in durations] +
+                     ['total {:.2f} s'.format(sum(durations.values()))])
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print('[\033[96mINFO\033[00m] {}'.format(log))
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print('[\033[91mERROR\033[00m] {}'.format(log))
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--number', help='Number of switches', type=int, default=4)
+    parser.add_argument('-t', '--tests', help='Number of tests', type=int, default=1)
+    parser.add_argument('-v', '--version', help='Version of the P4 architecture', type=int, choices=[0, 1], default=0)
+    parser.add_argument('-r', '--random', help='Mode of link delay', type=int, choices=[0, 1, 2], default=0)
+    parser.add_argument('-tp', '--topology', help='Shape of the links between switches', type=str, choices=TOPOLOGIES,
+                        default='mesh')
+    parser.add_argument('-s', '--seed', help='Random seed of the first test (default: different every time)',
+                        type=int, default=None)
+    parser.add_argument('-src', '--source', help='Host sending the packets', type=str, default='h1')
+    parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
+    parser.add_argument('-ch', '--check', help='Whether send packets again to test convergence', type=int,
+                        choices=[0, 1], default=1)
+    parser.add_argument('-e', '--engine', help='Capture engine of the receivers, daemon for one capture_daemon.py',
+                        type=str, choices=['scapy', 'raw', 'daemon'], default='scapy')
+    parser.add_argument('-i', '--idle', help='Milliseconds without new results before the receivers are stopped',
+                        type=float, default=500)
+    parser.add_argument('-bt', '--boot-timeout', help='Seconds to wait for the network to boot', type=float,
+                        default=600)
+    parser.add_argument('-pt', '--phase-timeout', help='Seconds to wait for any other phase', type=float, default=60)
+    parser.add_argument('-d', '--directory', help='Name of the results directory', type=str, default='results')
+    parser.add_argument('-b', '--backend', help='Backend running the tests', type=str, choices=['mininet', 'local'],
+                        default='mininet')
+    parser.add_argument('-lb', '--local-boot', help='Seconds the local backend takes to boot and to shut down',
+                        type=float, default=0.5)
+    parser.add_argument('-j', '--json', help='File to which the phase durations of every test are written', type=str,
+                        default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 utils/orchestrator.py [-n number] [-t tests] [-v (0-1)] [-r (0-2)] [-tp topology] [-s seed]
+                 [-src source] [-c count] [-ch (0-1)] [-e engine] [-i idle] [-bt boot_timeout] [-pt phase_timeout]
+                 [-d directory] [-b backend] [-lb local_boot] [-j json]
+    """
+    arguments = parse_arguments()
+    runner = make_backend(arguments)
+
+    all_durations = []
+    try:
+        for test in range(arguments.tests):
+            info_log('Test {}'.format(test + 1))
+            all_durations.append(run_test(runner, test, arguments))
+            info_log('Test {}: {}'.format(test + 1, format_durations(all_durations[-1])))
+    except (TimeoutError, ValueError) as e:
+        error_log(str(e))
+        sys.exit(1)
+    finally:
+        if all_durations:
+            totals = {name: sum(durations.get(name, 0.0) for durations in all_durations) for name in PHASES}
+            info_log('{} test(s): {}'.format(len(all_durations), format_durations(totals)))
+        if arguments.json:
+            with open(arguments.json, 'w') as out_file:
+                json.dump(all_durations, out_file, indent=2)
@@ -0,0 +1,397 @@
+import sys
+import os
+import csv
+from argparse import ArgumentParser, Namespace
+from collections import Counter
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from aggregator import CodedResults, load_coded_results
+from simulator import CONFIG_NAME, Topology, load_topology
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from int_codec import MAX_INT_HEADERS  # noqa: E402
+from result_log import encode_routes  # noqa: E402
+
+# Columns of the scores of each result file
+SCORE_COLUMNS = ['Directory', 'Host', 'Test', 'Version', 'First_match', 'Converged_match', 'Hop_delta',
+                 'Delay_delta', 'Arrival_rank', 'Predicted_rank']
+
+
+class Prediction(NamedTuple):
+    """
+    Expected routes from the switch of the sender to every switch, indexed like Topology.switches.
+    Paths hold the switch IDs of the IntHeader in the traversal order, padded with zeros, as decode_batch does.
+    """
+    arrival: np.ndarray
+    first_path: np.ndarray
+    path: np.ndarray
+    num_of_switch: np.ndarray
+    delay: np.ndarray
+    rank: np.ndarray
+
+
+class Scores(NamedTuple):
+    """
+    Scores of the result files of a directory against the predictions, one entry per file
+    """
+    host: np.ndarray
+    test_no: np.ndarray
+    version: np.ndarray
+    first_match: np.ndarray
+    converged_match: np.ndarray
+    hop_delta: np.ndarray
+    delay_delta: np.ndarray
+    arrival_rank: np.ndarray
+    predicted_rank: np.ndarray
+
+
+def shortest_paths(weight: np.ndarray, sources: np.ndarray,
+                   max_switches: int = MAX_INT_HEADERS + 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Dijkstra from several sources at once, every step settles the nearest switch of every source, so all pairs take
+    one pass of (switches) vectorized steps. Ties are broken as by flood_v2 of simulator.py: fewer switches, then lower
+    parent index. As the P4 programs stop forwarding copies which went through max_switches switches, switches only
+    reached by longer paths are not reached.
+    :param weight: (switches, switches) cost of each link, inf without link
+    :param sources: indices of the source switches
+    :param max_switches: maximum number of switches on a path
+    :return: (sources, switches) cost, parent (-1 for a source or an unreached switch) and number of switches on the
+             path (0 for an unreached switch)
+    """
+    num_of_switches = len(weight)
+    rows = np.arange(len(sources))
+    cost = np.full((len(sources), num_of_switches), np.inf)
+    parent = np.full((len(sources), num_of_switches), -1)
+    length = np.zeros((len(sources), num_of_switches), dtype=np.int64)
+    settled = np.zeros((len(sources), num_of_switches), dtype=bool)
+
+    cost[rows, sources] = 0
+    length[rows, sources] = 1
+    settled[rows, sources] = True
+    switch = np.asarray(sources)
+    for _ in range(num_of_switches):
+        # Relax the neighbors of the newly settled switches
+        candidate = cost[rows, switch][:, None] + weight[switch]
+        current = np.maximum(parent[rows], 0)
+        rank = length[rows, switch][:, None] * num_of_switches + switch[:, None]
+        current_rank = length[rows[:, None], current] * num_of_switches + current
+        better = (candidate < cost[rows]) | ((candidate == cost[rows]) & np.isfinite(candidate) &
+                                             (rank < current_rank))
+        better &= ~settled[rows] & (length[rows, switch] < max_switches)[:, None]
+        cost[rows] = np.where(better, candidate, cost[rows])
+        parent[rows] = np.where(better, switch[:, None], parent[rows])
+
+        # Settle the nearest switch of every source
+        switch = np.where(settled[rows], np.inf, cost[rows]).argmin(axis=1)
+        reached = np.isfinite(cost[rows, switch]) & ~settled[rows, switch]
+        rows, switch = rows[reached], switch[reached]
+        if not len(rows):
+            break
+        settled[rows, switch] = True
+        length[rows, switch] = length[rows, parent[rows, switch]] + 1
+
+    return cost, parent, length
+
+
+def trace_paths(parent: np.ndarray, length: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """
+    Trace the path from the source to every switch of one shortest path tree
+    :param parent: parent of each switch, -1 for the source or an unreached switch
+    :param length: number of switches on the path to each switch, 0 if it is not reached
+    :param ids: ID of each switch
+    :return: (switches, MAX_INT_HEADERS) IDs of the IntHeader in the traversal order, the last MAX_INT_HEADERS switches
+             of longer paths, padded with zeros
+    """
+    path = np.zeros((len(parent), MAX_INT_HEADERS), dtype=np.uint32)
+    column = np.minimum(length, MAX_INT_HEADERS) - 1
+    node = np.arange(len(parent))
+    for _ in range(MAX_INT_HEADERS):
+        inside = column >= 0
+        path[inside, column[inside]] = ids[node[inside]]
+        node = np.where(parent[node] >= 0, parent[node], node)
+        column -= 1
+
+    return path
+
+
+def predict(topology: Topology, origin: int, processing: float, version: int) -> Prediction:
+    """
+    Predict the routes of a flood from the switch of the sender, without processing jitter.
+    The first copy reaching a host always took the minimum-delay path: each switch forwards the first copy it gets with
+    both programs. project_v2.p4 then keeps the port of that copy, so every packet takes the same path. project.p4
+    keeps the port of the first copy with the fewest hops instead, which converges to the minimum-delay path among the
+    paths with the fewest hops.
+    :param topology: topology
+    :param origin: index of the switch of the sender
+    :param processing: processing delay of a switch in seconds
+    :param version: 0 for project.p4, 1 for project_v2.p4
+    :return: prediction
+    """
+    weight = topology.delay + processing
+    cost, parent, length = shortest_paths(weight, np.array([origin]))
+    first_path = trace_paths(parent[0], length[0], topology.ids)
+    if version:
+        path, num_of_switch = first_path, length[0]
+    else:
+        # Minimizing hops * (longer than any path) + delay is minimizing the hops, then the delay
+        finite = weight[np.isfinite(weight)]
+        hop_cost = (finite.max() if len(finite) else 0) * len(weight) + 1
+        _, hop_parent, hop_length = shortest_paths(weight + hop_cost, np.array([origin]))
+        path, num_of_switch = trace_paths(hop_parent[0], hop_length[0], topology.ids), hop_length[0]
+
+    # A host gets a copy once its switch has processed it
+    arrival = np.where(np.isfinite(cost[0]), cost[0] + processing, np.inf)
+    arrival[origin] = np.inf
+    rank = np.argsort(np.argsort(arrival, kind='stable'), kind='stable')
+
+    return Prediction(arrival=arrival, first_path=first_path, path=path, num_of_switch=num_of_switch,
+                      delay=path_delay(topology, path, num_of_switch, processing), rank=rank)
+
+
+def path_delay(topology: Topology, path: np.ndarray, num_of_switch: np.ndarray, processing: float) -> np.ndarray:
+    """
+    Get the time a copy takes along each path from its sending to its delivery, without processing jitter
+    :param topology: topology
+    :param path: (paths, MAX_INT_HEADERS) switch IDs in the traversal order, padded with zeros
+    :param num_of_switch: number of switches on each path
+    :param processing: processing delay of a switch in seconds
+    :return: delay in seconds, nan if a path is truncated, leaves the topology or is empty
+    """
+    index = np.full(int(max(topology.ids.max(initial=0), path.max(initial=0))) + 1, -1)
+    index[topology.ids] = np.arange(len(topology.ids))
+    switch = index[path]
+    length = (path > 0).sum(axis=1)
+    hop = np.arange(MAX_INT_HEADERS - 1)
+    on_path = hop < (length - 1)[:, None]
+    links = topology.delay[np.maximum(switch[:, :-1], 0), np.maximum(switch[:, 1:], 0)]
+    delay = np.where(on_path, links, 0.0).sum(axis=1) + processing * length
+    valid = (length > 0) & (length == num_of_switch) & ~((switch < 0) & (path > 0)).any(axis=1)
+
+    return np.where(valid, delay, np.nan)
+
+
+def find_config(dir_name: str, test_no: int, default: Optional[str]) -> Optional[str]:
+    """
+    Find the p4app.json of a test
+    :param dir_name: name of the results directory
+    :param test_no: serial number of the test
+    :param default: p4app.json used for tests without their own copy
+    :return: path of the p4app.json, None if there is none
+    """
+    path = os.path.join(dir_name, CONFIG_NAME.format(test_no))
+
+    return path if os.path.exists(path) else default
+
+
+def score(coded: CodedResults, dir_name: str, source: str, processing: float, default_config: Optional[str] = None,
+          version: Optional[int] = None) -> Tuple[Scores, List[int]]:
+    """
+    Score every result file of a directory against the prediction of its test, all files of a test at once
+    :param coded: coded results of the directory
+    :param dir_name: name of the results directory, which holds the p4app_<N>.json of each test
+    :param source: host sending the packets
+    :param processing: processing delay of a switch in seconds
+    :param default_config: p4app.json of the tests without their own copy
+    :param version: 0 for project.p4, 1 for project_v2.p4, the program of p4app.json if None
+    :return: scores and serial numbers of the tests without p4app.json
+    """
+    # First and last copy received in each file
+    order = np.lexsort((coded.time, coded.host_code, coded.test_no))
+    host, test_no = coded.host_code[order], coded.test_no[order]
+    start = np.flatnonzero(np.r_[True, (host[1:] != host[:-1]) | (test_no[1:] != test_no[:-1])]) if len(order) else \
+        np.empty(0, dtype=np.int64)
+    end = np.r_[start[1:], len(order)] - 1
+    file_host, file_test = host[start], test_no[start]
+    routes = encode_routes(coded.routes.ids) if len(coded.routes) else np.zeros(0, dtype=encode_routes([]).dtype)
+    first_route, last_route = routes['ids'][coded.route_code[order[start]]], routes['ids'][coded.route_code[order[end]]]
+    last_length = coded.num_of_switch[order[end]].astype(np.int64)
+    first_time = coded.time[order[start]]
+
+    scores = Scores(host=file_host, test_no=file_test, version=np.full(len(start), -1),
+                    first_match=np.zeros(len(start), dtype=bool), converged_match=np.zeros(len(start), dtype=bool),
+                    hop_delta=np.zeros(len(start), dtype=np.int64), delay_delta=np.full(len(start), np.nan),
+                    arrival_rank=np.zeros(len(start), dtype=np.int64),
+                    predicted_rank=np.zeros(len(start), dtype=np.int64))
+    missing = []
+    for test in np.unique(file_test):
+        config = find_config(dir_name, int(test), default_config)
+        if config is None:
+            missing.append(int(test))
+            continue
+        topology = load_topology(config)
+        test_version = topology.version if version is None else version
+        selected = np.flatnonzero(file_test == test)
+        switch = np.array([topology.hosts.index(coded.hosts[code].partition('-')[0]) for code in file_host[selected]])
+        prediction = predict(topology, topology.hosts.index(source), processing, test_version)
+
+        scores.version[selected] = test_version
+        scores.first_match[selected] = (first_route[selected] == prediction.first_path[switch]).all(axis=1)
+        scores.converged_match[selected] = (last_route[selected] == prediction.path[switch]).all(axis=1)
+        scores.hop_delta[selected] = last_length[selected] - prediction.num_of_switch[switch]
+        scores.delay_delta[selected] = path_delay(topology, last_route[selected], last_length[selected],
+                                                  processing) - prediction.delay[switch]
+        scores.arrival_rank[selected] = np.argsort(np.argsort(first_time[selected], kind='stable'), kind='stable')
+        scores.predicted_rank[selected] = np.argsort(np.argsort(prediction.rank[switch], kind='stable'),
+                                                     kind='stable')
+
+    return scores, missing
+
+
+def rank_correlation(scores: Scores, selected: np.ndarray) -> float:
+    """
+    Mean Spearman correlation between the measured and predicted orders in which the hosts of each test get their
+    first copy
+    :param scores: scores
+    :param selected: mask of the files to be summarized
+    :return: correlation, nan without a test of at least 3 hosts
+    """
+    correlations = []
+    for test in np.unique(scores.test_no[selected]):
+        files = selected & (scores.test_no == test)
+        if files.sum() >= 3:
+            correlations.append(np.corrcoef(scores.arrival_rank[files], scores.predicted_rank[files])[0, 1])
+
+    return float(np.mean(correlations)) if correlations else float('nan')
+
+
+def summarize(scores: Scores, selected: np.ndarray) -> List[str]:
+    """
+    Summarize the scores of some files as the cells of an accuracy table
+    :param scores: scores
+    :param selected: mask of the files to be summarized
+    :return: number of files, exact matches of the first and converged routes, hop and delay deltas of the converged
+             routes, and arrival order correlation
+    """
+    num_of_files = int(selected.sum())
+    if not num_of_files:
+        return ['0'] + ['-'] * 6
+    delay = scores.delay_delta[selected]
+
+    return [str(num_of_files),
+            f'{scores.first_match[selected].mean():.1%}',
+            f'{scores.converged_match[selected].mean():.1%}',
+            f'{scores.hop_delta[selected].mean():+.2f}',
+            f'{np.abs(scores.hop_delta[selected]).mean():.2f}',
+            f'{np.nanmean(delay) * 1e3:+.3f}' if np.isfinite(delay).any() else '-',
+            f'{rank_correlation(scores, selected):.3f}']
+
+
+def format_table(header: List[str], rows: List[List[str]]) -> List[str]:
+    """
+    Format a table with aligned columns
+    :param header: names of the columns
+    :param rows: cells of each row
+    :return: lines of the table
+    """
+    widths = [max(len(cell) for cell in column) for column in zip(header, *rows)]
+
+    return ['  '.join(cell.rjust(width) if idx else cell.ljust(width) for idx, (cell, width) in
+                      enumerate(zip(row, widths))) for row in [header] + rows]
+
+
+def write_scores(filename: str, all_scores: Dict[str, Tuple[CodedResults, Scores]]) -> None:
+    """
+    Write the scores of every result file into a csv file
+    :param filename: name of the csv file
+    :param all_scores: directory -> coded results and scores
+    :return: None
+    """
+    with open(filename, 'w', newline='') as out_file:
+        writer = csv.writer(out_file)
+        writer.writerow(SCORE_COLUMNS)
+        for dir_name, (coded, scores) in all_scores.items():
+            scored = scores.version >= 0
+            writer.writerows(zip([dir_name] * int(scored.sum()),
+                                 [coded.hosts[code] for code in scores.host[scored]],
+                                 *[field[scored].tolist() for field in scores[1:]]))
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-d', '--directories', help='Names of the result directories', type=str, nargs='+',
+                        default=['results'])
+    parser.add_argument('-f', '--file', help='p4app.json of the tests without p4app_<N>.json in their directory',
+                        type=str, default=None)
+    parser.add_argument('-v', '--version', help='Version of the P4 architecture (default: program of p4app.json)',
+                        type=int, choices=[0, 1], default=None)
+    parser.add_argument('-src', '--source', help='Host sending the packets', type=str, default='h1')
+    parser.add_argument('-p', '--processing', help='Processing delay of a switch in milliseconds', type=float,
+                        default=1)
+    parser.add_argument('-w', '--workers', help='Number of processes parsing csv files', type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument('-o', '--output', help='csv file of the scores of every result file (default: do not write)',
+                        type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 utils/predictor.py [-d directories] [-f p4app.json] [-v (0-1)] [-src source] [-p processing]
+                 [-w num_of_workers] [-o output]
+    """
+    args = parse_arguments()
+    header = ['Directory', 'Version', 'Files', 'First route', 'Converged route', 'Hop delta', '|Hop delta|',
+              'Delay delta (ms)', 'Arrival order']
+    rows, results = [], dict()
+    for directory in args.directories:
+        directory = directory.rstrip('/')
+        start_time = perf_counter()
+        coded_results = load_coded_results(directory, args.workers)
+        try:
+            directory_scores, missing_tests = score(coded_results, directory, args.source, args.processing / 1000,
+                                                    args.file, args.version)
+        except (OSError, ValueError, KeyError) as e:
+            error_log(f'Cannot score {directory}: {e}')
+            continue
+        if missing_tests:
+            error_log(f'{directory}: no p4app.json for test(s) {missing_tests}, their files are not scored')
+        info_log(f'{directory}: scored {int((directory_scores.version >= 0).sum())} file(s) of '
+                 f'{len(coded_results.time)} packets in {perf_counter() - start_time:.3f} s')
+        results[directory] = (coded_results, directory_scores)
+        for ver in np.unique(directory_scores.version[directory_scores.version >= 0]):
+            rows.append([directory, f'v{ver + 1}'] + summarize(directory_scores, directory_scores.version == ver))
+
+    # Accuracy of each version over all directories
+    versions = Counter(row[1] for row in rows)
+    for ver in sorted(versions):
+        if versions[ver] > 1:
+            merged = [scores for _, scores in results.values()]
+            offset = np.cumsum([0] + [int(scores.test_no.max(initial=0)) + 1 for scores in merged[:-1]])
+            combined = Scores(*[np.concatenate([getattr(scores, field) + (shift if field == 'test_no' else 0)
+                                                for scores, shift in zip(merged, offset)])
+                                for field in Scores._fields])
+            rows.append(['all', ver] + summarize(combined, combined.version == int(ver[1:]) - 1))
+
+    for line in format_table(header, rows):
+        info_log(line)
+    if args.output:
+        write_scores(args.output, results)
+        info_log(f'Wrote the scores of every result file into {args.output}')
@@ -1,103 +1,224 @@
 import json
 import sys
 import os
-from random import randint
+import numpy as np
 from argparse import ArgumentParser, Namespace, ArgumentTypeError
+from collections import Counter
+from math import ceil, sqrt
+from typing import Dict, List
 
 
-def randomize(version: int, random_mode: int, num_of_switches: int) -> None:
+TOPOLOGIES = ['mesh', 'ring', 'regular', 'random', 'fattree', 'grid']
+
+# Stands for the links in the json template until they are serialized
+LINKS_PLACEHOLDER = '<links>'
+
+# sx-commands.txt, the switch ID is the default action of switch_id_table for every src_swid
+SWITCH_COMMANDS = ('mc_mgrp_create 1\n'
+                   'mc_node_create {0}\n'
+                   'mc_node_associate 1 0\n'
+                   'table_set_default switch_id_table get_switch_id {1}\n'
+                   'table_add l2 add_myTtl_multicast ff:ff:ff:ff:ff:ff => {1}\n'
+                   'table_add host_table remove_myTtl 1 =>\n')
+
+# Links of the worst case, only provided for 4 switches
+WORST_CASE = [(0, 1, 100), (0, 2, 10), (0, 3, 50), (1, 2, 50), (1, 3, 10), (2, 3, 10)]
+
+
+def randomize(version: int, random_mode: int, num_of_switches: int, topology: str = 'mesh', seed: int = None,
+              degree: int = 3, probability: float = 0.1, out_dir: str = '.') -> None:
     """
     Randomize the link delay between switches
     :param version: version of P4 architecture
     :param random_mode: 0 for equal link delay, 1 for worst case, 2 for random link delay
     :param num_of_switches: number of switches
+    :param topology: shape of the links between switches, one of TOPOLOGIES
+    :param seed: random seed of the links and delays (None for a different result every time)
+    :param degree: degree of each switch of a random regular graph
+    :param probability: probability of each link of an Erdos-Renyi graph
+    :param out_dir: directory of p4app.json and runtime_commands
     :return: None
     """
-    with open('utils/p4app.json.txt') as in_file:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'p4app.json.txt')) as in_file:
         data = json.load(in_file)
-        # Check p4 version
-        if not version:
-            # Version 1
-            p4_file_name = 'project.p4'
-            info_log('Version 1')
+    # Check p4 version
+    if not version:
+        # Version 1
+        p4_file_name = 'project.p4'
+        info_log('Version 1')
 
-        else:
-            # Version 2
-            p4_file_name = 'project_v2.p4'
-            info_log('Version 2')
-
-        if random_mode == 1:
-            if num_of_switches != 4:
-                raise ValueError('We only provide worst case for 4 switches.')
+    else:
+        # Version 2
+        p4_file_name = 'project_v2.p4'
+        info_log('Version 2')
 
-        # sx-commands.txt
-        for i in range(num_of_switches):
-            file_content = 'mc_mgrp_create 1\n'
-            file_content += 'mc_node_create '
-            for j in range(num_of_switches + 1):
-                file_content += str(j)
-                if j != num_of_switches:
-                    file_content += ' '
-                else:
-                    file_content += '\n'
-            file_content += 'mc_node_associate 1 0\n'
-            for j in range(num_of_switches):
-                file_content += 'table_add switch_id_table get_switch_id ' + str(j + 1) + " => " + str(i + 1) + '\n'
-            file_content += 'table_add l2 add_myTtl_multicast ff:ff:ff:ff:ff:ff => ' + str(i + 1) + '\n'
-            file_content += 'table_add host_table remove_myTtl 1 =>\n'
-            filename = 'runtime_commands/s' + str(i + 1) + '-commands.txt'
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
-            with open(filename, 'w') as out_file:
-                out_file.write(file_content)
-
-        # Host info
-        for i in range(num_of_switches):
-            hx = 'h' + str(i+1)
-            data['topology']['hosts'][hx] = {}
-
-        # Switch info
-        data['program'] = p4_file_name
-        for i in range(num_of_switches):
-            sx = 's' + str(i + 1)
-            data['topology']['switches'][sx] = {"cli_input": "./runtime_commands/" + sx + "-commands.txt",
-                                                "program": p4_file_name}
-
-        # Links between hosts and switches
-        for i in range(num_of_switches):
-            hx = 'h' + str(i + 1)
-            sx = 's' + str(i + 1)
-            data['topology']['links'].append([hx, sx])
-
-        # Links between switches
-        links = data['topology']['links']
+    rand = np.random.default_rng(seed)
+    if random_mode == 1:
+        if num_of_switches != 4 or topology != 'mesh':
+            raise ValueError('We only provide worst case for a mesh of 4 switches.')
+        links = np.array([link[:2] for link in WORST_CASE])
+        delays = np.array([link[2] for link in WORST_CASE])
+        info_log('Worst case')
+    else:
+        links = generate_links(topology, num_of_switches, rand, degree, probability)
         if random_mode == 2:
-            # Randomize
+            delays = rand.integers(0, 101, len(links))
             info_log('Random delay')
-            for i in range(num_of_switches):
-                for j in range(i + 1, num_of_switches):
-                    sx1 = 's' + str(i + 1)
-                    sx2 = 's' + str(j + 1)
-                    links.append([sx1, sx2, {'delay': '{}ms'.format(randint(0, 100))}])
-        elif random_mode == 0:
-            # Equal delay
-            info_log('Equal delay')
-            for i in range(num_of_switches):
-                for j in range(i + 1, num_of_switches):
-                    sx1 = 's' + str(i + 1)
-                    sx2 = 's' + str(j + 1)
-                    links.append([sx1, sx2, {'delay': '10ms'}])
         else:
-            # Worst case
-            info_log('Worst case')
-            links.append(['s1', 's2', {'delay': '100ms'}])
-            links.append(['s1', 's3', {'delay': '10ms'}])
-            links.append(['s1', 's4', {'delay': '50ms'}])
-            links.append(['s2', 's3', {'delay': '50ms'}])
-            links.append(['s2', 's4', {'delay': '10ms'}])
-            links.append(['s3', 's4', {'delay': '10ms'}])
+            delays = np.full(len(links), 10)
+            info_log('Equal delay')
+    info_log('{}: {} switches, {} links'.format(topology, num_of_switches, len(links)))
+
+    # Host info, switch info and links between hosts and switches first, so that port 1 of each switch is its host
+    data['program'] = p4_file_name
+    files = dict()
+    num_of_ports = np.bincount(links.ravel(), minlength=num_of_switches) + 1
+    mc_nodes = dict()
+    for i in range(num_of_switches):
+        hx, sx = 'h' + str(i + 1), 's' + str(i + 1)
+        data['topology']['hosts'][hx] = {}
+        data['topology']['switches'][sx] = {'cli_input': './runtime_commands/' + sx + '-commands.txt',
+                                            'program': p4_file_name}
+        data['topology']['links'].append([hx, sx])
+
+        # sx-commands.txt
+        ports = num_of_ports[i]
+        if ports not in mc_nodes:
+            mc_nodes[ports] = ' '.join([str(j) for j in range(ports + 1)])
+        files['runtime_commands/' + sx + '-commands.txt'] = SWITCH_COMMANDS.format(mc_nodes[ports], i + 1)
+
+    # Links between switches, serialized from pre-rendered pieces since a mesh has O(n^2) of them
+    host_links = json.dumps(data['topology']['links'])[1:-1]
+    data['topology']['links'] = LINKS_PLACEHOLDER
+    first = ['["s{}", '.format(i + 1) for i in range(num_of_switches)]
+    second = ['"s{}", '.format(j + 1) for j in range(num_of_switches)]
+    delay_text = {delay: json.dumps({'delay': '{}ms'.format(delay)}) + ']' for delay in np.unique(delays).tolist()}
+    switch_links = ', '.join([first[i] + second[j] + delay_text[delay]
+                              for i, j, delay in zip(links[:, 0].tolist(), links[:, 1].tolist(), delays.tolist())])
+    files['p4app.json'] = json.dumps(data).replace(json.dumps(LINKS_PLACEHOLDER),
+                                                   '[' + ', '.join(filter(None, [host_links, switch_links])) + ']')
+
+    write_files(files, out_dir)
+
+
+def generate_links(topology: str, num_of_switches: int, rand: np.random.Generator, degree: int,
+                   probability: float) -> np.ndarray:
+    """
+    Generate the links between switches
+    :param topology: shape of the links, one of TOPOLOGIES
+    :param num_of_switches: number of switches
+    :param rand: random generator
+    :param degree: degree of each switch of a random regular graph
+    :param probability: probability of each link of an Erdos-Renyi graph
+    :return: (links, 2) switch indices of each link, the smaller one first
+    """
+    if topology == 'mesh':
+        links = np.stack(np.triu_indices(num_of_switches, 1), axis=1)
+    elif topology == 'ring':
+        switch = np.arange(num_of_switches)
+        links = np.sort(np.stack([switch, (switch + 1) % num_of_switches], axis=1), axis=1)
+    elif topology == 'grid':
+        # Row by row, the last row may be partial
+        num_of_cols = int(ceil(num_of_switches / int(sqrt(num_of_switches))))
+        switch = np.arange(num_of_switches)
+        right = switch[((switch + 1) % num_of_cols != 0) & (switch + 1 < num_of_switches)]
+        down = switch[switch + num_of_cols < num_of_switches]
+        links = np.concatenate([np.stack([right, right + 1], axis=1), np.stack([down, down + num_of_cols], axis=1)])
+    elif topology == 'random':
+        pairs = np.stack(np.triu_indices(num_of_switches, 1), axis=1)
+        links = pairs[rand.random(len(pairs)) < probability]
+    elif topology == 'regular':
+        links = random_regular_links(num_of_switches, degree, rand)
+    elif topology == 'fattree':
+        links = fat_tree_links(num_of_switches)
+    else:
+        raise ValueError('Unknown topology {}, it should be one of {}.'.format(topology, ', '.join(TOPOLOGIES)))
 
-        with open('p4app.json', 'w') as out_file:
-            json.dump(data, out_file)
+    return links[np.lexsort((links[:, 1], links[:, 0]))]
+
+
+def random_regular_links(num_of_switches: int, degree: int, rand: np.random.Generator) -> np.ndarray:
+    """
+    Generate a random regular graph: pair the port stubs at random, then remove self-loops and parallel links by
+    swapping the ends of random links, which keeps every degree
+    :param num_of_switches: number of switches
+    :param degree: degree of each switch
+    :param rand: random generator
+    :return: (links, 2) switch indices of each link, the smaller one first
+    """
+    if not 0 <= degree < num_of_switches or num_of_switches * degree % 2:
+        raise ValueError('No {}-regular graph of {} switches, the degree should be less than the number of switches '
+                         'and their product should be even.'.format(degree, num_of_switches))
+    if degree > (num_of_switches - 1) / 2:
+        # Dense graphs leave no room for swaps, take the complement of a sparse one instead
+        linked = np.zeros((num_of_switches, num_of_switches), dtype=bool)
+        sparse = random_regular_links(num_of_switches, num_of_switches - 1 - degree, rand)
+        linked[sparse[:, 0], sparse[:, 1]] = True
+        pairs = np.stack(np.triu_indices(num_of_switches, 1), axis=1)
+        return pairs[~linked[pairs[:, 0], pairs[:, 1]]]
+
+    links = rand.permutation(np.repeat(np.arange(num_of_switches), degree)).reshape(-1, 2)
+    links = np.sort(links, axis=1).tolist()
+    count = Counter(map(tuple, links))
+
+    def invalid(link: List[int]) -> bool:
+        return link[0] == link[1] or count[tuple(link)] > 1
+
+    for _ in range(1000):
+        bad = [idx for idx, link in enumerate(links) if invalid(link)]
+        if not bad:
+            return np.array(links, dtype=np.int64).reshape(-1, 2)
+        for idx, other in zip(bad, rand.integers(0, len(links), len(bad)).tolist()):
+            (u, v), (x, y) = links[idx], links[other]
+            if other == idx or not invalid(links[idx]) or u == x or v == y or count[(min(u, x), max(u, x))] or \
+                    count[(min(v, y), max(v, y))]:
+                continue
+            count[(u, v)] -= 1
+            count[(x, y)] -= 1
+            links[idx], links[other] = sorted([u, x]), sorted([v, y])
+            count[tuple(links[idx])] += 1
+            count[tuple(links[other])] += 1
+
+    raise ValueError('Cannot generate a {}-regular graph of {} switches.'.format(degree, num_of_switches))
+
+
+def fat_tree_links(num_of_switches: int) -> np.ndarray:
+    """
+    Generate a k-ary fat-tree: (k / 2)^2 core switches first, then the k / 2 aggregation and k / 2 edge switches of
+    each of the k pods
+    :param num_of_switches: number of switches, 5 * k^2 / 4 for an even k
+    :return: (links, 2) switch indices of each link, the smaller one first
+    """
+    arity = int(round(sqrt(num_of_switches * 4 / 5)))
+    if arity % 2 or 5 * arity * arity // 4 != num_of_switches:
+        raise ValueError('A fat-tree has 5 * k^2 / 4 switches for an even k, e.g. 20, 45, 80, not {}.'
+                         .format(num_of_switches))
+
+    half = arity // 2
+    num_of_cores = half * half
+    links = []
+    for pod in range(arity):
+        aggregation = num_of_cores + pod * arity
+        edge = aggregation + half
+        for i in range(half):
+            links.extend([(i * half + j, aggregation + i) for j in range(half)])
+            links.extend([(aggregation + i, edge + j) for j in range(half)])
+
+    return np.array(links, dtype=np.int64)
+
+
+def write_files(files: Dict[str, str], out_dir: str) -> None:
+    """
+    Write all generated files in one pass
+    :param files: path relative to out_dir -> content
+    :param out_dir: output directory
+    :return: None
+    """
+    for directory in {os.path.dirname(os.path.join(out_dir, path)) for path in files}:
+        os.makedirs(directory, exist_ok=True)
+    for path, content in files.items():
+        with open(os.path.join(out_dir, path), 'w') as out_file:
+            out_file.write(content)
 
 
 def check_version_range(value: str) -> int:
@@ -168,6 +289,13 @@ def parse_arguments() -> Namespace:
     parser.add_argument('-v', '--version', help='Version of the P4 architecture', type=check_version_range, default=0)
     parser.add_argument('-r', '--random', help='Randomize or not', type=check_random_range, default=0)
     parser.add_argument('-n', '--number', help='Number of switches', type=check_number_range, default=3)
+    parser.add_argument('-t', '--topology', help='Shape of the links between switches', type=str, choices=TOPOLOGIES,
+                        default='mesh')
+    parser.add_argument('-k', '--degree', help='Degree of each switch of a random regular graph', type=int, default=3)
+    parser.add_argument('-p', '--probability', help='Probability of each link of an Erdos-Renyi graph', type=float,
+                        default=0.1)
+    parser.add_argument('-s', '--seed', help='Random seed (default: different every time)', type=int, default=None)
+    parser.add_argument('-o', '--output', help='Directory of p4app.json and runtime_commands', type=str, default='.')
 
     return parser.parse_args()
 
@@ -175,7 +303,8 @@ def parse_arguments() -> Namespace:
 if __name__ == '__main__':
     """
     Main function
-        command: python3 randomizer.py [-v (0-1)] [-r (0-2)] [-n (>= 3)]
+        command: python3 randomizer.py [-v (0-1)] [-r (0-2)] [-n (>= 3)] [-t topology] [-k degree] [-p probability]
+                 [-s seed] [-o output]
     """
     # Parse arguments
     args = parse_arguments()
@@ -185,6 +314,6 @@ if __name__ == '__main__':
 
     # Randomize p4app.json
     try:
-        randomize(ver, ran, num)
+        randomize(ver, ran, num, args.topology, args.seed, args.degree, args.probability, args.output)
     except ValueError as e:
         error_log(str(e))
@@ -0,0 +1,313 @@
+import sys
+import os
+import json
+import hashlib
+import html
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, sqrt
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional
+from matplotlib.figure import Figure
+from pandas import DataFrame
+from aggregator import RESULT_COLUMNS, Totals, get_host, get_serial_number, list_result_files, load_summaries, \
+    merge_summary_totals, parse_result_file, plot_aggregation, plot_first_result, plot_pkt_in_each_round, \
+    stream_summaries
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+import metrics  # noqa: E402
+from result_log import LOG_SUFFIX, routes_path  # noqa: E402
+
+
+# Bump to render every host again after changing how figures are drawn
+REPORT_VERSION = 1
+MANIFEST = 'report.json'
+INDEX = 'index.html'
+OVERVIEW = 'packets_in_each_test'
+
+
+class HostJob(NamedTuple):
+    """
+    Everything the figures of one host are drawn from
+    """
+    host: str
+    first_path: Optional[str]
+    route_count: Dict[str, int]
+    pkt_in_each_test: Dict[str, int]
+    num_of_pkt: int
+    num_of_rounds: int
+    bin_width: float
+
+
+def render_report(dir_name: str, output: str, num_of_pkt: int, num_of_rounds: int, num_of_workers: int,
+                  rebuild: bool, bin_width: float, chunk_size: int, formats: List[str]) -> None:
+    """
+    Render the figures of every host without display and write an index page. Hosts whose inputs have the same content
+    hash as in the previous report are not rendered again.
+    :param dir_name: name of the directory of the results
+    :param output: name of the directory of the report
+    :param num_of_pkt: number of packets sent in each round
+    :param num_of_rounds: number of rounds in each test
+    :param num_of_workers: number of processes parsing results and rendering figures
+    :param rebuild: whether to ignore the aggregation cache and the previous report
+    :param bin_width: width of a time bin of the route timelines in seconds
+    :param chunk_size: stream the results in chunks of this many rows without cache (0 to load whole files)
+    :param formats: image formats, e.g. png and svg
+    :return: None
+    """
+    if chunk_size > 0:
+        with metrics.registry.timer('parse_seconds'):
+            totals = stream_summaries(dir_name, num_of_workers, chunk_size)
+        names = [file.name for file in list_result_files(dir_name)]
+    else:
+        with metrics.registry.timer('parse_seconds'):
+            summaries = load_summaries(dir_name, num_of_workers, rebuild)
+        with metrics.registry.timer('group_seconds'):
+            totals = merge_summary_totals(summaries)
+        names = list(summaries)
+    first_path = {get_host(name): os.path.join(dir_name, name) for name in names if get_serial_number(name) == '0'}
+    hosts = sorted(totals.pkt_in_each_test, key=lambda key: (len(key), key))
+    jobs = [HostJob(host, first_path.get(host), totals.route_count[host], totals.pkt_in_each_test[host], num_of_pkt,
+                    num_of_rounds, bin_width) for host in hosts]
+
+    # Only render what changed since the previous report
+    os.makedirs(output, exist_ok=True)
+    previous = dict() if rebuild else load_manifest(output)
+    digests = {job.host: job_digest(job) for job in jobs}
+    digests[OVERVIEW] = overview_digest(totals.pkt_in_each_test)
+    changed = [job for job in jobs
+               if not up_to_date(output, previous, job.host, digests[job.host], figure_names(job.host, job), formats)]
+
+    start = perf_counter()
+    rendered = len(changed)
+    if num_of_workers > 1 and len(changed) > 1:
+        with ProcessPoolExecutor(max_workers=num_of_workers) as executor:
+            list(executor.map(render_host, changed, [output] * len(changed), [formats] * len(changed)))
+    else:
+        for job in changed:
+            render_host(job, output, formats)
+    if not up_to_date(output, previous, OVERVIEW, digests[OVERVIEW], [OVERVIEW], formats):
+        render_overview(totals.pkt_in_each_test, hosts, output, formats)
+        rendered += 1
+
+    metrics.registry.observe('render_seconds', perf_counter() - start)
+    metrics.registry.inc('figure_sets_rendered', rendered)
+    metrics.registry.inc('figure_sets_skipped', len(jobs) + 1 - rendered)
+
+    write_manifest(output, digests)
+    write_index(output, dir_name, jobs, totals, formats)
+    info_log(f'Rendered {rendered} of {len(jobs) + 1} figure set(s) in {perf_counter() - start:.2f} s, '
+             f'report in {os.path.join(output, INDEX)}')
+    for line in metrics.phase_summary():
+        info_log(line)
+
+
+def job_digest(job: HostJob) -> str:
+    """
+    Hash the content the figures of a host are drawn from, including its first result file
+    :param job: inputs of the host
+    :return: hex digest
+    """
+    digest = hashlib.sha256(json.dumps([REPORT_VERSION, job.host, job.route_count, job.pkt_in_each_test,
+                                        job.num_of_pkt, job.num_of_rounds, job.bin_width], sort_keys=True).encode())
+    if job.first_path is not None:
+        paths = [job.first_path, routes_path(job.first_path)] if job.first_path.endswith(LOG_SUFFIX) \
+            else [job.first_path]
+        for path in paths:
+            with open(path, 'rb') as in_file:
+                digest.update(in_file.read())
+
+    return digest.hexdigest()
+
+
+def overview_digest(pkt_in_each_test: Dict[str, Dict[str, int]]) -> str:
+    """
+    Hash the content the overview is drawn from
+    :param pkt_in_each_test: number of received packets on each host in each test
+    :return: hex digest
+    """
+    return hashlib.sha256(json.dumps([REPORT_VERSION, pkt_in_each_test], sort_keys=True).encode()).hexdigest()
+
+
+def figure_names(host: str, job: HostJob) -> List[str]:
+    """
+    Get the names of the figures of a host, without extension
+    :param host: host
+    :param job: inputs of the host, the first test is left out if the host has none
+    :return: names of the figures
+    """
+    return ([f'{host}_first'] if job.first_path is not None else []) + [f'{host}_aggregation']
+
+
+def up_to_date(output: str, previous: Dict[str, str], key: str, digest: str, names: List[str],
+               formats: List[str]) -> bool:
+    """
+    Check whether figures were rendered from the same content and still exist
+    :param output: name of the directory of the report
+    :param previous: host (or OVERVIEW) -> digest of the previous report
+    :param key: host, or OVERVIEW
+    :param digest: digest of the current content
+    :param names: names of the figures, without extension
+    :param formats: image formats
+    :return: whether rendering can be skipped
+    """
+    return previous.get(key) == digest and \
+        all(os.path.exists(os.path.join(output, f'{name}.{extension}')) for name in names for extension in formats)
+
+
+def render_host(job: HostJob, output: str, formats: List[str]) -> None:
+    """
+    Render the figures of one host with the Agg canvas of matplotlib, no display is needed
+    :param job: inputs of the host
+    :param output: name of the directory of the report
+    :param formats: image formats
+    :return: None
+    """
+    if job.first_path is not None:
+        fig = Figure(figsize=(12, 4.8))
+        plot_first_result(fig, DataFrame(parse_result_file(job.first_path), columns=RESULT_COLUMNS), job.host,
+                          job.bin_width)
+        save(fig, os.path.join(output, f'{job.host}_first'), formats)
+
+    fig = Figure()
+    plot_aggregation(fig, job.route_count, job.pkt_in_each_test, job.host, job.num_of_pkt, job.num_of_rounds)
+    save(fig, os.path.join(output, f'{job.host}_aggregation'), formats)
+
+
+def render_overview(pkt_in_each_test: Dict[str, Dict[str, int]], hosts: List[str], output: str,
+                    formats: List[str]) -> None:
+    """
+    Render the number of received packets of every host in each test in one grid figure
+    :param pkt_in_each_test: number of received packets on each host in each test
+    :param hosts: hosts in display order
+    :param output: name of the directory of the report
+    :param formats: image formats
+    :return: None
+    """
+    num_of_cols = max(ceil(sqrt(len(hosts))), 1)
+    num_of_rows = max(ceil(len(hosts) / num_of_cols), 1)
+    fig = Figure(figsize=(4 * num_of_cols, 3 * num_of_rows))
+    plot_pkt_in_each_round(fig, pkt_in_each_test, num_of_rows, num_of_cols, hosts)
+    save(fig, os.path.join(output, OVERVIEW), formats)
+
+
+def save(fig: Figure, path: str, formats: List[str]) -> None:
+    """
+    Save a figure in every format
+    :param fig: figure
+    :param path: path of the image without extension
+    :param formats: image formats
+    :return: None
+    """
+    for extension in formats:
+        fig.savefig(f'{path}.{extension}')
+
+
+def load_manifest(output: str) -> Dict[str, str]:
+    """
+    Load the digests of the previous report
+    :param output: name of the directory of the report
+    :return: host -> digest, empty if there is no previous report
+    """
+    try:
+        with open(os.path.join(output, MANIFEST)) as in_file:
+            manifest = json.load(in_file)
+    except (OSError, ValueError):
+        return dict()
+
+    return manifest.get('digests', dict()) if manifest.get('version') == REPORT_VERSION else dict()
+
+
+def write_manifest(output: str, digests: Dict[str, str]) -> None:
+    """
+    Write the digests of the report atomically
+    :param output: name of the directory of the report
+    :param digests: host -> digest
+    :return: None
+    """
+    path = os.path.join(output, MANIFEST)
+    with open(path + '.tmp', 'w') as out_file:
+        json.dump({'version': REPORT_VERSION, 'digests': digests}, out_file)
+    os.replace(path + '.tmp', path)
+
+
+def write_index(output: str, dir_name: str, jobs: List[HostJob], totals: Totals, formats: List[str]) -> None:
+    """
+    Write the index page showing the figures of every host
+    :param output: name of the directory of the report
+    :param dir_name: name of the directory of the results
+    :param jobs: inputs of each host
+    :param totals: totals of each host
+    :param formats: image formats, the first one is shown
+    :return: None
+    """
+    extension = formats[0]
+    sections = [f'<h2>Received packets in each test</h2>\n<img src="{OVERVIEW}.{extension}" alt="{OVERVIEW}">']
+    for job in jobs:
+        time_range = totals.time_range.get(job.host)
+        summary = f'{sum(job.pkt_in_each_test.values())} packets in {len(job.pkt_in_each_test)} test(s), ' \
+                  f'{len(job.route_count)} route(s)' + \
+                  (f', time {time_range[0]:.6f} s to {time_range[1]:.6f} s' if time_range else '')
+        images = ''.join(f'<img src="{html.escape(name)}.{extension}" alt="{html.escape(name)}">'
+                         for name in figure_names(job.host, job))
+        sections.append(f'<h2 id="{html.escape(job.host)}">{html.escape(job.host)}</h2>\n'
+                        f'<p>{html.escape(summary)}</p>\n{images}')
+    links = ' '.join(f'<a href="#{html.escape(job.host)}">{html.escape(job.host)}</a>' for job in jobs)
+
+    with open(os.path.join(output, INDEX), 'w') as out_file:
+        out_file.write(f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+                       f'<title>Report of {html.escape(dir_name)}</title>\n'
+                       f'<style>img {{max-width: 48%; vertical-align: top;}}</style>\n</head>\n<body>\n'
+                       f'<h1>Report of {html.escape(dir_name)}</h1>\n<p>{links}</p>\n' +
+                       '\n'.join(sections) + '\n</body>\n</html>\n')
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-d', '--directory', help='Name of the directory', type=str, default='results')
+    parser.add_argument('-o', '--output', help='Name of the directory of the report (default: <directory>_report)',
+                        type=str, default=None)
+    parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
+    parser.add_argument('-r', '--round', help='Number of rounds in each test', type=int, default=2)
+    parser.add_argument('-w', '--workers', help='Number of processes parsing results and rendering figures', type=int,
+                        default=os.cpu_count())
+    parser.add_argument('-bw', '--bin-width', help='Width of a time bin of the route timelines in milliseconds',
+                        type=float, default=1)
+    parser.add_argument('-rb', '--rebuild', help='Ignore the aggregation cache and render every host again',
+                        action='store_true')
+    parser.add_argument('-cs', '--chunk-size', help='Stream the results in chunks of this many rows without cache '
+                                                    '(0 to load whole files)', type=int, default=0)
+    parser.add_argument('-f', '--formats', help='Image formats', type=str, nargs='+', choices=['png', 'svg'],
+                        default=['png'])
+    metrics.add_arguments(parser)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 report.py [-d name_of_the_directory] [-o output] [-c num_of_packets] [-r num_of_rounds]
+                 [-w num_of_workers] [-bw bin_width] [-rb] [-cs chunk_size] [-f formats] [-mt metrics]
+                 [-mi metrics_interval] [-pf profile]
+    """
+    args = parse_arguments()
+    metrics.setup('report', args)
+    directory = args.directory.rstrip('/')
+    with metrics.profiled(args.profile):
+        render_report(directory, args.output or directory + '_report', args.count, args.round, args.workers,
+                      args.rebuild, args.bin_width / 1000, args.chunk_size, args.formats)
@@ -0,0 +1,458 @@
+import sys
+import os
+import json
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from aggregator import CodedResults, list_result_files, load_coded_results, set_window_title
+from predictor import format_table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from result_log import encode_routes  # noqa: E402
+from routes import route_name  # noqa: E402
+
+# Route index next to the results directory, e.g. results.index.npz
+INDEX_SUFFIX = '.index.npz'
+INDEX_VERSION = 1
+
+
+class RouteIndex(NamedTuple):
+    """
+    Routes observed in a results directory.
+    Cells count the packets of each (route, host, test), sorted in this order, and route_start[r] is the first cell of
+    route r. first counts the first packet each host received in a test.
+    The prefix trie holds one node per distinct prefix of the routes, numbered in preorder: the routes sorted by their
+    IDs (a prefix before its extensions) are order, rank_node[k] is the first node added by the route of rank k and
+    rank_lcp[k] the length of the prefix it shares with the route of rank k - 1. Node n is the prefix of length
+    node_depth[n] + 1 of the routes of ranks node_first[n] to node_last[n].
+    The inverted indexes list the routes through each switch (switch_routes[switch_start[s]:switch_start[s + 1]]) and
+    each link a -> b (link_routes[link_start[i]:link_start[i + 1]] for link_key[i] == a * num_of_ids + b).
+    """
+    hosts: np.ndarray
+    route_ids: np.ndarray
+    route_len: np.ndarray
+    route_start: np.ndarray
+    cell_host: np.ndarray
+    cell_test: np.ndarray
+    cell_count: np.ndarray
+    cell_first: np.ndarray
+    order: np.ndarray
+    rank_node: np.ndarray
+    rank_lcp: np.ndarray
+    node_switch: np.ndarray
+    node_parent: np.ndarray
+    node_depth: np.ndarray
+    node_first: np.ndarray
+    node_last: np.ndarray
+    switch_start: np.ndarray
+    switch_routes: np.ndarray
+    link_key: np.ndarray
+    link_start: np.ndarray
+    link_routes: np.ndarray
+
+    @property
+    def num_of_ids(self) -> int:
+        return len(self.switch_start) - 1
+
+
+class Postings(NamedTuple):
+    """
+    Packets of the routes matching a query, per host and test
+    """
+    routes: np.ndarray
+    host: np.ndarray
+    test_no: np.ndarray
+    count: np.ndarray
+    first: np.ndarray
+
+
+def build_index(coded: CodedResults) -> RouteIndex:
+    """
+    Build the route index of coded results. Every packet is counted in one np.unique pass over its cell, everything
+    else only depends on the distinct routes.
+    :param coded: coded results, each file in receive order
+    :return: route index
+    """
+    records = encode_routes(coded.routes.ids)
+    route_ids, route_len = records['ids'].astype(np.uint32), records['len'].astype(np.uint8)
+    num_of_routes, num_of_hosts = len(route_len), len(coded.hosts)
+    num_of_tests = int(coded.test_no.max(initial=0)) + 1
+
+    # Packets of each (route, host, test), the first packet of each file starts a new (host, test)
+    keys = (coded.route_code.astype(np.int64) * num_of_hosts + coded.host_code) * num_of_tests + coded.test_no
+    first = np.r_[True, (coded.host_code[1:] != coded.host_code[:-1]) | (coded.test_no[1:] != coded.test_no[:-1])] \
+        if len(keys) else np.empty(0, dtype=bool)
+    cells, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    cell_first = np.bincount(inverse.ravel(), weights=first, minlength=len(cells)).astype(np.int64)
+    cell_route, rest = np.divmod(cells, num_of_hosts * num_of_tests)
+    cell_host, cell_test = np.divmod(rest, num_of_tests)
+
+    # Sort the routes, IDs + 1 with zeros behind the end so that a prefix comes before its extensions
+    depth = np.arange(route_ids.shape[1])
+    valid = depth < route_len[:, None]
+    sort_key = np.where(valid, route_ids.astype(np.int64) + 1, 0)
+    order = np.lexsort(sort_key.T[::-1]) if num_of_routes else np.empty(0, dtype=np.int64)
+    sorted_key, sorted_valid = sort_key[order], valid[order]
+    same = np.cumprod(sorted_key[1:] == sorted_key[:-1], axis=1).sum(axis=1)
+    rank_lcp = np.r_[0, np.minimum(same, np.minimum(route_len[order][1:], route_len[order][:-1]))].astype(np.int64) \
+        if num_of_routes else np.empty(0, dtype=np.int64)
+
+    # Each route adds the nodes of the depths beyond the prefix it shares with the previous one, in preorder
+    added = sorted_valid & (depth >= rank_lcp[:, None])
+    node_of = np.full(added.shape, -1, dtype=np.int64)
+    node_of[added] = np.arange(int(added.sum()))
+    last_rank = np.maximum.accumulate(np.where(added, np.arange(num_of_routes)[:, None], 0), axis=0)
+    path = np.where(sorted_valid, node_of[last_rank, depth], -1)
+    node_rank, node_depth = np.nonzero(added)
+    node_last = np.zeros(len(node_rank), dtype=np.int64)
+    ranks = np.broadcast_to(np.arange(num_of_routes)[:, None], path.shape)
+    np.maximum.at(node_last, path[sorted_valid], ranks[sorted_valid])
+
+    # Inverted indexes of the switches and links, each (key, route) pair once
+    num_of_ids = int(route_ids.max(initial=0)) + 1
+    route_of = np.broadcast_to(np.arange(num_of_routes)[:, None], route_ids.shape)
+    switch_pairs = np.unique(route_ids[valid].astype(np.int64) * num_of_routes + route_of[valid])
+    switch_of, switch_routes = np.divmod(switch_pairs, max(num_of_routes, 1))
+    hop = valid[:, 1:]
+    link_pairs = np.unique((route_ids[:, :-1][hop].astype(np.int64) * num_of_ids + route_ids[:, 1:][hop]) *
+                           num_of_routes + route_of[:, 1:][hop])
+    link_of, link_routes = np.divmod(link_pairs, max(num_of_routes, 1))
+    link_key, link_start = np.unique(link_of, return_index=True)
+
+    return RouteIndex(hosts=np.array(coded.hosts, dtype=str),
+                      route_ids=route_ids,
+                      route_len=route_len,
+                      route_start=np.searchsorted(cell_route, np.arange(num_of_routes + 1)),
+                      cell_host=cell_host.astype(np.uint16),
+                      cell_test=cell_test.astype(np.uint32),
+                      cell_count=counts.astype(np.int64),
+                      cell_first=cell_first,
+                      order=order.astype(np.int64),
+                      rank_node=np.searchsorted(node_rank, np.arange(num_of_routes)),
+                      rank_lcp=rank_lcp,
+                      node_switch=route_ids[order][node_rank, node_depth],
+                      node_parent=np.where(node_depth > 0, path[node_rank, np.maximum(node_depth - 1, 0)], -1),
+                      node_depth=node_depth.astype(np.uint8),
+                      node_first=node_rank.astype(np.int64),
+                      node_last=node_last,
+                      switch_start=np.searchsorted(switch_of, np.arange(num_of_ids + 1)),
+                      switch_routes=switch_routes,
+                      link_key=link_key,
+                      link_start=np.r_[link_start, len(link_routes)].astype(np.int64),
+                      link_routes=link_routes)
+
+
+def get_index_path(dir_name: str) -> str:
+    """
+    Get the path of the route index, which is next to the given directory
+    :param dir_name: name of the given directory
+    :return: path of the index file
+    """
+    return os.path.normpath(dir_name) + INDEX_SUFFIX
+
+
+def get_signature(dir_name: str) -> str:
+    """
+    Identify the result files of a directory by name, size and modification time
+    :param dir_name: name of the given directory
+    :return: signature of the files
+    """
+    files = sorted((file.name, file.stat().st_size, file.stat().st_mtime_ns) for file in list_result_files(dir_name))
+
+    return json.dumps([INDEX_VERSION] + files)
+
+
+def load_index(dir_name: str, num_of_workers: int, rebuild: bool = False) -> RouteIndex:
+    """
+    Load the route index of a directory, building it again if a result file is new or changed
+    :param dir_name: name of the given directory
+    :param num_of_workers: number of processes parsing csv files
+    :param rebuild: whether to ignore the index on disk
+    :return: route index
+    """
+    index_path = get_index_path(dir_name)
+    signature = get_signature(dir_name)
+    if not rebuild and os.path.exists(index_path):
+        try:
+            with np.load(index_path) as saved:
+                if str(saved['signature']) == signature:
+                    return RouteIndex(*[saved[field] for field in RouteIndex._fields])
+        except (OSError, ValueError, KeyError):
+            info_log(f'Ignore unreadable route index {index_path}')
+
+    index = build_index(load_coded_results(dir_name, num_of_workers))
+    temp_path = f'{index_path}.{os.getpid()}.tmp.npz'
+    np.savez(temp_path, signature=np.array(signature), **index._asdict())
+    os.replace(temp_path, index_path)
+
+    return index
+
+
+def find_prefix(index: RouteIndex, prefix: Sequence[int]) -> Optional[int]:
+    """
+    Find the trie node of a prefix by binary search in the sorted routes, one column per switch
+    :param index: route index
+    :param prefix: IDs of the first switches in the traversal order
+    :return: node of the prefix, None if no route starts with it
+    """
+    low, high = 0, len(index.order)
+    for depth, switch in enumerate(prefix):
+        column = np.where(depth < index.route_len[index.order[low:high]],
+                          index.route_ids[index.order[low:high], depth].astype(np.int64) + 1, 0)
+        low, high = low + np.searchsorted(column, switch + 1), low + np.searchsorted(column, switch + 1, 'right')
+        if low == high:
+            return None
+
+    return int(index.rank_node[low] + len(prefix) - 1 - index.rank_lcp[low]) if len(prefix) else None
+
+
+def postings(index: RouteIndex, routes: np.ndarray) -> Postings:
+    """
+    Gather the packets of some routes per host and test
+    :param index: route index
+    :param routes: route codes
+    :return: packets of the routes
+    """
+    starts = index.route_start[routes]
+    lengths = index.route_start[routes + 1] - starts
+    cells = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(int(lengths.sum()))
+    num_of_tests = int(index.cell_test.max(initial=0)) + 1
+    distinct, inverse = np.unique(index.cell_host[cells].astype(np.int64) * num_of_tests + index.cell_test[cells],
+                                  return_inverse=True)
+    host, test_no = np.divmod(distinct, num_of_tests)
+
+    return Postings(routes=np.asarray(routes),
+                    host=host,
+                    test_no=test_no,
+                    count=np.bincount(inverse.ravel(), weights=index.cell_count[cells], minlength=len(distinct)),
+                    first=np.bincount(inverse.ravel(), weights=index.cell_first[cells], minlength=len(distinct)))
+
+
+def routes_through_switch(index: RouteIndex, switch: int) -> np.ndarray:
+    """
+    Get the routes through a switch
+    :param index: route index
+    :param switch: ID of the switch
+    :return: route codes
+    """
+    if not 0 <= switch < index.num_of_ids:
+        return np.empty(0, dtype=np.int64)
+
+    return index.switch_routes[index.switch_start[switch]:index.switch_start[switch + 1]]
+
+
+def routes_through_link(index: RouteIndex, source: int, target: int) -> np.ndarray:
+    """
+    Get the routes through the link from one switch to another
+    :param index: route index
+    :param source: ID of the switch sending on the link
+    :param target: ID of the switch receiving from the link
+    :return: route codes
+    """
+    position = np.searchsorted(index.link_key, source * index.num_of_ids + target)
+    if not 0 <= source < index.num_of_ids or position == len(index.link_key) or \
+            index.link_key[position] != source * index.num_of_ids + target:
+        return np.empty(0, dtype=np.int64)
+
+    return index.link_routes[index.link_start[position]:index.link_start[position + 1]]
+
+
+def routes_with_prefix(index: RouteIndex, prefix: Sequence[int]) -> np.ndarray:
+    """
+    Get the routes starting with a prefix
+    :param index: route index
+    :param prefix: IDs of the first switches in the traversal order
+    :return: route codes
+    """
+    node = find_prefix(index, prefix)
+    if node is None:
+        return np.empty(0, dtype=np.int64)
+
+    return index.order[index.node_first[node]:index.node_last[node] + 1]
+
+
+def link_load(index: RouteIndex, first: bool = False, num_of_ids: int = 0,
+              hosts: Optional[Sequence[str]] = None) -> np.ndarray:
+    """
+    Count the packets that crossed each link
+    :param index: route index
+    :param first: whether to count the first packet each host received in a test instead of every packet
+    :param num_of_ids: size of the matrix, at least the highest switch ID + 1
+    :param hosts: only count the packets received by these hosts, all of them if not given
+    :return: (num_of_ids, num_of_ids) matrix of the packets sent from switch a to switch b at [a, b]
+    """
+    weights = index.cell_first if first else index.cell_count
+    if hosts is not None:
+        weights = np.where(np.isin(index.hosts[index.cell_host], list(hosts)), weights, 0)
+    num_of_routes, num_of_links = len(index.route_len), len(index.link_key)
+    route_weight = np.bincount(np.repeat(np.arange(num_of_routes), np.diff(index.route_start)), weights=weights,
+                               minlength=num_of_routes)
+    link_weight = np.bincount(np.repeat(np.arange(num_of_links), np.diff(index.link_start)),
+                              weights=route_weight[index.link_routes], minlength=num_of_links)
+    size = max(num_of_ids, index.num_of_ids)
+    source, target = np.divmod(index.link_key, index.num_of_ids)
+    load = np.zeros((size, size), dtype=np.int64)
+    load[source, target] = link_weight
+
+    return load
+
+
+def host_table(index: RouteIndex, found: Postings) -> List[List[str]]:
+    """
+    Summarize the packets of a query per host
+    :param index: route index
+    :param found: packets of the routes matching the query
+    :return: rows of host, tests, packets and first packets
+    """
+    rows = []
+    for host in np.unique(found.host):
+        selected = found.host == host
+        rows.append([str(index.hosts[host]), str(int(selected.sum())), str(int(found.count[selected].sum())),
+                     str(int(found.first[selected].sum()))])
+
+    return rows
+
+
+def top_links(load: np.ndarray, num_of_links: int) -> List[List[str]]:
+    """
+    List the most loaded links
+    :param load: link load matrix
+    :param num_of_links: number of links
+    :return: rows of link, packets and share of all packets on links
+    """
+    total = load.sum()
+    rows = []
+    for cell in np.argsort(load, axis=None, kind='stable')[::-1][:num_of_links]:
+        source, target = np.divmod(int(cell), load.shape[1])
+        if load[source, target]:
+            rows.append([f's{source} -> s{target}', str(int(load[source, target])),
+                         f'{load[source, target] / total:.1%}'])
+
+    return rows
+
+
+def plot_loads(loads: Dict[str, np.ndarray], first: bool) -> None:
+    """
+    Draw the link load matrix of each directory as a heatmap, and the difference of the first two in shares of their
+    totals
+    :param loads: directory -> link load matrix of the same size
+    :param first: whether the loads count the first packet of each test
+    :return: None
+    """
+    import matplotlib.pyplot as plt
+
+    names = list(loads)
+    panels = [(name, loads[name], 'viridis') for name in names]
+    if len(names) > 1:
+        shares = [loads[name] / max(loads[name].sum(), 1) for name in names[:2]]
+        panels.append((f'{names[1]} - {names[0]} (share)', shares[1] - shares[0], 'coolwarm'))
+    fig, axes = plt.subplots(1, len(panels), squeeze=False, figsize=(6 * len(panels), 5))
+    for axis, (title, matrix, colormap) in zip(axes[0], panels):
+        limit = np.abs(matrix).max() or 1
+        image = axis.imshow(matrix, cmap=colormap, origin='lower',
+                            vmin=-limit if colormap == 'coolwarm' else 0, vmax=limit)
+        axis.set_title(title)
+        axis.set_xlabel('To switch')
+        axis.set_ylabel('From switch')
+        fig.colorbar(image, ax=axis)
+    set_window_title(fig, 'Link load of the first packets' if first else 'Link load')
+    plt.show()
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-d', '--directories', help='Names of the result directories', type=str, nargs='+',
+                        default=['results'])
+    parser.add_argument('-w', '--workers', help='Number of processes parsing csv files', type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument('-rb', '--rebuild', help='Ignore the route index on disk and build it again',
+                        action='store_true')
+    parser.add_argument('-s', '--switch', help='List the hosts that received a route through this switch', type=int,
+                        default=None)
+    parser.add_argument('-l', '--link', help='List the hosts that received a route through this link', type=int,
+                        nargs=2, default=None)
+    parser.add_argument('-p', '--prefix', help='List the routes starting with these switches', type=int, nargs='+',
+                        default=None)
+    parser.add_argument('-t', '--top', help='Number of most loaded links to be listed', type=int, default=10)
+    parser.add_argument('-fa', '--first-arrivals', help='Count the first packet of each test on the links instead of '
+                                                        'every packet', action='store_true')
+    parser.add_argument('-o', '--output', help='npz file of the link load matrix of each directory', type=str,
+                        default=None)
+    parser.add_argument('-pl', '--plot', help='Draw the link load matrices as heatmaps', action='store_true')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 utils/route_index.py [-d directories] [-w num_of_workers] [-rb] [-s switch]
+                 [-l source target] [-p prefix] [-t top] [-fa] [-o output] [-pl]
+    """
+    args = parse_arguments()
+    indexes = dict()
+    for directory in args.directories:
+        directory = directory.rstrip('/')
+        start_time = perf_counter()
+        indexes[directory] = load_index(directory, args.workers, args.rebuild)
+        info_log(f'{directory}: {len(indexes[directory].route_len)} routes, {len(indexes[directory].node_switch)} '
+                 f'trie nodes, {len(indexes[directory].link_key)} links, {int(indexes[directory].cell_count.sum())} '
+                 f'packets in {perf_counter() - start_time:.3f} s')
+
+    size = max(route_index.num_of_ids for route_index in indexes.values())
+    loads = {directory: link_load(route_index, args.first_arrivals, size) for directory, route_index in indexes.items()}
+    what = 'first packets' if args.first_arrivals else 'packets'
+    for directory, route_index in indexes.items():
+        queries = []
+        if args.switch is not None:
+            queries.append((f'through s{args.switch}', routes_through_switch(route_index, args.switch)))
+        if args.link is not None:
+            queries.append((f'through s{args.link[0]} -> s{args.link[1]}', routes_through_link(route_index,
+                                                                                               *args.link)))
+        for title, matched in queries:
+            start_time = perf_counter()
+            rows = host_table(route_index, postings(route_index, matched))
+            info_log(f'{directory}: {len(matched)} routes {title} received by {len(rows)} hosts '
+                     f'({(perf_counter() - start_time) * 1e3:.2f} ms)')
+            for line in format_table(['Host', 'Tests', 'Packets', 'First packets'], rows):
+                info_log(line)
+        if args.prefix is not None:
+            start_time = perf_counter()
+            matched = routes_with_prefix(route_index, args.prefix)
+            found = postings(route_index, matched)
+            rows = []
+            for route in matched:
+                cells = slice(route_index.route_start[route], route_index.route_start[route + 1])
+                rows.append([route_name(route_index.route_ids[route, :route_index.route_len[route]].tolist()),
+                             str(len(np.unique(route_index.cell_host[cells]))),
+                             str(int(route_index.cell_count[cells].sum())),
+                             str(int(route_index.cell_first[cells].sum()))])
+            info_log(f'{directory}: {len(matched)} routes start with {route_name(args.prefix)}, '
+                     f'{int(found.count.sum())} packets ({(perf_counter() - start_time) * 1e3:.2f} ms)')
+            for line in format_table(['Route', 'Hosts', 'Packets', 'First packets'], rows):
+                info_log(line)
+        info_log(f'{directory}: most loaded links by {what}')
+        for line in format_table(['Link', what.capitalize(), 'Share'], top_links(loads[directory], args.top)):
+            info_log(line)
+
+    if args.output:
+        np.savez(args.output, **{os.path.basename(directory): load for directory, load in loads.items()})
+        info_log(f'Wrote the link load matrices into {args.output}')
+    if args.plot:
+        plot_loads(loads, args.first_arrivals)
@@ -1,7 +1,5 @@
 #!/bin/bash
 
-SESSION="P4ProjectTest"
-
 NUM_OF_HOSTS=$1
 NUM_OF_TESTS=$2
 P4_ARCHI_VERSION=$3
@@ -32,60 +30,12 @@ if [ ${RANDOM_VERSION} -ne 0 ] && [ ${RANDOM_VERSION} -ne 1 ] && [ ${RANDOM_VERS
   exit 1
 fi
 
-sudo tmux start-server
-
-if [ "$(sudo tmux ls | grep ${SESSION})" ]; then
-  sudo tmux kill-session -t ${SESSION}
+PYENV_ROOT="$HOME/.pyenv"
+PATH="$PYENV_ROOT/bin:$PATH"
+if command -v pyenv 1>/dev/null 2>&1; then
+  eval "$(pyenv init -)"
 fi
+pyenv activate my_p4_environment
 
-sudo tmux new-session -d -s ${SESSION} -n p4_project
-sudo tmux set remain-on-exit on
-
-for test_no in $(seq 1 ${NUM_OF_TESTS}); do
-  echo "** Test ${test_no}"
-
-  sudo tmux send-keys -t 1 "python3 utils/randomizer.py -v ${P4_ARCHI_VERSION} -r ${RANDOM_VERSION} -n ${NUM_OF_HOSTS}" Enter
-  sleep 0.5s
-
-  echo "** Starting environment ..."
-  sudo tmux send-keys -t 1 "p4run" Enter
-  if [ ${NUM_OF_HOSTS} -ge 50 ]; then
-    sleep 4m 30s
-  elif [ ${NUM_OF_HOSTS} -ge 25 ]; then
-    sleep 1m 20s
-  elif [ ${NUM_OF_HOSTS} -ge 10 ]; then
-    sleep 20s
-  else
-    sleep 10s
-  fi
-
-  for host_id in $(seq 2 ${NUM_OF_HOSTS}); do
-    echo "*** h${host_id} starts receiving"
-    sudo tmux send-keys -t 1 "noecho h${host_id} make receive" Enter
-    sleep 2s
-  done
-  sleep 2s
-
-  sudo tmux send-keys -t 1 "noecho h1 make send" Enter
-  echo "*** h1 starts sending"
-  sleep 5s
-
-  sudo tmux send-keys -t 1 "exit" Enter
-  echo "** Shutdown environment ..."
-  if [ ${NUM_OF_HOSTS} -ge 50 ]; then
-    sleep 2m 30s
-  elif [ ${NUM_OF_HOSTS} -ge 25 ]; then
-    sleep 1m
-  elif [ ${NUM_OF_HOSTS} -ge 10 ]; then
-    sleep 10s
-  else
-    sleep 5s
-  fi
-
-  sudo tmux send-keys -t 1 "make clean" Enter
-  echo "** Cleaning ..."
-  sleep 5s
-done
-
-echo "** Finished"
-sudo tmux kill-session -t ${SESSION}
+# Each phase starts as soon as the previous one is ready, see utils/orchestrator.py
+python3 utils/orchestrator.py -n ${NUM_OF_HOSTS} -t ${NUM_OF_TESTS} -v ${P4_ARCHI_VERSION} -r ${RANDOM_VERSION}
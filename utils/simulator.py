@@ -0,0 +1,544 @@
+import sys
+import os
+import csv
+import json
+import heapq
+import numpy as np
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'host_test'))
+from int_codec import MAX_INT_HEADERS  # noqa: E402
+from result_sink import COLUMNS, LATENCY_COLUMNS  # noqa: E402
+from routes import route_name  # noqa: E402
+
+
+# Upper bound of the elements of the largest temporary array of one chunk of trials
+CHUNK_ELEMENTS = 1 << 24
+
+# Copy of the p4app.json of each test, kept in the results directory by orchestrator.py
+CONFIG_NAME = 'p4app_{}.json'
+
+
+class Topology(NamedTuple):
+    """
+    Topology of a p4app.json, switches are indexed in the order of their names (s1, s2, ...)
+    """
+    switches: List[str]
+    ids: np.ndarray
+    hosts: List[Optional[str]]
+    delay: np.ndarray
+    version: int
+
+
+class Deliveries(NamedTuple):
+    """
+    Packets received by the hosts, one entry per packet.
+    The path holds the switch IDs of the IntHeader in the traversal order, padded with zeros, as decode_batch does.
+    """
+    trial: np.ndarray
+    switch: np.ndarray
+    packet: np.ndarray
+    num_of_switch: np.ndarray
+    time: np.ndarray
+    path: np.ndarray
+
+
+def parse_delay(value: str) -> float:
+    """
+    Parse a link delay of p4app.json, e.g. '10ms'
+    :param value: delay with its unit (us, ms or s)
+    :return: delay in seconds
+    """
+    value = str(value).strip()
+    for unit, scale in (('us', 1e-6), ('ms', 1e-3), ('s', 1.0)):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * scale
+
+    return float(value)
+
+
+def parse_topology(data: dict) -> Topology:
+    """
+    Parse the topology written by randomizer.py
+    :param data: content of p4app.json
+    :return: topology
+    """
+    topology = data['topology']
+    switches = sorted(topology['switches'], key=lambda name: (len(name), name))
+    index = {name: idx for idx, name in enumerate(switches)}
+    hosts = [None] * len(switches)  # type: List[Optional[str]]
+    delay = np.full((len(switches), len(switches)), np.inf)
+    for link in topology['links']:
+        node1, node2 = link[0], link[1]
+        if node1 in index and node2 in index:
+            link_delay = parse_delay(link[2].get('delay', 0)) if len(link) > 2 else 0.0
+            delay[index[node1], index[node2]] = delay[index[node2], index[node1]] = link_delay
+        elif node2 in index:
+            hosts[index[node2]] = node1
+        elif node1 in index:
+            hosts[index[node1]] = node2
+
+    return Topology(switches=switches,
+                    ids=np.array([int(name[1:]) for name in switches], dtype=np.uint32),
+                    hosts=hosts,
+                    delay=delay,
+                    version=1 if data.get('program') == 'project_v2.p4' else 0)
+
+
+def load_topology(filename: str) -> Topology:
+    """
+    Load the topology of a p4app.json
+    :param filename: name of the json file
+    :return: topology
+    """
+    with open(filename) as in_file:
+        return parse_topology(json.load(in_file))
+
+
+def send_times(num_of_pkt: int, num_of_rounds: int, gap: float, interval: float) -> np.ndarray:
+    """
+    Get the send time of every packet, as sender.py sends them
+    :param num_of_pkt: number of packets sent in each round
+    :param num_of_rounds: number of rounds
+    :param gap: seconds between two packets of a round
+    :param interval: seconds between the end of a round and the start of the next one
+    :return: send times
+    """
+    rounds = np.repeat(np.arange(num_of_rounds), num_of_pkt)
+    packets = np.tile(np.arange(num_of_pkt), num_of_rounds)
+
+    return rounds * ((num_of_pkt - 1) * gap + interval) + packets * gap
+
+
+def draw_trial(topology: Topology, trial: int, seed: int, num_of_packets: int, jitter: float,
+               random_delay: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Draw the random inputs of one trial, which only depend on the seed and the trial number
+    :param topology: topology
+    :param trial: trial number
+    :param seed: random seed
+    :param num_of_packets: number of packets sent by the origin
+    :param jitter: mean of the exponential processing jitter in seconds
+    :param random_delay: whether to draw the delay of every link in [0, 100] ms like randomizer.py -r 2
+    :return: (switches, switches) link delays and (packets, switches) processing jitter
+    """
+    rand = np.random.default_rng([seed, trial])
+    delay = topology.delay
+    if random_delay:
+        upper = np.triu(rand.integers(0, 101, delay.shape) / 1000.0, 1)
+        delay = np.where(np.isfinite(delay), upper + upper.T, np.inf)
+    noise = rand.exponential(jitter, (num_of_packets, len(topology.switches))) if jitter > 0 else \
+        np.zeros((num_of_packets, len(topology.switches)))
+
+    return delay, noise
+
+
+def flood_v1(delay: np.ndarray, jitter: np.ndarray, times: np.ndarray, origin: int,
+             processing: float) -> Deliveries:
+    """
+    Flood through project.p4, which keeps the ingress port and TTL of the fewest hops seen so far.
+    A copy with k hops arriving at a switch is accepted iff no copy with fewer hops arrived earlier and it comes from
+    the port of the first copy with k hops, so the flood is solved one hop count at a time for all packets at once.
+    :param delay: (trials, switches, switches) link delays in seconds, inf without link
+    :param jitter: (trials, packets, switches) processing jitter in seconds
+    :param times: send time of each packet
+    :param origin: index of the switch of the sender
+    :param processing: processing delay of a switch in seconds
+    :return: deliveries with paths of switch indices padded with -1
+    """
+    num_of_trials, num_of_packets, num_of_switches = jitter.shape
+
+    # The origin forwards every packet
+    ent_trial = np.repeat(np.arange(num_of_trials), num_of_packets)
+    ent_packet = np.tile(np.arange(num_of_packets), num_of_trials)
+    ent_switch = np.full(len(ent_trial), origin)
+    ent_ingress = np.full(len(ent_trial), -1)
+    ent_time = times[ent_packet] + processing + jitter[ent_trial, ent_packet, origin]
+    layers = [(ent_switch, np.full(len(ent_trial), -1))]
+    cutoff = np.full((num_of_trials, num_of_switches), np.inf)
+    delivered = []
+
+    for hop in range(1, MAX_INT_HEADERS + 1):
+        if not len(ent_trial):
+            break
+        # Entries are sorted by trial then switch. All copies forwarded by a switch with the same hop count come
+        # from the same port, so first arrivals are found per (trial, switch) pair from its earliest packet.
+        pair_start = np.flatnonzero(np.r_[True, (ent_trial[1:] != ent_trial[:-1]) |
+                                          (ent_switch[1:] != ent_switch[:-1])])
+        pair_size = np.diff(np.r_[pair_start, len(ent_trial)])
+        pair_trial, pair_switch = ent_trial[pair_start], ent_switch[pair_start]
+        arrival = np.minimum.reduceat(ent_time, pair_start)[:, None] + delay[pair_trial, pair_switch]
+        has_ingress = ent_ingress[pair_start] >= 0
+        arrival[np.flatnonzero(has_ingress), ent_ingress[pair_start][has_ingress]] = np.inf
+        arrival[:, origin] = np.inf
+
+        start = np.flatnonzero(np.r_[True, pair_trial[1:] != pair_trial[:-1]])
+        group = np.repeat(np.arange(len(start)), np.diff(np.r_[start, len(pair_trial)]))
+        trial = pair_trial[start]
+        first = np.minimum.reduceat(arrival, start, axis=0)
+        tied = (arrival == first[group]) & np.isfinite(arrival)
+        first_port = np.minimum.reduceat(np.where(tied, pair_switch[:, None], num_of_switches), start, axis=0)
+
+        # Only the pair owning the first port of a switch can get copies accepted there, before the cutoff
+        pair, target = np.nonzero(pair_switch[:, None] == first_port[group])
+        limit = cutoff[pair_trial[pair], target]
+        cutoff[trial] = np.minimum(cutoff[trial], first)
+        repeats = pair_size[pair]
+        offset = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        parent = np.repeat(pair_start[pair], repeats) + offset
+        target, limit = np.repeat(target, repeats), np.repeat(limit, repeats)
+        copy_arrival = ent_time[parent] + delay[ent_trial[parent], ent_switch[parent], target]
+        accepted = copy_arrival < limit
+
+        order = np.lexsort((target[accepted], ent_trial[parent[accepted]]))
+        parent, switch = parent[accepted][order], target[accepted][order]
+        ent_trial, ent_packet = ent_trial[parent], ent_packet[parent]
+        ent_ingress, ent_switch = ent_switch[parent], switch
+        ent_time = copy_arrival[accepted][order] + processing + jitter[ent_trial, ent_packet, switch]
+        layers.append((switch, parent))
+        delivered.append((ent_trial, switch, ent_packet, np.full(len(switch), hop + 1), ent_time,
+                          trace_layers(layers)))
+
+    return concatenate_deliveries(delivered)
+
+
+def trace_layers(layers: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+    """
+    Trace the entries of the last layer back to the origin
+    :param layers: switch and parent entry of every entry of each hop count
+    :return: (entries, MAX_INT_HEADERS) switch indices of the IntHeader in the traversal order, padded with -1
+    """
+    switch, parent = layers[-1]
+    length = min(len(layers), MAX_INT_HEADERS)
+    path = np.full((len(switch), MAX_INT_HEADERS), -1)
+    path[:, length - 1] = switch
+    for column in range(length - 2, -1, -1):
+        switch, parent = layers[column - length][0][parent], layers[column - length][1][parent]
+        path[:, column] = switch
+
+    return path
+
+
+def flood_v2(delay: np.ndarray, jitter: np.ndarray, times: np.ndarray, origin: int,
+             processing: float) -> Deliveries:
+    """
+    Flood through project_v2.p4, where the port of the first copy to arrive wins.
+    The first arrivals form a shortest path tree, found by one Dijkstra pass for all trials at once.
+    :param delay: (trials, switches, switches) link delays in seconds, inf without link
+    :param jitter: (trials, packets, switches) processing jitter in seconds
+    :param times: send time of each packet
+    :param origin: index of the switch of the sender
+    :param processing: processing delay of a switch in seconds
+    :return: deliveries with paths of switch indices padded with -1
+    """
+    num_of_trials, num_of_packets, num_of_switches = jitter.shape
+    rows = np.arange(num_of_trials)
+    arrival = np.full((num_of_trials, num_of_switches), np.inf)
+    parent = np.full((num_of_trials, num_of_switches), -1)
+    hop = np.zeros((num_of_trials, num_of_switches), dtype=np.int64)
+    settled = np.zeros((num_of_trials, num_of_switches), dtype=bool)
+    forward = np.full((num_of_trials, num_of_packets, num_of_switches), np.inf)
+
+    settled[:, origin] = True
+    forward[:, :, origin] = times + processing + jitter[:, :, origin]
+    switch = np.full(num_of_trials, origin)
+    for _ in range(num_of_switches):
+        # Relax the neighbors of the newly settled switches, unless their copies exceed MAX_INT_HEADERS
+        candidate = forward[rows, :, switch].min(axis=1)[:, None] + delay[rows, switch]
+        current = np.maximum(parent[rows], 0)
+        rank = hop[rows, switch][:, None] * num_of_switches + switch[:, None]
+        current_rank = hop[rows[:, None], current] * num_of_switches + current
+        better = (candidate < arrival[rows]) | ((candidate == arrival[rows]) & np.isfinite(candidate) &
+                                              (rank < current_rank))
+        better &= ~settled[rows] & (hop[rows, switch] < MAX_INT_HEADERS)[:, None]
+        arrival[rows] = np.where(better, candidate, arrival[rows])
+        parent[rows] = np.where(better, switch[:, None], parent[rows])
+
+        # Settle the earliest switch of every trial
+        switch = np.where(settled[rows], np.inf, arrival[rows]).argmin(axis=1)
+        reached = np.isfinite(arrival[rows, switch]) & ~settled[rows, switch]
+        rows, switch = rows[reached], switch[reached]
+        if not len(rows):
+            break
+        previous = parent[rows, switch]
+        settled[rows, switch] = True
+        hop[rows, switch] = hop[rows, previous] + 1
+        forward[rows, :, switch] = (forward[rows, :, previous] + delay[rows, previous, switch][:, None] + processing +
+                                    jitter[rows, :, switch])
+
+    # Every reached switch delivers every packet its parent forwarded along the tree
+    trial, packet, switch = np.nonzero(np.isfinite(forward) & (hop > 0)[:, None, :])
+    ancestor = np.where(np.arange(num_of_switches) == origin, origin, parent)
+    num_of_switch = hop[trial, switch] + 1
+    length = np.minimum(num_of_switch, MAX_INT_HEADERS)
+    path = np.full((len(trial), MAX_INT_HEADERS), -1)
+    node = switch
+    for back in range(MAX_INT_HEADERS):
+        column = length - 1 - back
+        inside = column >= 0
+        path[inside, column[inside]] = node[inside]
+        node = ancestor[trial, node]
+
+    return Deliveries(trial=trial, switch=switch, packet=packet, num_of_switch=num_of_switch,
+                      time=forward[trial, packet, switch], path=path)
+
+
+def flood_events(delay: np.ndarray, jitter: np.ndarray, times: np.ndarray, origin: int, processing: float,
+                 version: int) -> Deliveries:
+    """
+    Reference discrete-event flood of one trial, following the P4 programs step by step.
+    Simultaneous arrivals are handled in the order of fewer hops, then lower switch index.
+    :param delay: (switches, switches) link delays in seconds, inf without link
+    :param jitter: (packets, switches) processing jitter in seconds
+    :param times: send time of each packet
+    :param origin: index of the switch of the sender
+    :param processing: processing delay of a switch in seconds
+    :param version: 0 for project.p4, 1 for project_v2.p4
+    :return: deliveries with paths of switch indices padded with -1
+    """
+    neighbors = [np.flatnonzero(np.isfinite(row)).tolist() for row in delay]
+    port_reg = [-1] * len(delay)
+    ttl_reg = [0] * len(delay)
+    events = []  # type: List[Tuple[float, int, int, int, int, Tuple[int, ...]]]
+    delivered = []
+
+    def egress(switch: int, packet: int, arrival: float, path: Tuple[int, ...], ingress: int) -> None:
+        # Add the INT header, send a copy to the host and to every other switch that can parse it
+        departure = arrival + processing + jitter[packet, switch]
+        if switch != origin:
+            delivered.append((packet, switch, len(path), departure, path[-MAX_INT_HEADERS:]))
+        if len(path) < MAX_INT_HEADERS + 1:
+            for neighbor in neighbors[switch]:
+                if neighbor != ingress:
+                    heapq.heappush(events, (departure + delay[switch, neighbor], len(path), switch, packet, neighbor,
+                                            path))
+
+    for idx, send_time in enumerate(times):
+        egress(origin, idx, float(send_time), (origin,), -1)
+
+    while events:
+        arrival, num_of_hops, ingress, packet, switch, path = heapq.heappop(events)
+        if switch == origin:
+            continue
+        if version == 0:
+            ttl = 255 - num_of_hops
+            if ttl < ttl_reg[switch] or (ttl == ttl_reg[switch] and ingress != port_reg[switch]):
+                continue
+            port_reg[switch], ttl_reg[switch] = ingress, ttl
+        else:
+            if port_reg[switch] < 0:
+                port_reg[switch] = ingress
+            if ingress != port_reg[switch]:
+                continue
+        egress(switch, packet, arrival, path + (switch,), ingress)
+
+    path = np.full((len(delivered), MAX_INT_HEADERS), -1)
+    for idx, entry in enumerate(delivered):
+        path[idx, :len(entry[4])] = entry[4]
+
+    return Deliveries(trial=np.zeros(len(delivered), dtype=np.int64),
+                      switch=np.array([entry[1] for entry in delivered], dtype=np.int64),
+                      packet=np.array([entry[0] for entry in delivered], dtype=np.int64),
+                      num_of_switch=np.array([entry[2] for entry in delivered], dtype=np.int64),
+                      time=np.array([entry[3] for entry in delivered], dtype=np.float64),
+                      path=path)
+
+
+def concatenate_deliveries(parts: Sequence[Tuple[np.ndarray, ...]]) -> Deliveries:
+    """
+    Concatenate parts of deliveries field by field
+    :param parts: deliveries or tuples of their fields
+    :return: deliveries
+    """
+    if not parts:
+        empty = np.empty(0, dtype=np.int64)
+        return Deliveries(empty, empty, empty, empty, np.empty(0), np.empty((0, MAX_INT_HEADERS), dtype=np.int64))
+
+    return Deliveries(*[np.concatenate([part[field] for part in parts]) for field in range(len(Deliveries._fields))])
+
+
+def simulate_chunk(topology: Topology, version: int, origin: int, times: np.ndarray, trials: range, seed: int,
+                   processing: float, jitter: float, random_delay: bool, engine: str) -> Deliveries:
+    """
+    Simulate consecutive trials
+    :param topology: topology
+    :param version: 0 for project.p4, 1 for project_v2.p4
+    :param origin: index of the switch of the sender
+    :param times: send time of each packet
+    :param trials: trial numbers
+    :param seed: random seed
+    :param processing: processing delay of a switch in seconds
+    :param jitter: mean processing jitter in seconds
+    :param random_delay: whether to draw random link delays in each trial
+    :param engine: 'numpy' or 'event'
+    :return: deliveries with switch IDs in the paths
+    """
+    inputs = [draw_trial(topology, trial, seed, len(times), jitter, random_delay) for trial in trials]
+    if engine == 'event':
+        parts = []
+        for trial, (delay, noise) in zip(trials, inputs):
+            part = flood_events(delay, noise, times, origin, processing, version)
+            parts.append(part._replace(trial=np.full(len(part.trial), trial)))
+        deliveries = concatenate_deliveries(parts)
+    else:
+        delay = np.stack([delay for delay, _ in inputs]) if random_delay else \
+            np.broadcast_to(topology.delay, (len(trials),) + topology.delay.shape)
+        noise = np.stack([noise for _, noise in inputs])
+        deliveries = (flood_v2 if version else flood_v1)(delay, noise, times, origin, processing)
+        deliveries = deliveries._replace(trial=deliveries.trial + trials.start)
+
+    return deliveries._replace(path=np.append(topology.ids, 0)[deliveries.path])
+
+
+def simulate(topology: Topology, version: int, origin: str, times: np.ndarray, num_of_trials: int, seed: int,
+             processing: float, jitter: float, random_delay: bool, engine: str, num_of_workers: int) -> Deliveries:
+    """
+    Simulate many trials in chunks, with a process pool when there are several chunks
+    :param topology: topology
+    :param version: 0 for project.p4, 1 for project_v2.p4
+    :param origin: name of the host sending the packets
+    :param times: send time of each packet
+    :param num_of_trials: number of trials
+    :param seed: random seed, the deliveries of a trial do not depend on the chunking
+    :param processing: processing delay of a switch in seconds
+    :param jitter: mean processing jitter in seconds
+    :param random_delay: whether to draw random link delays in each trial
+    :param engine: 'numpy' or 'event'
+    :param num_of_workers: number of processes (<= 1 to simulate in this process)
+    :return: deliveries of all trials
+    """
+    origin = topology.hosts.index(origin)
+    num_of_switches = len(topology.switches)
+    size = max(1, CHUNK_ELEMENTS // (num_of_switches * (num_of_switches + len(times))))
+    chunks = [range(start, min(start + size, num_of_trials)) for start in range(0, num_of_trials, size)]
+    arguments = (topology, version, origin, times)
+    options = (seed, processing, jitter, random_delay, engine)
+
+    if num_of_workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=num_of_workers) as executor:
+            parts = list(executor.map(simulate_chunk, *zip(*[arguments + (chunk,) + options for chunk in chunks])))
+    else:
+        parts = [simulate_chunk(*arguments, chunk, *options) for chunk in chunks]
+
+    return concatenate_deliveries(parts)
+
+
+def write_results(deliveries: Deliveries, topology: Topology, dir_name: str, first_test_no: int = 0,
+                  times: Optional[np.ndarray] = None) -> int:
+    """
+    Write the deliveries as the csv results of the receivers, one hX-eth0_N.csv file per host and trial
+    :param deliveries: deliveries
+    :param topology: topology
+    :param dir_name: name of the results directory
+    :param first_test_no: serial number of the first trial
+    :param times: send time of every packet, to write the columns of receiver.py -l as well
+    :return: number of written files
+    """
+    os.makedirs(dir_name, exist_ok=True)
+    order = np.lexsort((deliveries.time, deliveries.switch, deliveries.trial))
+    trial, switch = deliveries.trial[order], deliveries.switch[order]
+    distinct, route_code = np.unique(deliveries.path[order], axis=0, return_inverse=True)
+    names = np.array([route_name(ids[ids > 0]) for ids in distinct], dtype=object)[route_code.ravel()]
+    num_of_switch = deliveries.num_of_switch[order].tolist()
+    columns = [num_of_switch, names, deliveries.time[order].tolist()]
+    if times is not None:
+        packet = deliveries.packet[order]
+        columns += [packet.tolist(), times[packet].tolist(), (deliveries.time[order] - times[packet]).tolist()]
+
+    start = np.flatnonzero(np.r_[True, (trial[1:] != trial[:-1]) | (switch[1:] != switch[:-1])])
+    for begin, end in zip(start, np.r_[start[1:], len(order)]):
+        filename = '{}-eth0_{}.csv'.format(topology.hosts[switch[begin]], first_test_no + trial[begin])
+        with open(os.path.join(dir_name, filename), 'w', newline='') as out_file:
+            writer = csv.writer(out_file)
+            writer.writerow(COLUMNS if times is None else LATENCY_COLUMNS)
+            writer.writerows(zip(*[column[begin:end] for column in columns]))
+
+    return len(start)
+
+
+def info_log(log: str) -> None:
+    """
+    Print logs
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[96mINFO\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def error_log(log: str) -> None:
+    """
+    Print error log
+    :param log: log to be displayed
+    :return: None
+    """
+    print(f'[\033[91mERROR\033[00m] {log}')
+    sys.stdout.flush()
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse arguments from command line
+    :return: arguments
+    """
+    parser = ArgumentParser()
+    parser.add_argument('-f', '--file', help='p4app.json written by randomizer.py', type=str, default='p4app.json')
+    parser.add_argument('-v', '--version', help='Version of the P4 architecture (default: program of p4app.json)',
+                        type=int, choices=[0, 1], default=None)
+    parser.add_argument('-src', '--source', help='Host sending the packets', type=str, default='h1')
+    parser.add_argument('-c', '--count', help='Number of packets sent in each round', type=int, default=5)
+    parser.add_argument('-ch', '--check', help='Send another round to check the routes', action='store_true')
+    parser.add_argument('-g', '--gap', help='Milliseconds between two packets of a round', type=float, default=20)
+    parser.add_argument('-ci', '--check-interval', help='Seconds between two rounds', type=float, default=1)
+    parser.add_argument('-t', '--trials', help='Number of trials', type=int, default=10)
+    parser.add_argument('-p', '--processing', help='Processing delay of a switch in milliseconds', type=float,
+                        default=1)
+    parser.add_argument('-j', '--jitter', help='Mean processing jitter of a switch in milliseconds', type=float,
+                        default=0.5)
+    parser.add_argument('-rd', '--random-delay', help='Draw random link delays in each trial like randomizer.py -r 2',
+                        action='store_true')
+    parser.add_argument('-s', '--seed', help='Random seed', type=int, default=0)
+    parser.add_argument('-e', '--engine', help='Simulation engine', type=str, choices=['numpy', 'event'],
+                        default='numpy')
+    parser.add_argument('-w', '--workers', help='Number of processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('-o', '--output', help='Directory of the csv results (default: do not write)', type=str,
+                        default=None)
+    parser.add_argument('-ft', '--first-test', help='Serial number of the first trial', type=int, default=0)
+    parser.add_argument('-l', '--latency', help='Write the sequence number, send time and one-way latency of each '
+                                                'packet like receiver.py -l', action='store_true')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    Main function
+        command: python3 utils/simulator.py [-f p4app.json] [-v (0-1)] [-src host] [-c count] [-ch] [-g gap]
+                 [-ci check_interval] [-t trials] [-p processing] [-j jitter] [-rd] [-s seed] [-e engine] [-w workers]
+                 [-o output] [-ft first_test] [-l]
+    """
+    args = parse_arguments()
+    try:
+        topo = load_topology(args.file)
+    except (OSError, ValueError, KeyError) as e:
+        error_log(f'Cannot load {args.file}: {e}')
+        sys.exit(1)
+    if args.source not in topo.hosts:
+        error_log(f'{args.source} is not attached to any switch')
+        sys.exit(1)
+
+    ver = topo.version if args.version is None else args.version
+    send_time = send_times(args.count, 2 if args.check else 1, args.gap / 1000, args.check_interval)
+    start_time = perf_counter()
+    result = simulate(topo, ver, args.source, send_time, args.trials, args.seed, args.processing / 1000,
+                      args.jitter / 1000, args.random_delay, args.engine, args.workers)
+    elapsed_time = perf_counter() - start_time
+    info_log(f'Version {ver + 1}: {args.trials} trial(s) on {len(topo.switches)} switches in {elapsed_time:.3f} s, '
+             f'{len(result.time)} packets received')
+
+    if args.output:
+        num_of_files = write_results(result, topo, args.output, args.first_test, send_time if args.latency else None)
+        info_log(f'Wrote {num_of_files} result file(s) into {args.output}')
@@ -0,0 +1,101 @@
+import numpy as np
+from typing import NamedTuple, Tuple
+
+
+class Timeline(NamedTuple):
+    """
+    Occupancy of each route over time, run-length encoded.
+    Run i means route routes[run_route[i]] appears in every bin from run_start[i] to run_end[i] - 1, where bin b covers
+    [origin + b * bin_width, origin + (b + 1) * bin_width).
+    """
+    routes: np.ndarray
+    origin: float
+    bin_width: float
+    run_route: np.ndarray
+    run_start: np.ndarray
+    run_end: np.ndarray
+    run_events: np.ndarray
+
+
+def route_timeline(ids: np.ndarray, times: np.ndarray, bin_width: float = 0.001) -> Timeline:
+    """
+    Bin all (route, time) events in one pass.
+    Only occupied (route, bin) cells are kept, so memory scales with the number of events instead of duration / bin.
+    :param ids: route of each event
+    :param times: time of each event
+    :param bin_width: width of a bin in seconds
+    :return: timeline of the routes
+    """
+    routes, codes = np.unique(np.asarray(ids).astype(str), return_inverse=True)
+    times = np.asarray(times, dtype=np.float64)
+    if not len(times):
+        empty = np.empty(0, dtype=np.int64)
+        return Timeline(routes, 0.0, bin_width, empty, empty, empty, empty)
+
+    origin = float(times.min())
+    bins = ((times - origin) / bin_width).astype(np.int64)
+    num_of_bins = int(bins.max()) + 1
+
+    # Occupied cells of the route-code x bin grid, sorted by route then bin
+    cells, events = np.unique(codes.ravel().astype(np.int64) * num_of_bins + bins, return_counts=True)
+    cell_route, cell_bin = np.divmod(cells, num_of_bins)
+
+    return _encode_runs(routes, origin, bin_width, cell_route, cell_bin, cell_bin + 1, events)
+
+
+def rebin(timeline: Timeline, bin_width: float) -> Timeline:
+    """
+    Downsample a timeline to wider bins, a wide bin is occupied if any of its narrow bins is
+    :param timeline: timeline to be downsampled
+    :param bin_width: new width of a bin in seconds, not narrower than the current one
+    :return: downsampled timeline
+    """
+    if bin_width < timeline.bin_width:
+        raise ValueError('Bin width {} is narrower than {}.'.format(bin_width, timeline.bin_width))
+    ratio = timeline.bin_width / bin_width
+    start = np.floor(timeline.run_start * ratio).astype(np.int64)
+    end = np.ceil(timeline.run_end * ratio).astype(np.int64)
+
+    return _encode_runs(timeline.routes, timeline.origin, bin_width, timeline.run_route, start, end,
+                        timeline.run_events)
+
+
+def step_coords(timeline: Timeline, route_code: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the coordinates of a step plot of one route, with 4 points per run
+    :param timeline: timeline of the routes
+    :param route_code: index of the route in timeline.routes
+    :return: times and 0/1 values
+    """
+    selected = timeline.run_route == route_code
+    start = timeline.origin + timeline.run_start[selected] * timeline.bin_width
+    end = timeline.origin + timeline.run_end[selected] * timeline.bin_width
+    x_coord = np.stack([start, start, end, end], axis=1).ravel()
+    y_coord = np.tile(np.array([0, 1, 1, 0]), len(start))
+
+    return x_coord, y_coord
+
+
+def _encode_runs(routes: np.ndarray, origin: float, bin_width: float, route: np.ndarray, start: np.ndarray,
+                 end: np.ndarray, events: np.ndarray) -> Timeline:
+    """
+    Merge overlapping or adjacent intervals of the same route into runs
+    :param routes: distinct routes
+    :param origin: time of bin 0
+    :param bin_width: width of a bin in seconds
+    :param route: route code of each interval, sorted together with start
+    :param start: first bin of each interval
+    :param end: bin after the last one of each interval
+    :param events: number of events in each interval
+    :return: timeline of the runs
+    """
+    if not len(route):
+        return Timeline(routes, origin, bin_width, route, start, end, events)
+
+    # Furthest end reached so far by the intervals of the same route
+    offset = route * (int(end.max()) + 1)
+    reach = np.maximum.accumulate(offset + end) - offset
+    first = np.flatnonzero(np.r_[True, (route[1:] != route[:-1]) | (start[1:] > reach[:-1])])
+
+    return Timeline(routes, origin, bin_width, route[first], start[first], np.maximum.reduceat(end, first),
+                    np.add.reduceat(events, first))